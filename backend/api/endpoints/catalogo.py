@@ -0,0 +1,182 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Dict, List, Optional, Tuple
+import base64
+import binascii
+import json
+import logging
+import sqlite3
+
+from app.responses import cached_response
+from db.session import get_sqlite
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Columnas de contenido_formativo que se pueden pedir con `fields`
+CAMPOS = (
+    "id", "titulo", "descripcion", "tipo", "proveedor", "centro_nombre",
+    "duracion_horas", "modalidad", "nivel", "rating", "precio", "estado",
+    "ubicacion_id", "fecha_publicacion", "fecha_inicio", "fecha_fin",
+    "plazas", "url_mas_info", "destacado",
+)
+CAMPOS_DEFECTO = ("id", "titulo", "tipo", "modalidad", "nivel", "rating", "precio", "estado")
+# Campos calculados que no son columnas
+CAMPO_CATEGORIAS = "categorias"
+
+MAX_LIMIT = 200
+
+def encode_cursor(ultimo_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([ultimo_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valor = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valor, list) or len(valor) != 1 or not isinstance(valor[0], str):
+            raise ValueError(valor)
+        return valor[0]
+    except (binascii.Error, ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Cursor inválido: {cursor}") from e
+
+def parse_fields(fields: Optional[str]) -> Tuple[List[str], bool]:
+    """
+    Valida la proyección pedida; `id` se incluye siempre porque es el cursor
+
+    Returns:
+        Tuple[List[str], bool]: Columnas a leer y si se piden las categorías
+    """
+    if not fields:
+        return list(CAMPOS_DEFECTO), False
+    pedidos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    desconocidos = [campo for campo in pedidos if campo not in CAMPOS and campo != CAMPO_CATEGORIAS]
+    if desconocidos:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(desconocidos)}")
+    columnas = ["id"] + [campo for campo in dict.fromkeys(pedidos) if campo in CAMPOS and campo != "id"]
+    return columnas, CAMPO_CATEGORIAS in pedidos
+
+def ids_categoria(conn: sqlite3.Connection, nombre: str) -> List[int]:
+    """
+    IDs de las categorías con ese nombre (el nombre no es único)
+    """
+    return [row[0] for row in conn.execute("SELECT id FROM categorias WHERE nombre = ? ORDER BY id", (nombre,))]
+
+def build_query(
+    columnas: List[str],
+    filtros: Dict[str, str],
+    categoria_ids: Optional[List[int]],
+    despues_de: Optional[str],
+    limit: int,
+) -> Tuple[str, List]:
+    """
+    Consulta keyset: `WHERE id > ultimo_id ORDER BY id LIMIT n`, sin OFFSET
+
+    Con una sola categoría la consulta la dirige el índice
+    (categoria_id, contenido_id) de contenido_categorias, que ya está
+    ordenado por contenido; el CROSS JOIN fija ese orden de los JOIN aunque
+    no haya estadísticas que lo justifiquen. Con varias (categorías que se llaman igual) la
+    dirige la clave primaria de contenido_formativo con un EXISTS por fila.
+    En los dos casos cada contenido sale una sola vez.
+    """
+    select = ", ".join(f"cf.{columna}" for columna in columnas)
+    params: List = []
+    if categoria_ids is not None and len(categoria_ids) == 1:
+        clave = "cc.contenido_id"
+        origen = """contenido_categorias AS cc
+    CROSS JOIN contenido_formativo AS cf ON cf.id = cc.contenido_id"""
+        condiciones = ["cc.categoria_id = ?"]
+        params.append(categoria_ids[0])
+    else:
+        clave = "cf.id"
+        origen = "contenido_formativo AS cf"
+        condiciones = []
+        if categoria_ids is not None:
+            condiciones.append(
+                "EXISTS (SELECT 1 FROM contenido_categorias AS x WHERE x.contenido_id = cf.id"
+                f" AND x.categoria_id IN ({', '.join('?' for _ in categoria_ids)}))"
+            )
+            params.extend(categoria_ids)
+    for columna, valor in filtros.items():
+        condiciones.append(f"cf.{columna} = ?")
+        params.append(valor)
+    if despues_de is not None:
+        condiciones.append(f"{clave} > ?")
+        params.append(despues_de)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    query = f"""
+    SELECT {select}
+    FROM {origen}
+    {where}
+    ORDER BY {clave}
+    LIMIT ?
+    """
+    params.append(limit)
+    return query, params
+
+def categorias_de(conn: sqlite3.Connection, ids: List[str]) -> Dict[str, List[str]]:
+    if not ids:
+        return {}
+    rows = conn.execute(
+        """
+        SELECT cc.contenido_id, c.nombre
+        FROM contenido_categorias AS cc
+        JOIN categorias AS c ON c.id = cc.categoria_id
+        WHERE cc.contenido_id IN ({placeholders})
+        ORDER BY c.nombre
+        """.format(placeholders=", ".join("?" for _ in ids)),
+        ids,
+    ).fetchall()
+    resultado: Dict[str, List[str]] = {contenido_id: [] for contenido_id in ids}
+    for contenido_id, nombre in rows:
+        resultado[contenido_id].append(nombre)
+    return resultado
+
+@router.get("/catalogo", tags=["catalogo"])
+def listar_catalogo(
+    request: Request,
+    tipo: Optional[str] = Query(None, pattern="^(curso|taller|master|certificacion)$"),
+    modalidad: Optional[str] = Query(None, pattern="^(presencial|online|hibrido)$"),
+    nivel: Optional[str] = Query(None, pattern="^(basico|intermedio|avanzado)$"),
+    estado: Optional[str] = Query(None, pattern="^(activo|inactivo|borrador)$"),
+    categoria: Optional[str] = Query(None, description="Nombre de la categoría"),
+    fields: Optional[str] = Query(None, description="Campos separados por comas, p. ej. id,titulo,categorias"),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="Valor `next_cursor` de la página anterior"),
+    conn: sqlite3.Connection = Depends(get_sqlite),
+) -> Response:
+    """
+    Lista el catálogo de contenido formativo paginado por cursor
+
+    Returns:
+        {"items": [...], "next_cursor": str | None}; la respuesta lleva ETag
+        (304 si coincide con If-None-Match) y se comprime con br/gzip según
+        Accept-Encoding
+    """
+    columnas, con_categorias = parse_fields(fields)
+    filtros = {
+        columna: valor
+        for columna, valor in (("tipo", tipo), ("modalidad", modalidad), ("nivel", nivel), ("estado", estado))
+        if valor is not None
+    }
+    despues_de = decode_cursor(cursor) if cursor else None
+    categoria_ids = ids_categoria(conn, categoria) if categoria is not None else None
+    if categoria_ids == []:
+        rows = []
+    else:
+        # Se pide una fila de más para saber si hay página siguiente
+        query, params = build_query(columnas, filtros, categoria_ids, despues_de, limit + 1)
+        rows = conn.execute(query, params).fetchall()
+
+    hay_mas = len(rows) > limit
+    rows = rows[:limit]
+    items = [dict(zip(columnas, row)) for row in rows]
+    if con_categorias:
+        por_contenido = categorias_de(conn, [item["id"] for item in items])
+        for item in items:
+            item[CAMPO_CATEGORIAS] = por_contenido.get(item["id"], [])
+
+    cuerpo = {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]["id"]) if hay_mas else None,
+    }
+    body = json.dumps(cuerpo, ensure_ascii=False, separators=(",", ":")).encode()
+    return cached_response(request, body)
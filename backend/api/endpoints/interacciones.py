@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Optional
+from datetime import datetime
+import logging
+import math
+from pydantic import BaseModel, Field
+
+from app.ingestion import InteractionBuffer, IngestionQueueFull, get_interaction_buffer
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+class InteraccionEvento(BaseModel):
+    usuario_id: int
+    contenido_id: str
+    tipo: str = Field(..., pattern="^(view|like|complete|save)$")
+    tiempo_consumido: Optional[float] = Field(None, ge=0)
+    progreso: Optional[float] = Field(None, ge=0, le=100)
+    valoracion: Optional[int] = Field(None, ge=1, le=5)
+    fecha: Optional[datetime] = None
+    metadatos: Optional[Dict] = None
+
+class IngestaRespuesta(BaseModel):
+    aceptadas: int
+
+class IngestaEstadisticas(BaseModel):
+    writer_alive: bool
+    pending: int
+    enqueued: int
+    written: int
+    failed: int
+    rejected: int
+    batches: int
+    hook_errors: int
+
+def _enqueue(buffer: InteractionBuffer, eventos: List[InteraccionEvento]) -> IngestaRespuesta:
+    try:
+        aceptadas = buffer.submit(evento.model_dump() for evento in eventos)
+    except IngestionQueueFull as e:
+        logger.warning(f"Cola de interacciones llena, rechazando {len(eventos)} eventos")
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas interacciones en cola, reintenta más tarde",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    return IngestaRespuesta(aceptadas=aceptadas)
+
+@router.post("/interacciones", response_model=IngestaRespuesta, status_code=202)
+async def registrar_interaccion(
+    evento: InteraccionEvento,
+    buffer: InteractionBuffer = Depends(get_interaction_buffer)
+):
+    """
+    Registra una interacción (view, like, complete, save)
+
+    El evento se encola y se escribe en `interacciones` en segundo plano,
+    por eso la respuesta es 202 Accepted. Si la cola está llena se responde
+    503 con cabecera Retry-After.
+    """
+    return _enqueue(buffer, [evento])
+
+@router.post("/interacciones/lote", response_model=IngestaRespuesta, status_code=202)
+async def registrar_interacciones(
+    eventos: List[InteraccionEvento],
+    buffer: InteractionBuffer = Depends(get_interaction_buffer)
+):
+    """
+    Registra varias interacciones de una vez; se aceptan todas o ninguna
+    """
+    return _enqueue(buffer, eventos)
+
+@router.get("/interacciones/stats", response_model=IngestaEstadisticas)
+async def estadisticas_ingesta(buffer: InteractionBuffer = Depends(get_interaction_buffer)):
+    """
+    Contadores del buffer de interacciones del proceso
+    """
+    return buffer.stats()
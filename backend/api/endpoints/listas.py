@@ -0,0 +1,247 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
+from datetime import datetime
+import logging
+from pydantic import BaseModel, Field
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from db.session import get_db
+from models.contenido import ContenidoFormativo
+from models.item import ItemLista
+from models.lista import Lista
+from models.perfil import Perfil  # noqa: F401 (lo necesita la relación Usuario.perfil)
+from models.usuario import Usuario
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Máximo de contenidos por operación en bloque
+MAX_ITEMS_LOTE = 500
+# Máximo de contenidos de una lista; un reordenado los lleva todos
+MAX_ITEMS_LISTA = 10_000
+
+class ContenidoResumen(BaseModel):
+    id: str
+    titulo: str
+    tipo: str
+    modalidad: Optional[str] = None
+    nivel: Optional[str] = None
+    rating: Optional[float] = None
+    precio: Optional[float] = None
+    estado: str = "activo"
+
+    class Config:
+        from_attributes = True
+
+class ItemListaRespuesta(BaseModel):
+    contenido_id: str
+    orden: Optional[int] = None
+    fecha_agregado: Optional[datetime] = None
+    contenido: Optional[ContenidoResumen] = None
+
+    class Config:
+        from_attributes = True
+
+class ListaRespuesta(BaseModel):
+    id: int
+    usuario_id: int
+    nombre: str
+    descripcion: Optional[str] = None
+    publica: bool = False
+    items: List[ItemListaRespuesta] = Field(default_factory=list)
+
+    class Config:
+        from_attributes = True
+
+class ListaCrear(BaseModel):
+    nombre: str = Field(..., min_length=1)
+    descripcion: Optional[str] = None
+    publica: bool = False
+
+class ListaActualizar(BaseModel):
+    nombre: Optional[str] = Field(None, min_length=1)
+    descripcion: Optional[str] = None
+    publica: Optional[bool] = None
+
+class ContenidosLote(BaseModel):
+    contenido_ids: List[str] = Field(..., min_length=1, max_length=MAX_ITEMS_LOTE)
+
+class OrdenLista(BaseModel):
+    contenido_ids: List[str] = Field(..., min_length=1, max_length=MAX_ITEMS_LISTA)
+
+def con_items():
+    """
+    Carga de los items y su contenido en dos consultas fijas (las listas y
+    un SELECT ... IN de items con JOIN a contenido_formativo), sea cual sea
+    el número de listas
+    """
+    return selectinload(Lista.items).joinedload(ItemLista.contenido)
+
+def cargar_lista(db: Session, lista_id: int) -> Lista:
+    lista = db.scalars(select(Lista).where(Lista.id == lista_id).options(con_items())).one_or_none()
+    if lista is None:
+        raise HTTPException(status_code=404, detail=f"Lista {lista_id} no encontrada")
+    return lista
+
+def comprobar_lista(db: Session, lista_id: int) -> None:
+    if db.scalar(select(Lista.id).where(Lista.id == lista_id)) is None:
+        raise HTTPException(status_code=404, detail=f"Lista {lista_id} no encontrada")
+
+def bloquear_lista(db: Session, lista_id: int) -> None:
+    """
+    Marca la lista como modificada. Es la primera escritura de la
+    transacción, así que toma ya el lock de escritura de SQLite: lo que se
+    lea después no cambia hasta el commit aunque otra petición modifique la
+    misma lista
+
+    Raises:
+        HTTPException: 404 si la lista no existe
+    """
+    tocada = db.execute(
+        update(Lista).where(Lista.id == lista_id).values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if tocada.rowcount == 0:
+        raise HTTPException(status_code=404, detail=f"Lista {lista_id} no encontrada")
+
+def sin_repetidos(contenido_ids: List[str]) -> List[str]:
+    return list(dict.fromkeys(contenido_ids))
+
+@router.get("/usuarios/{usuario_id}/listas", response_model=List[ListaRespuesta])
+def listas_de_usuario(usuario_id: int, db: Session = Depends(get_db)):
+    """
+    Listas del usuario con sus items y el resumen de cada contenido, en un
+    número fijo de consultas
+    """
+    return db.scalars(
+        select(Lista).where(Lista.usuario_id == usuario_id).order_by(Lista.id).options(con_items())
+    ).all()
+
+@router.post("/usuarios/{usuario_id}/listas", response_model=ListaRespuesta, status_code=201)
+def crear_lista(usuario_id: int, datos: ListaCrear, db: Session = Depends(get_db)):
+    """
+    Crea una lista vacía para el usuario
+    """
+    if db.scalar(select(Usuario.id).where(Usuario.id == usuario_id)) is None:
+        raise HTTPException(status_code=404, detail=f"Usuario {usuario_id} no encontrado")
+    lista = Lista(usuario_id=usuario_id, **datos.model_dump())
+    db.add(lista)
+    db.flush()
+    logger.info(f"Lista {lista.id} creada para el usuario {usuario_id}")
+    return ListaRespuesta(
+        id=lista.id, usuario_id=usuario_id, nombre=lista.nombre,
+        descripcion=lista.descripcion, publica=lista.publica, items=[],
+    )
+
+@router.get("/listas/{lista_id}", response_model=ListaRespuesta)
+def obtener_lista(lista_id: int, db: Session = Depends(get_db)):
+    return cargar_lista(db, lista_id)
+
+@router.patch("/listas/{lista_id}", response_model=ListaRespuesta)
+def actualizar_lista(lista_id: int, datos: ListaActualizar, db: Session = Depends(get_db)):
+    """
+    Cambia nombre, descripción o visibilidad de la lista
+    """
+    lista = cargar_lista(db, lista_id)
+    for campo, valor in datos.model_dump(exclude_unset=True).items():
+        setattr(lista, campo, valor)
+    db.flush()
+    return lista
+
+@router.delete("/listas/{lista_id}", status_code=204)
+def borrar_lista(lista_id: int, db: Session = Depends(get_db)):
+    """
+    Borra la lista y todos sus items, sin cargarlos
+    """
+    comprobar_lista(db, lista_id)
+    db.execute(delete(ItemLista).where(ItemLista.lista_id == lista_id))
+    db.execute(delete(Lista).where(Lista.id == lista_id))
+    logger.info(f"Lista {lista_id} borrada")
+    return Response(status_code=204)
+
+@router.post("/listas/{lista_id}/items", response_model=ListaRespuesta)
+def agregar_items(lista_id: int, lote: ContenidosLote, db: Session = Depends(get_db)):
+    """
+    Añade varios contenidos al final de la lista con un único INSERT; los
+    que ya estaban se ignoran
+
+    Todo ocurre en una transacción con el lock de escritura tomado desde el
+    principio, y el índice único (lista_id, contenido_id) con ON CONFLICT DO
+    NOTHING descarta el mismo contenido añadido a la vez por otra petición
+
+    Raises:
+        HTTPException: 404 si la lista o alguno de los contenidos no existe;
+            409 si la lista pasaría de MAX_ITEMS_LISTA contenidos
+    """
+    bloquear_lista(db, lista_id)
+    pedidos = sin_repetidos(lote.contenido_ids)
+    existentes = set(db.scalars(select(ContenidoFormativo.id).where(ContenidoFormativo.id.in_(pedidos))))
+    desconocidos = [contenido_id for contenido_id in pedidos if contenido_id not in existentes]
+    if desconocidos:
+        raise HTTPException(status_code=404, detail=f"Contenidos no encontrados: {', '.join(desconocidos)}")
+
+    en_lista = set(db.scalars(
+        select(ItemLista.contenido_id).where(ItemLista.lista_id == lista_id, ItemLista.contenido_id.in_(pedidos))
+    ))
+    nuevos = [contenido_id for contenido_id in pedidos if contenido_id not in en_lista]
+    if nuevos:
+        siguiente, total = db.execute(
+            select(func.coalesce(func.max(ItemLista.orden) + 1, 0), func.count()).where(ItemLista.lista_id == lista_id)
+        ).one()
+        if total + len(nuevos) > MAX_ITEMS_LISTA:
+            raise HTTPException(status_code=409, detail=f"Una lista no puede tener más de {MAX_ITEMS_LISTA} contenidos")
+        ahora = datetime.now()
+        db.execute(
+            sqlite_insert(ItemLista).on_conflict_do_nothing(index_elements=["lista_id", "contenido_id"]),
+            [
+                {"lista_id": lista_id, "contenido_id": contenido_id, "orden": siguiente + i, "fecha_agregado": ahora}
+                for i, contenido_id in enumerate(nuevos)
+            ],
+        )
+    return cargar_lista(db, lista_id)
+
+@router.delete("/listas/{lista_id}/items", response_model=ListaRespuesta)
+def quitar_items(lista_id: int, lote: ContenidosLote, db: Session = Depends(get_db)):
+    """
+    Quita varios contenidos de la lista con un único DELETE; el orden de
+    los que quedan se conserva
+    """
+    bloquear_lista(db, lista_id)
+    db.execute(
+        delete(ItemLista).where(ItemLista.lista_id == lista_id, ItemLista.contenido_id.in_(lote.contenido_ids))
+    )
+    return cargar_lista(db, lista_id)
+
+@router.put("/listas/{lista_id}/items/orden", response_model=ListaRespuesta)
+def reordenar_items(lista_id: int, lote: OrdenLista, db: Session = Depends(get_db)):
+    """
+    Reordena la lista: `contenido_ids` debe contener exactamente sus
+    contenidos, en el orden nuevo (hasta MAX_ITEMS_LISTA, el máximo de una
+    lista). `orden` se reescribe con un único UPDATE (CASE contenido_id
+    WHEN ... THEN posición) con el lock de escritura tomado antes de leer
+    los contenidos actuales; ELSE deja el orden que tuviera cualquier otro
+
+    Raises:
+        HTTPException: 400 si `contenido_ids` no coincide con los contenidos de la lista
+    """
+    bloquear_lista(db, lista_id)
+    actuales = set(db.scalars(select(ItemLista.contenido_id).where(ItemLista.lista_id == lista_id)))
+    pedidos = lote.contenido_ids
+    if len(pedidos) != len(set(pedidos)) or set(pedidos) != actuales:
+        raise HTTPException(
+            status_code=400,
+            detail="contenido_ids debe contener cada contenido de la lista exactamente una vez",
+        )
+    db.execute(
+        update(ItemLista)
+        .where(ItemLista.lista_id == lista_id)
+        .values(orden=case(
+            {contenido_id: i for i, contenido_id in enumerate(pedidos)},
+            value=ItemLista.contenido_id,
+            else_=ItemLista.orden,
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    return cargar_lista(db, lista_id)
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 import logging
 from pydantic import BaseModel, Field
 from typing import Optional, List as TypeList
 
-from db.session import get_db_session
+from starlette.concurrency import run_in_threadpool
+
+from db.session import get_db_session, DB_PATH
 from app.recommender import ContentRecommender
+from app.singleflight import get_flight
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
+recommendation_flight = get_flight("recommendations")
 
 class Recomendacion(BaseModel):
     id: str
@@ -23,6 +27,7 @@ class Recomendacion(BaseModel):
     estado: str = "activo"
     relevancia: Optional[float] = Field(None, ge=0, le=1)
     match_razones: Optional[TypeList[str]] = Field(default_factory=list)
+    distancia_km: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -30,6 +35,9 @@ class Recomendacion(BaseModel):
 @router.get("/recommendations/{user_id}", response_model=List[Recomendacion])
 async def get_recommendations(
     user_id: int,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radio_km: Optional[float] = Query(None, gt=0),
     db: Session = Depends(get_db_session)
 ):
     """
@@ -37,6 +45,7 @@ async def get_recommendations(
     
     Args:
         user_id: ID del usuario
+        lat, lon, radio_km: Filtro opcional "cerca de mí"
         db: Sesión de base de datos
     
     Returns:
@@ -46,7 +55,7 @@ async def get_recommendations(
         logger.info(f"Solicitando recomendaciones para usuario {user_id}")
         
         try:
-            recommender = ContentRecommender()
+            recommender = ContentRecommender(db_path=DB_PATH)
         except Exception as e:
             logger.error(f"Error inicializando ContentRecommender: {str(e)}")
             raise HTTPException(
@@ -54,7 +63,11 @@ async def get_recommendations(
                 detail=f"Error inicializando el sistema de recomendaciones: {str(e)}"
             )
             
-        recommendations = recommender.generate(user_id)
+        # Peticiones simultáneas para el mismo usuario comparten el cálculo
+        recommendations = await recommendation_flight.do(
+            (user_id, lat, lon, radio_km),
+            lambda: run_in_threadpool(recommender.generate, user_id, lat=lat, lon=lon, radio_km=radio_km)
+        )
         
         if isinstance(recommendations, dict) and recommendations.get("error"):
             logger.error(f"Error del recomendador: {recommendations['error']}")
@@ -78,7 +91,8 @@ async def get_recommendations(
                     precio=rec.get("precio"),
                     estado=rec.get("estado", "activo"),
                     relevancia=rec.get("relevancia"),
-                    match_razones=rec.get("match_razones", [])
+                    match_razones=rec.get("match_razones", []),
+                    distancia_km=rec.get("distancia_km")
                 )
                 validated_recommendations.append(validated_rec)
             except Exception as e:
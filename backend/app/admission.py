@@ -0,0 +1,341 @@
+"""
+Control de admisión para los endpoints que ocupan el backend del LLM
+
+Cada petición a /cb/query o /cb/audio-query puede tener ocupado TGI varios
+segundos. En lugar de aceptar todo y dejar que se acumule hasta que todo
+expire, el controlador:
+
+- limita las peticiones de cada cliente con un token bucket (429),
+- deja pasar como mucho `max_concurrency` a la vez y encola hasta
+  `max_queue` más, ordenadas por carril de prioridad,
+- rechaza de inmediato (503) lo que ya no cabe en la cola o no podría
+  terminar antes de su deadline, y descarta de la cola lo que caduca
+  mientras espera.
+
+Los rechazos llevan `retry_after` en segundos para la cabecera Retry-After.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_CLIENT_RATE = float(os.getenv("LLM_CLIENT_RATE", "1.0"))
+LLM_CLIENT_BURST = float(os.getenv("LLM_CLIENT_BURST", "5"))
+LLM_DEFAULT_DEADLINE = float(os.getenv("LLM_DEFAULT_DEADLINE", "30"))
+
+# Carriles de prioridad: un número menor sale antes de la cola
+LANES = {"interactive": 0, "batch": 1}
+DEFAULT_LANE = "interactive"
+
+# Peso de la última petición en la media móvil del tiempo de servicio
+SERVICE_TIME_ALPHA = 0.2
+
+
+# Trabajo que sigue usando el recurso después de que `run` haya devuelto
+# (p. ej. un hilo cuyo resultado se descartó por timeout); el hueco no se
+# libera hasta que termine
+_lingering: contextvars.ContextVar = contextvars.ContextVar("admission_lingering", default=None)
+
+
+def hold_slot(future: "asyncio.Future") -> None:
+    """
+    Mantiene ocupado el hueco de la ejecución admitida en curso hasta que
+    termine `future`; fuera de `AdmissionController.run` no hace nada
+    """
+    pendientes = _lingering.get()
+    if pendientes is not None:
+        pendientes.append(future)
+
+
+class Rejected(Exception):
+    """La petición no se admite; `status_code` y `retry_after` van a la respuesta"""
+
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimited(Rejected):
+    status_code = 429
+
+
+class Overloaded(Rejected):
+    status_code = 503
+
+
+class TokenBucket:
+    """
+    `rate` peticiones por segundo con ráfagas de hasta `burst`
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Consume un token si hay
+
+        Returns:
+            float: 0 si se consumió, si no los segundos hasta el siguiente token
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "deadline", "future", "alive", "granted")
+
+    def __init__(self, priority: int, seq: int, deadline: Optional[float], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.future = future
+        self.alive = True
+        self.granted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _resolve(future: asyncio.Future, exc: Optional[BaseException] = None) -> None:
+    # El waiter puede pertenecer a otro bucle de eventos que el que libera
+    def resolver():
+        if not future.done():
+            if exc is None:
+                future.set_result(None)
+            else:
+                future.set_exception(exc)
+
+    future.get_loop().call_soon_threadsafe(resolver)
+
+
+class AdmissionController:
+    """
+    Cola con prioridades y límite de concurrencia delante de un recurso lento
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        client_rate: float = LLM_CLIENT_RATE,
+        client_burst: float = LLM_CLIENT_BURST,
+        initial_service_time: float = 1.0,
+        max_clients: int = 10_000,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.service_time = initial_service_time
+        self.max_clients = max_clients
+
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.active = 0
+        self.queued: Dict[str, int] = {lane: 0 for lane in LANES}
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self.dropped_deadline = 0
+        self.evicted = 0
+        # Ejecuciones que devolvieron antes de que terminara todo su trabajo
+        self.lingering = 0
+
+    def check_rate(self, client: str) -> None:
+        """
+        Aplica el límite por cliente
+
+        Raises:
+            RateLimited: Si el cliente ha agotado su cupo
+        """
+        if self.client_rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            espera = bucket.take(now)
+            if espera:
+                self.rate_limited += 1
+        if espera:
+            raise RateLimited(f"Demasiadas peticiones de {client}", espera)
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        lane: str = DEFAULT_LANE,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Ejecuta `fn()` cuando haya hueco, respetando carril y deadline
+
+        Args:
+            fn: Función que crea la corrutina que usa el recurso
+            lane: Carril de prioridad (ver LANES)
+            deadline: Instante (time.monotonic) a partir del cual ya no sirve la respuesta
+
+        Raises:
+            Overloaded: Si la cola está llena o la petición no llegaría a tiempo
+        """
+        await self._acquire(lane, deadline)
+        inicio = time.monotonic()
+        pendientes: List[asyncio.Future] = []
+        token = _lingering.set(pendientes)
+        try:
+            return await fn()
+        finally:
+            _lingering.reset(token)
+            pendientes = [f for f in pendientes if not f.done()]
+            if not pendientes:
+                self._release(time.monotonic() - inicio)
+            else:
+                self.lingering += 1
+                asyncio.gather(*pendientes, return_exceptions=True).add_done_callback(
+                    lambda _: self._release(time.monotonic() - inicio)
+                )
+
+    def _expected_wait(self, posicion: int) -> float:
+        return (posicion // self.max_concurrency + 1) * self.service_time
+
+    async def _acquire(self, lane: str, deadline: Optional[float]) -> None:
+        prioridad = LANES[lane]
+        now = time.monotonic()
+        with self._lock:
+            if self.active < self.max_concurrency and not sum(self.queued.values()):
+                if deadline is not None and now + self.service_time > deadline:
+                    self.rejected_deadline += 1
+                    raise Overloaded("La petición no terminaría antes de su deadline", self.service_time)
+                self.active += 1
+                self.admitted += 1
+                return
+
+            delante = sum(1 for w in self._queue if w.alive and w.priority <= prioridad)
+            espera = self._expected_wait(delante)
+            if deadline is not None and now + espera + self.service_time > deadline:
+                self.rejected_deadline += 1
+                raise Overloaded("La petición no terminaría antes de su deadline", espera)
+            if sum(self.queued.values()) >= self.max_queue:
+                peor = max((w for w in self._queue if w.alive), default=None, key=lambda w: (w.priority, w.seq))
+                if peor is None or peor.priority <= prioridad:
+                    self.rejected_full += 1
+                    raise Overloaded("Cola del LLM llena", espera)
+                # Un carril más prioritario desplaza al último de uno menos prioritario
+                self._remove(peor)
+                self.evicted += 1
+                _resolve(peor.future, Overloaded("Desplazada por una petición más prioritaria", espera))
+
+            waiter = _Waiter(prioridad, next(self._seq), deadline, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._queue, waiter)
+            self.queued[lane] += 1
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.alive:
+                    self._remove(waiter)
+            # Si el hueco ya se le había concedido, pasa al siguiente
+            if waiter.granted:
+                self._release(None)
+            raise
+
+    def _remove(self, waiter: _Waiter) -> None:
+        waiter.alive = False
+        lane = next(nombre for nombre, p in LANES.items() if p == waiter.priority)
+        self.queued[lane] -= 1
+
+    def _release(self, duracion: Optional[float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if duracion is not None:
+                self.service_time += SERVICE_TIME_ALPHA * (duracion - self.service_time)
+            while self._queue:
+                waiter = heapq.heappop(self._queue)
+                if not waiter.alive:
+                    continue
+                self._remove(waiter)
+                if waiter.deadline is not None and now + self.service_time > waiter.deadline:
+                    # Ya no puede terminar a tiempo: mejor liberar al cliente ahora
+                    self.dropped_deadline += 1
+                    _resolve(waiter.future, Overloaded("Deadline agotado en la cola", self.service_time))
+                    continue
+                # El hueco pasa directamente al siguiente, `active` no cambia
+                waiter.granted = True
+                self.admitted += 1
+                _resolve(waiter.future)
+                return
+            self.active -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": dict(self.queued),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "service_time_ms": 1000 * self.service_time,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "rejected_full": self.rejected_full,
+                "rejected_deadline": self.rejected_deadline,
+                "dropped_deadline": self.dropped_deadline,
+                "evicted": self.evicted,
+                "lingering": self.lingering,
+            }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_controller(name: str) -> AdmissionController:
+    """
+    Controlador compartido por nombre dentro del proceso
+    """
+    if name not in _controllers:
+        _controllers[name] = AdmissionController(name)
+    return _controllers[name]
+
+
+def stats() -> Dict[str, Dict]:
+    return {name: controller.stats() for name, controller in _controllers.items()}
@@ -1,54 +1,108 @@
 
 
+import functools
 import os
-from fastapi import HTTPException, APIRouter, UploadFile, File
-from openai import OpenAI
-from langsmith.wrappers import wrap_openai
-from langsmith import traceable
-from pydantic import BaseModel
-from dotenv import load_dotenv
+from fastapi import HTTPException, APIRouter, UploadFile, File, Depends, Request
+from pydantic import BaseModel, Field
 import sqlite3
-from typing import List, Dict
-import requests
+from typing import Hashable, List, Dict, Optional, Tuple
 import logging
-logger = logging.getLogger(__name__)
+import time
+
+from starlette.concurrency import run_in_threadpool
 
+from app import admission, geo, retrieval_cache, search, snapshot, tracing
+from app.llm_router import Backend, LLMRouter, parse_urls
+from app.pipeline import Pipeline, Stage
+from app.singleflight import get_flight, question_key
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# openai, requests y dotenv se importan en el primer uso: cargarlos
+# al importar el módulo alargaba el arranque y exigía la configuración del LLM
+# incluso a los endpoints que no lo usan
 
 router = APIRouter()
+query_flight = get_flight("cb_query")
+llm_admission = admission.get_controller("llm")
+
 
-HF_TOKEN = os.getenv("HF_TOKEN")
-BASE_URL = os.getenv("BASE_URL")
-WHISPER_API_URL = os.getenv("WHISPER_API_URL")
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Dict[str, Optional[str]]:
+    """
+    Lee la configuración del LLM y de Whisper (carga el .env la primera vez)
+    """
+    from dotenv import load_dotenv
 
-if not HF_TOKEN or not BASE_URL:
-    raise ValueError("HF_TOKEN, BASE_URL and WHISPER_API_URL must be set in the .env file")
+    load_dotenv()
+    return {
+        "HF_TOKEN": os.getenv("HF_TOKEN"),
+        "BASE_URL": os.getenv("BASE_URL"),
+        "BASE_URLS": os.getenv("BASE_URLS"),
+        "WHISPER_API_URL": os.getenv("WHISPER_API_URL"),
+    }
 
-client = wrap_openai(OpenAI(
-    base_url=f"{BASE_URL}/v1/",
-    api_key=HF_TOKEN
-))
 
-whisper_headers = {
-    "Accept": "application/json",
-    "Authorization": f"Bearer {HF_TOKEN}",
-    "Content-Type": "audio/wav",
-}
+@functools.lru_cache(maxsize=None)
+def get_router() -> LLMRouter:
+    """
+    Router sobre las réplicas de TGI (BASE_URLS separadas por comas, o BASE_URL)
+    """
+    settings = get_settings()
+    urls = parse_urls(settings["BASE_URLS"]) or parse_urls(settings["BASE_URL"])
+    if not settings["HF_TOKEN"] or not urls:
+        raise ValueError("HF_TOKEN, BASE_URL and WHISPER_API_URL must be set in the .env file")
+    return LLMRouter([Backend(url, settings["HF_TOKEN"]) for url in urls])
+
+
+def router_stats() -> Dict:
+    # Sin crear el router si todavía nadie lo ha usado
+    return get_router().stats() if get_router.cache_info().currsize else {}
+
+
+def warm_up() -> None:
+    """
+    Crea los clientes del LLM por adelantado para que la primera pregunta no
+    pague las importaciones
+    """
+    try:
+        for backend in get_router().backends:
+            backend.client
+        logger.info("Clientes del LLM inicializados")
+    except ValueError as e:
+        logger.warning(f"Chatbot sin configurar: {e}")
+
 
 class QueryRequest(BaseModel):
     request: str
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    radio_km: Optional[float] = Field(None, gt=0)
+    usuario_id: Optional[int] = None
 
 class QueryResponse(BaseModel):
     answer: str
     categories: List[str] = []
 
-DB_PATH = './db/jaa.sqlite'
+DB_PATH = os.getenv("JAA_DB_PATH", './db/jaa.sqlite')
+
+# Timeouts (segundos) de las etapas de query_rag
+RAG_DB_TIMEOUT = float(os.getenv("RAG_DB_TIMEOUT", "5"))
+RAG_CLASSIFY_TIMEOUT = float(os.getenv("RAG_CLASSIFY_TIMEOUT", "20"))
+RAG_ANSWER_TIMEOUT = float(os.getenv("RAG_ANSWER_TIMEOUT", "60"))
 
 def transcribe_audio(file: UploadFile):
     try:
+        import requests
+
+        settings = get_settings()
+        whisper_headers = {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {settings['HF_TOKEN']}",
+            "Content-Type": "audio/wav",
+        }
         with file.file as audio_data:
-            response = requests.post(WHISPER_API_URL, headers=whisper_headers, data=audio_data.read())
+            response = requests.post(settings["WHISPER_API_URL"], headers=whisper_headers, data=audio_data.read())
         response.raise_for_status()
         transcription = response.json().get("text", "")
         if not transcription:
@@ -57,82 +111,231 @@ def transcribe_audio(file: UploadFile):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio transcription error: {str(e)}")
 
+def llm_ticket(http_request: Request) -> Dict:
+    """
+    Dependencia de los endpoints del LLM: aplica el límite por cliente y
+    devuelve el carril y el deadline con los que se encolará la petición
+
+    El carril se elige con la cabecera X-Request-Priority (interactive o
+    batch) y el tiempo máximo con X-Request-Deadline-Ms.
+    """
+    reenviado = http_request.headers.get("X-Forwarded-For")
+    cliente = reenviado.split(",")[0].strip() if reenviado else (http_request.client.host if http_request.client else "?")
+    try:
+        llm_admission.check_rate(cliente)
+    except admission.Rejected as e:
+        raise rejected(e)
+
+    lane = http_request.headers.get("X-Request-Priority", admission.DEFAULT_LANE)
+    if lane not in admission.LANES:
+        raise HTTPException(status_code=400, detail=f"Prioridad desconocida: {lane}")
+    try:
+        presupuesto = float(http_request.headers.get("X-Request-Deadline-Ms", 1000 * admission.LLM_DEFAULT_DEADLINE)) / 1000
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Request-Deadline-Ms debe ser un número")
+    return {"lane": lane, "deadline": time.monotonic() + presupuesto}
+
+def rejected(e: admission.Rejected) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": e.retry_after_header})
+
+async def answer_admitted(request: QueryRequest, ticket: Dict):
+    # Preguntas idénticas que llegan a la vez comparten una sola ejecución,
+    # que es la única que ocupa un hueco del LLM. Solo se agrupan las del
+    # mismo carril, para que una petición batch no adelante ni retrase a
+    # una interactiva
+    key = question_key(request.request, request.lat, request.lon, request.radio_km, request.usuario_id, ticket["lane"])
+    propia = False
+
+    def ejecutar():
+        nonlocal propia
+        propia = True
+        return llm_admission.run(lambda: answer_question(request), **ticket)
+
+    try:
+        return await query_flight.do(key, ejecutar)
+    except admission.Rejected:
+        if propia:
+            raise
+        # Se rechazó la ejecución de otra petición, con su deadline: se
+        # intenta una vez más con el propio
+        return await query_flight.do(key, ejecutar)
+
 @router.post("/audio-query", tags=["RAG"])
-async def audio_query(file: UploadFile = File(...)):
+async def audio_query(file: UploadFile = File(...), ticket: Dict = Depends(llm_ticket)):
     try:
-        transcription = transcribe_audio(file)
+        transcription = await llm_admission.run(lambda: run_in_threadpool(transcribe_audio, file), **ticket)
         
-        response = await query_rag(QueryRequest(request=transcription))
+        response = await answer_admitted(QueryRequest(request=transcription), ticket)
         
         return response
+    except admission.Rejected as e:
+        raise rejected(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/query", tags=["RAG"])
-async def query_rag(request: QueryRequest):
+async def query_rag(request: QueryRequest, ticket: Dict = Depends(llm_ticket)):
     try:
-        pregunta = request.request
-        categories = get_categories()
-        categories_str = ", ".join(categories)
-        logger.info(f"\n\n{categories_str}\n\n")
-        categories_text = ask(f"Contesta les respostes separades per *,*. Busca de les categories {categories_str} de les activitats les cuals es relacionen a la seguent pregunta.", pregunta)
-
-        cat = [c.strip() for c in categories_text.split(",")]
-
-        activities = sql_query(cat)
-        logger.info(f"\n\n{activities}\n\n")
-        answer = ""
-        if not activities:
-            answer = ask(pregunta, f"No hi han activitats, no contestis sobre les activitats.")
-        else:
-            activities_str = "; ".join([f"{activity['titol']} - {activity['descripcio']} ({activity['tipo']} {activity['modalidad']} {activity['nivel']} {activity['rating']} {activity['precio']} {activity['estado']} )" for activity in activities])
-            answer = ask(f"Ets un expert en activitats. Aqui tens les activitats: {activities_str}. Contesta la pregunta de l'usuari.", pregunta)
-
-        
-
-        return [{"answer": answer, "activitats": activities}]
+        return await answer_admitted(request, ticket)
+    except admission.Rejected as e:
+        raise rejected(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@traceable
+def stage_categorias(ctx: Dict) -> List[str]:
+    return get_categories()
+
+def stage_clasificar(ctx: Dict) -> List[str]:
+    categories_str = ", ".join(ctx["categorias"])
+    logger.info(f"\n\n{categories_str}\n\n")
+    categories_text = ask(f"Contesta les respostes separades per *,*. Busca de les categories {categories_str} de les activitats les cuals es relacionen a la seguent pregunta.", ctx["request"].request)
+    return [c.strip() for c in categories_text.split(",")]
+
+def stage_palabras_clave(ctx: Dict) -> List[Dict]:
+    request = ctx["request"]
+    # La búsqueda por texto no sabe filtrar por distancia
+    if request.lat is not None and request.lon is not None and request.radio_km is not None:
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return search.search_contenido(conn, request.request)
+    finally:
+        conn.close()
+
+# Áreas de interés del primer perfil del usuario
+PERFIL_SQL = """
+SELECT c.nombre
+FROM perfil_intereses AS pi
+JOIN categorias AS c ON c.id = pi.categoria_id
+WHERE pi.perfil_id = (SELECT id FROM perfiles WHERE usuario_id = ? ORDER BY id LIMIT 1)
+  AND pi.origen = 'area'
+ORDER BY c.nombre
+"""
+
+def stage_perfil(ctx: Dict) -> List[str]:
+    usuario_id = ctx["request"].usuario_id
+    if usuario_id is None:
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(PERFIL_SQL, (usuario_id,)).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+def stage_recuperar(ctx: Dict) -> List[Dict]:
+    request = ctx["request"]
+    # Sin clasificación se buscan las áreas de interés del perfil
+    cat = ctx["clasificar"] or ctx["perfil"]
+    activities = sql_query(cat, lat=request.lat, lon=request.lon, radio_km=request.radio_km) if cat else []
+    if not activities:
+        activities = ctx["palabras_clave"]
+    logger.info(f"\n\n{activities}\n\n")
+    return activities
+
+def stage_responder(ctx: Dict) -> str:
+    pregunta = ctx["request"].request
+    activities = ctx["recuperar"]
+    if not activities:
+        return ask(pregunta, f"No hi han activitats, no contestis sobre les activitats.")
+    activities_str = "; ".join([f"{activity['titulo']} - {activity['descripcion']} ({activity['tipo']} {activity['modalidad']} {activity['nivel']} {activity['rating']} {activity['precio']} {activity['estado']} )" for activity in activities])
+    interessos = f" A l'usuari l'interessa: {', '.join(ctx['perfil'])}." if ctx["perfil"] else ""
+    return ask(f"Ets un expert en activitats. Aqui tens les activitats: {activities_str}.{interessos} Contesta la pregunta de l'usuari.", pregunta)
+
+# Categorías, búsqueda por texto y perfil no dependen entre sí y corren a la
+# vez; si la clasificación falla o tarda, se responde sin filtro de categoría
+rag_pipeline = Pipeline("query_rag", [
+    Stage("categorias", stage_categorias, timeout=RAG_DB_TIMEOUT),
+    Stage("palabras_clave", stage_palabras_clave, timeout=RAG_DB_TIMEOUT, fallback=lambda ctx, e: []),
+    Stage("perfil", stage_perfil, timeout=RAG_DB_TIMEOUT, fallback=lambda ctx, e: []),
+    Stage("clasificar", stage_clasificar, deps=["categorias"], timeout=RAG_CLASSIFY_TIMEOUT, fallback=lambda ctx, e: []),
+    Stage("recuperar", stage_recuperar, deps=["clasificar", "palabras_clave", "perfil"], timeout=RAG_DB_TIMEOUT),
+    Stage("responder", stage_responder, deps=["recuperar", "perfil"], timeout=RAG_ANSWER_TIMEOUT),
+])
+
+@tracing.traceable(name="query_rag")
+async def answer_question(request: QueryRequest):
+    resultados = await rag_pipeline.run({"request": request})
+    logger.info(f"Tiempos de query_rag: {resultados['_timings']}")
+    return [{"answer": resultados["responder"], "activitats": resultados["recuperar"]}]
+
+@tracing.traceable
 def ask(prompt: str, question: str) -> str:
         messages = [
             {"role": "system", "content": prompt},
             {"role": "user", "content": question}
         ]
 
-        chat_completion = client.chat.completions.create(
-            model="tgi",
-            messages=messages,
-            max_tokens=1000
-        )
+        with tracing.span("chat.completions", run_type="llm", messages=messages) as span:
+            chat_completion = get_router().complete(
+                model="tgi",
+                messages=messages,
+                max_tokens=1000
+            )
+            answer = chat_completion.choices[0].message.content
+            span.set_outputs(content=answer)
+            if chat_completion.usage is not None:
+                span.set_metadata(usage=chat_completion.usage.model_dump())
 
-        return chat_completion.choices[0].message.content
+        return answer
 
-def get_categories():
+CATEGORIAS_ACTIVAS_SQL = "SELECT nombre FROM categorias WHERE activa = 1"
 
+def get_categories():
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    query = "SELECT nombre FROM categorias WHERE activa = 1"
-    
-    cursor.execute(query)
-    
-    resultats = cursor.fetchall()
-    
-    conn.close()
+    try:
+        snap = snapshot.current_for(conn)
+        if snap is not None:
+            return snap.categorias_activas()
+
+        cursor = conn.cursor()
+        
+        cursor.execute(CATEGORIAS_ACTIVAS_SQL)
+        
+        resultats = cursor.fetchall()
+    finally:
+        conn.close()
     
     noms_categories = [row[0] for row in resultats]
     
     return noms_categories
 
 
-def sql_query(nombres_categorias):
+def sql_query(nombres_categorias, lat: Optional[float] = None, lon: Optional[float] = None, radio_km: Optional[float] = None):
 
+    cerca = lat is not None and lon is not None and radio_km is not None
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    query = """
+    try:
+        # Un snapshot de otra versión del catálogo se ignora: se consulta SQLite
+        snap = None if cerca else snapshot.current_for(conn)
+        if snap is not None:
+            return snap.contenido_por_categorias(nombres_categorias)
+
+        # El resultado no depende del orden de las categorías (GROUP BY cf.id)
+        clave = (tuple(sorted(set(nombres_categorias))), lat, lon, radio_km)
+        return retrieval_cache.get_cache(DB_PATH).get_or_load(
+            conn, clave, lambda: consultar_contenido(conn, nombres_categorias, lat, lon, radio_km)
+        )
+    finally:
+        conn.close()
+
+
+def contenido_query(n_categorias: int, near_clause: Optional[str] = None) -> str:
+    """
+    SQL de `consultar_contenido` para `n_categorias` nombres; con
+    `near_clause` (de `geo.near_filter` con alias "r") filtra por el R*Tree
+    y añade latitud y longitud antes del ID
+    """
+    near_columns = near_join = near_where = ""
+    if near_clause is not None:
+        near_columns = ",\n        u.latitud,\n        u.longitud"
+        near_join = f"""
+    JOIN {geo.RTREE_TABLE} AS r ON r.id = cf.ubicacion_id
+    JOIN ubicaciones AS u ON u.id = r.id"""
+        near_where = f" AND {near_clause}"
+    return """
     SELECT 
         cf.titulo,
         cf.descripcion,
@@ -141,19 +344,50 @@ def sql_query(nombres_categorias):
         cf.nivel,
         cf.rating,
         cf.precio,
-        cf.estado
+        cf.estado{near_columns},
+        cf.id
     FROM contenido_formativo AS cf
     JOIN contenido_categorias AS cc ON cf.id = cc.contenido_id
-    JOIN categorias AS c ON cc.categoria_id = c.id
-    WHERE c.nombre IN ({placeholders})
+    JOIN categorias AS c ON cc.categoria_id = c.id{near_join}
+    WHERE c.nombre IN ({placeholders}){near_where}
     GROUP BY cf.id
-    """.format(placeholders=", ".join("?" for _ in nombres_categorias))
+    """.format(
+        placeholders=", ".join("?" for _ in range(n_categorias)),
+        near_columns=near_columns,
+        near_join=near_join,
+        near_where=near_where,
+    )
+
+
+def consultar_contenido(conn: sqlite3.Connection, nombres_categorias, lat: Optional[float], lon: Optional[float], radio_km: Optional[float]) -> List[Tuple[Hashable, Dict]]:
+    """
+    Consulta de `sql_query`, sin caché
+
+    Returns:
+        List[Tuple[Hashable, Dict]]: (identidad, fila); la identidad es el ID
+        del contenido, con la distancia si se filtra por cercanía
+    """
+    cerca = lat is not None and lon is not None and radio_km is not None
+    cursor = conn.cursor()
+    near_clause = None
+    near_params = []
+    if cerca:
+        geo.ensure_rtree_once(conn, DB_PATH)
+        near_clause, near_params = geo.near_filter("r", lat, lon, radio_km)
+    query = contenido_query(len(nombres_categorias), near_clause)
     
-    cursor.execute(query, nombres_categorias)
+    cursor.execute(query, list(nombres_categorias) + near_params)
     
     resultados = cursor.fetchall()
-    
-    conn.close()
+
+    distancias = None
+    if cerca and resultados:
+        orden, distancias = geo.rank_by_distance(
+            lat, lon, radio_km,
+            [row[8] for row in resultados],
+            [row[9] for row in resultados],
+        )
+        resultados = [resultados[i] for i in orden]
     
     contenido_formativo = [
         {
@@ -168,5 +402,12 @@ def sql_query(nombres_categorias):
         }
         for row in resultados
     ]
+
+    if distancias is not None:
+        for activity, distancia in zip(contenido_formativo, distancias):
+            activity["distancia_km"] = round(float(distancia), 3)
     
-    return contenido_formativo
+    # La identidad deja compartir las filas en la caché de recuperación
+    if distancias is not None:
+        return [((row[-1], activity["distancia_km"]), activity) for row, activity in zip(resultados, contenido_formativo)]
+    return [(row[-1], activity) for row, activity in zip(resultados, contenido_formativo)]
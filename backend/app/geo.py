@@ -0,0 +1,239 @@
+import logging
+import math
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+RTREE_TABLE = "ubicaciones_rtree"
+
+# El R*Tree guarda un punto por ubicación (min == max) y se mantiene
+# sincronizado con `ubicaciones` mediante triggers. SQLite almacena las
+# coordenadas del R*Tree en float32, así que solo se usa para acotar la caja;
+# las distancias se calculan con las coordenadas exactas de `ubicaciones`.
+RTREE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(
+        id, min_lat, max_lat, min_lon, max_lon
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS ubicaciones_rtree_ai AFTER INSERT ON ubicaciones
+    WHEN NEW.latitud IS NOT NULL AND NEW.longitud IS NOT NULL
+    BEGIN
+        INSERT OR REPLACE INTO {RTREE_TABLE} VALUES (
+            NEW.id, NEW.latitud, NEW.latitud, NEW.longitud, NEW.longitud
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS ubicaciones_rtree_au AFTER UPDATE OF latitud, longitud ON ubicaciones
+    BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+        INSERT INTO {RTREE_TABLE}
+        SELECT NEW.id, NEW.latitud, NEW.latitud, NEW.longitud, NEW.longitud
+        WHERE NEW.latitud IS NOT NULL AND NEW.longitud IS NOT NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS ubicaciones_rtree_ad AFTER DELETE ON ubicaciones
+    BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+    END
+    """,
+]
+
+
+RTREE_BACKFILL = f"""
+    INSERT OR REPLACE INTO {RTREE_TABLE}
+    SELECT id, latitud, latitud, longitud, longitud
+    FROM ubicaciones
+    WHERE latitud IS NOT NULL AND longitud IS NOT NULL
+"""
+
+
+def ensure_rtree(conn: sqlite3.Connection) -> None:
+    """
+    Crea el índice espacial sobre `ubicaciones` si no existe y lo rellena
+
+    Args:
+        conn: Conexión SQLite con la tabla `ubicaciones` ya creada
+    """
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (RTREE_TABLE,)
+    ).fetchone()
+    for ddl in RTREE_DDL:
+        conn.execute(ddl)
+    if not existed:
+        conn.execute(RTREE_BACKFILL)
+        logger.info("Índice espacial de ubicaciones creado")
+    conn.commit()
+
+
+def bounding_box(lat: float, lon: float, radio_km: float) -> Tuple[float, float, float, float]:
+    """
+    Calcula la caja (min_lat, max_lat, min_lon, max_lon) que contiene el círculo
+
+    La caja es conservadora: todo punto a menos de `radio_km` cae dentro,
+    pero las esquinas pueden quedar fuera del radio.
+    """
+    delta_lat = math.degrees(radio_km / EARTH_RADIUS_KM)
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lon = math.degrees(radio_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if delta_lon >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - delta_lon, lon + delta_lon
+
+
+def haversine_km(lat: float, lon: float, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """
+    Distancia en km desde (lat, lon) a cada punto, vectorizada con NumPy
+    """
+    lat1 = math.radians(lat)
+    lats2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lats2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64)) - math.radians(lon)
+    a = np.sin(dlat / 2.0) ** 2 + math.cos(lat1) * np.cos(lats2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _bbox_clause(alias: str, bbox: Tuple[float, float, float, float]) -> Tuple[str, List[float]]:
+    min_lat, max_lat, min_lon, max_lon = bbox
+    if min_lon < -180.0 or max_lon > 180.0:
+        # La caja cruza el antimeridiano: se parte en dos rangos de longitud
+        clause = (
+            f"{alias}.max_lat >= ? AND {alias}.min_lat <= ? "
+            f"AND ({alias}.max_lon >= ? OR {alias}.min_lon <= ?)"
+        )
+        if min_lon < -180.0:
+            return clause, [min_lat, max_lat, min_lon + 360.0, max_lon]
+        return clause, [min_lat, max_lat, min_lon, max_lon - 360.0]
+    clause = (
+        f"{alias}.max_lat >= ? AND {alias}.min_lat <= ? "
+        f"AND {alias}.max_lon >= ? AND {alias}.min_lon <= ?"
+    )
+    return clause, [min_lat, max_lat, min_lon, max_lon]
+
+
+def near_filter(alias: str, lat: float, lon: float, radio_km: float) -> Tuple[str, List[float]]:
+    """
+    Fragmento SQL que filtra por la caja del círculo usando el R*Tree
+
+    Args:
+        alias: Alias de `ubicaciones_rtree` en la consulta
+        lat, lon: Centro de la búsqueda
+        radio_km: Radio en kilómetros
+
+    Returns:
+        Tuple[str, List[float]]: Condición WHERE y sus parámetros
+    """
+    return _bbox_clause(alias, bounding_box(lat, lon, radio_km))
+
+
+def rank_by_distance(
+    lat: float,
+    lon: float,
+    radio_km: float,
+    lats: Sequence[float],
+    lons: Sequence[float],
+    limit: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ordena candidatos por distancia y descarta los que quedan fuera del radio
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Posiciones de los candidatos
+        seleccionados (ordenados de más cerca a más lejos) y sus distancias
+    """
+    distancias = haversine_km(lat, lon, lats, lons)
+    dentro = np.flatnonzero(distancias <= radio_km)
+    if limit is not None and limit < dentro.size:
+        parcial = np.argpartition(distancias[dentro], limit)[:limit]
+        dentro = dentro[parcial]
+    orden = dentro[np.argsort(distancias[dentro], kind="stable")]
+    return orden, distancias[orden]
+
+
+# `near` es la condición de `near_filter` con alias "r". El CROSS JOIN fija
+# el orden de los JOIN en SQLite para que la búsqueda empiece siempre por
+# el R*Tree
+NEARBY_UBICACIONES_SQL = f"""
+SELECT u.id, u.latitud, u.longitud
+FROM {RTREE_TABLE} AS r
+CROSS JOIN ubicaciones AS u ON u.id = r.id
+WHERE {{near}}
+"""
+NEARBY_CONTENIDO_SQL = f"""
+SELECT cf.id, u.latitud, u.longitud
+FROM {RTREE_TABLE} AS r
+CROSS JOIN ubicaciones AS u ON u.id = r.id
+JOIN contenido_formativo AS cf ON cf.ubicacion_id = r.id
+WHERE {{near}}
+"""
+
+
+def nearby_ubicaciones(
+    conn: sqlite3.Connection,
+    lat: float,
+    lon: float,
+    radio_km: float,
+    limit: Optional[int] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Ubicaciones a menos de `radio_km` de (lat, lon), de más cerca a más lejos
+
+    Returns:
+        List[Tuple[int, float]]: Pares (ubicacion_id, distancia_km)
+    """
+    clause, params = near_filter("r", lat, lon, radio_km)
+    rows = conn.execute(NEARBY_UBICACIONES_SQL.format(near=clause), params).fetchall()
+    if not rows:
+        return []
+    candidatos = np.asarray(rows, dtype=np.float64)
+    orden, distancias = rank_by_distance(
+        lat, lon, radio_km, candidatos[:, 1], candidatos[:, 2], limit
+    )
+    return [(int(candidatos[i, 0]), float(d)) for i, d in zip(orden, distancias)]
+
+
+def nearby_contenido(
+    conn: sqlite3.Connection,
+    lat: float,
+    lon: float,
+    radio_km: float,
+    limit: Optional[int] = None,
+) -> List[Tuple[str, float]]:
+    """
+    Contenidos formativos cuya ubicación está a menos de `radio_km`
+
+    Returns:
+        List[Tuple[str, float]]: Pares (contenido_id, distancia_km) ordenados
+    """
+    clause, params = near_filter("r", lat, lon, radio_km)
+    rows = conn.execute(NEARBY_CONTENIDO_SQL.format(near=clause), params).fetchall()
+    if not rows:
+        return []
+    ids = [row[0] for row in rows]
+    coords = np.asarray([row[1:] for row in rows], dtype=np.float64)
+    orden, distancias = rank_by_distance(lat, lon, radio_km, coords[:, 0], coords[:, 1], limit)
+    return [(ids[i], float(d)) for i, d in zip(orden, distancias)]
+
+
+_rtree_listo = set()
+
+
+def ensure_rtree_once(conn: sqlite3.Connection, db_path: str) -> None:
+    """
+    Igual que `ensure_rtree`, pero solo la primera vez por base de datos
+    """
+    if db_path in _rtree_listo:
+        return
+    ensure_rtree(conn)
+    _rtree_listo.add(db_path)
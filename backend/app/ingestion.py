@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.popularity import get_popularity
+from db.session import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "20000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))
+
+COLUMNS = (
+    "usuario_id",
+    "contenido_id",
+    "tipo",
+    "tiempo_consumido",
+    "progreso",
+    "valoracion",
+    "fecha",
+    "metadatos",
+    "created_at",
+)
+
+INSERT_SQL = "INSERT INTO interacciones ({columns}) VALUES ({placeholders})".format(
+    columns=", ".join(COLUMNS),
+    placeholders=", ".join("?" for _ in COLUMNS),
+)
+
+# Callback ejecutado dentro de la transacción de cada lote escrito, en su
+# propio savepoint: si falla se deshace solo lo suyo y el lote se escribe igual
+FlushHook = Callable[[sqlite3.Connection, Sequence[tuple]], None]
+
+
+class IngestionQueueFull(Exception):
+    """El buffer de interacciones no admite más eventos por ahora"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Cola de interacciones llena")
+        self.retry_after = retry_after
+
+
+def to_row(evento: Dict) -> tuple:
+    """
+    Convierte un evento de interacción en una fila de `interacciones`
+    """
+    fecha = evento.get("fecha") or datetime.now()
+    metadatos = evento.get("metadatos")
+    return (
+        evento["usuario_id"],
+        evento["contenido_id"],
+        evento["tipo"],
+        evento.get("tiempo_consumido"),
+        evento.get("progreso"),
+        evento.get("valoracion"),
+        fecha.isoformat(sep=" ") if isinstance(fecha, datetime) else fecha,
+        json.dumps(metadatos) if metadatos is not None else None,
+        datetime.utcnow().isoformat(sep=" "),
+    )
+
+
+class InteractionBuffer:
+    """
+    Buffer en memoria que escribe las interacciones en lotes (write-behind)
+
+    Los eventos se encolan sin tocar la base de datos y un hilo escritor los
+    vuelca a `interacciones` en una transacción por lote, cuando se juntan
+    `batch_size` eventos o el más antiguo lleva `flush_interval` segundos
+    esperando. Si la cola está llena, `submit` lanza `IngestionQueueFull`
+    en lugar de bloquear.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        max_queue: int = INGEST_QUEUE_SIZE,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        on_flush: Optional[List[FlushHook]] = None,
+    ):
+        self.db_path = db_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush: List[FlushHook] = list(on_flush or [])
+
+        self._pending: deque = deque()
+        self._oldest = 0.0
+        self._cond = threading.Condition()
+        self._written_cond = threading.Condition()
+        self._flush_requested = False
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.hook_errors = 0
+
+    def start(self) -> "InteractionBuffer":
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(
+                target=self._run, name="interaction-writer", daemon=True
+            )
+            self._thread.start()
+            logger.info("Escritor de interacciones iniciado")
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, eventos: Iterable[Dict]) -> int:
+        """
+        Encola eventos de interacción; o entran todos o ninguno
+
+        Returns:
+            int: Número de eventos encolados
+
+        Raises:
+            IngestionQueueFull: Si no hay sitio para todos los eventos
+        """
+        filas = [to_row(evento) for evento in eventos]
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("El buffer de interacciones está cerrado")
+            if len(self._pending) + len(filas) > self.max_queue:
+                self.rejected += len(filas)
+                raise IngestionQueueFull(retry_after=max(self.flush_interval, 1.0))
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend(filas)
+            self.enqueued += len(filas)
+            self._cond.notify()
+        return len(filas)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Fuerza la escritura de todo lo encolado hasta ahora y espera a que termine
+
+        Returns:
+            bool: False si se agotó el `timeout`
+        """
+        with self._cond:
+            objetivo = self.enqueued
+            self._flush_requested = True
+            self._cond.notify()
+        with self._written_cond:
+            return self._written_cond.wait_for(
+                lambda: self.written + self.failed >= objetivo or not self.running,
+                timeout,
+            )
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Deja de aceptar eventos, vuelca los pendientes y para el escritor
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info(f"Escritor de interacciones detenido: {self.stats()}")
+
+    def stats(self) -> Dict:
+        return {
+            "writer_alive": self.running,
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "hook_errors": self.hook_errors,
+        }
+
+    def _next_batch(self) -> List[tuple]:
+        with self._cond:
+            while True:
+                if self._closing or self._flush_requested or len(self._pending) >= self.batch_size:
+                    break
+                if self._pending:
+                    restante = self._oldest + self.flush_interval - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                else:
+                    self._cond.wait()
+            n = min(len(self._pending), self.batch_size)
+            lote = [self._pending.popleft() for _ in range(n)]
+            if not self._pending:
+                self._flush_requested = False
+            return lote
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while True:
+                lote = self._next_batch()
+                if lote:
+                    self._write(conn, lote)
+                with self._cond:
+                    if self._closing and not self._pending:
+                        break
+        finally:
+            conn.close()
+            with self._written_cond:
+                self._written_cond.notify_all()
+
+    def _write(self, conn: sqlite3.Connection, lote: List[tuple]) -> None:
+        try:
+            with conn:
+                conn.executemany(INSERT_SQL, lote)
+                self._run_hooks(conn, lote)
+            escritos = len(lote)
+        except sqlite3.IntegrityError as e:
+            logger.warning(f"Lote de {len(lote)} interacciones rechazado ({e}), reintentando fila a fila")
+            escritos = self._write_rows(conn, lote)
+        except Exception as e:
+            # Cualquier error descarta solo este lote: el escritor tiene que
+            # seguir vivo para los siguientes
+            logger.error(f"Error escribiendo {len(lote)} interacciones: {e!r}")
+            escritos = 0
+        with self._written_cond:
+            self.written += escritos
+            self.failed += len(lote) - escritos
+            self.batches += 1
+            self._written_cond.notify_all()
+
+    def _write_rows(self, conn: sqlite3.Connection, lote: List[tuple]) -> int:
+        # Un INSERT que viola una restricción solo deshace esa sentencia,
+        # así que las filas válidas se quedan en la misma transacción.
+        validas = []
+        try:
+            with conn:
+                for fila in lote:
+                    try:
+                        conn.execute(INSERT_SQL, fila)
+                        validas.append(fila)
+                    except sqlite3.IntegrityError as e:
+                        logger.error(f"Interacción descartada {fila[:3]}: {e}")
+                self._run_hooks(conn, validas)
+        except Exception as e:
+            logger.error(f"Error escribiendo {len(lote)} interacciones: {e!r}")
+            return 0
+        return len(validas)
+
+    def _run_hooks(self, conn: sqlite3.Connection, lote: Sequence[tuple]) -> None:
+        for hook in self.on_flush:
+            conn.execute("SAVEPOINT on_flush")
+            try:
+                hook(conn, lote)
+            except Exception as e:
+                conn.execute("ROLLBACK TO on_flush")
+                self.hook_errors += 1
+                logger.error(f"Hook {getattr(hook, '__qualname__', hook)} fallido con {len(lote)} interacciones: {e!r}")
+            conn.execute("RELEASE on_flush")
+
+
+_buffer: Optional[InteractionBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_interaction_buffer() -> InteractionBuffer:
+    """
+    Buffer de interacciones del proceso, creado y arrancado en el primer uso
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = InteractionBuffer(on_flush=[get_popularity(DB_PATH).on_flush]).start()
+    return _buffer
+
+
+def shutdown_interaction_buffer() -> None:
+    global _buffer
+    with _buffer_lock:
+        if _buffer is not None:
+            _buffer.close()
+            _buffer = None
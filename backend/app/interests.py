@@ -0,0 +1,390 @@
+"""
+Intereses de los perfiles normalizados e índice de bitsets en memoria
+
+`perfiles.areas_interes` y `perfiles.objetivos` son listas JSON de nombres
+de categoría. La tabla `perfil_intereses` las guarda ya resueltas a
+`categorias.id` (los triggers la mantienen al día), y `InterestIndex` carga
+en memoria un bitset por contenido y por usuario, con un bit por categoría.
+Así, comparar un perfil con todo el catálogo es un AND y un popcount sobre
+un array, sin deserializar JSON ni hacer operaciones de conjuntos por fila.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTEREST_INDEX_TTL = float(os.getenv("INTEREST_INDEX_TTL", "30"))
+
+AREA = "area"
+OBJETIVO = "objetivo"
+# Columna JSON de `perfiles` de la que sale cada origen
+ORIGEN_COLUMNAS = {AREA: "areas_interes", OBJETIVO: "objetivos"}
+# Peso de un objetivo frente a un área de interés en la relevancia
+OBJETIVO_WEIGHT = 0.5
+
+
+def _select_intereses(perfil: str, origen: str, perfiles: str = "", categorias: str = "categorias AS c") -> str:
+    """
+    SELECT (perfil_id, origen, categoria_id) de los nombres de la columna
+    JSON de `perfil` que existen en `categorias`; ignora JSON no válido
+
+    Args:
+        perfil: Alias de la fila del perfil (NEW en los triggers de perfiles)
+        perfiles: Tabla de la que sale `perfil`, si no es NEW
+        categorias: Categorías candidatas, con alias c
+    """
+    columna = f"{perfil}.{ORIGEN_COLUMNAS[origen]}"
+    desde = f"{perfiles}, " if perfiles else ""
+    return f"""
+        SELECT {perfil}.id, '{origen}', c.id
+        FROM {desde}json_each(CASE WHEN json_valid({columna}) THEN {columna} END) AS j
+        JOIN {categorias} ON c.nombre = j.value
+    """
+
+
+# Categoría recién insertada o renombrada, en los triggers de categorias
+_NUEVA_CATEGORIA = "(SELECT NEW.id AS id, NEW.nombre AS nombre) AS c"
+
+
+INTERESTS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS perfil_intereses (
+        perfil_id INTEGER NOT NULL REFERENCES perfiles (id),
+        origen VARCHAR NOT NULL CHECK (origen IN ('area', 'objetivo')),
+        categoria_id INTEGER NOT NULL REFERENCES categorias (id),
+        PRIMARY KEY (perfil_id, origen, categoria_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_perfil_intereses_categoria ON perfil_intereses (categoria_id, perfil_id)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_ai AFTER INSERT ON perfiles
+    BEGIN
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("NEW", AREA)};
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("NEW", OBJETIVO)};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_au AFTER UPDATE OF areas_interes, objetivos ON perfiles
+    BEGIN
+        DELETE FROM perfil_intereses WHERE perfil_id = OLD.id;
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("NEW", AREA)};
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("NEW", OBJETIVO)};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_ad AFTER DELETE ON perfiles
+    BEGIN
+        DELETE FROM perfil_intereses WHERE perfil_id = OLD.id;
+    END
+    """,
+    # Una categoría nueva o renombrada puede coincidir con nombres que los
+    # perfiles ya tenían; recorre perfiles, pero las categorías cambian poco
+    f"""
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_categoria_ai AFTER INSERT ON categorias
+    BEGIN
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("p", AREA, "perfiles AS p", _NUEVA_CATEGORIA)};
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("p", OBJETIVO, "perfiles AS p", _NUEVA_CATEGORIA)};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_categoria_au AFTER UPDATE OF nombre ON categorias
+    BEGIN
+        DELETE FROM perfil_intereses WHERE categoria_id = OLD.id;
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("p", AREA, "perfiles AS p", _NUEVA_CATEGORIA)};
+        INSERT OR IGNORE INTO perfil_intereses {_select_intereses("p", OBJETIVO, "perfiles AS p", _NUEVA_CATEGORIA)};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS perfil_intereses_categoria_ad AFTER DELETE ON categorias
+    BEGIN
+        DELETE FROM perfil_intereses WHERE categoria_id = OLD.id;
+    END
+    """,
+]
+
+INTERESTS_BACKFILL = [
+    f"INSERT OR IGNORE INTO perfil_intereses {_select_intereses('p', origen, 'perfiles AS p')}"
+    for origen in ORIGEN_COLUMNAS
+]
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int64)
+    # NumPy < 2.0 no tiene popcount: suma de bits por mitades (SWAR)
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).astype(np.int64)
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """
+    Bits a 1 de cada bitset de un array (palabras, n) de uint64, o de un
+    único bitset (palabras,)
+    """
+    total = _popcount64(masks[0])
+    for palabra in masks[1:]:
+        total += _popcount64(palabra)
+    return total
+
+
+def _set_bits(masks: np.ndarray, filas: np.ndarray, bits: np.ndarray) -> None:
+    palabras = bits // 64
+    valores = np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64))
+    np.bitwise_or.at(masks, (filas, palabras), valores)
+
+
+class InterestIndex:
+    """
+    Bitsets de categorías del catálogo activo y de los perfiles
+
+    Args:
+        conn: Conexión a una base de datos migrada
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        categorias = conn.execute("SELECT id, nombre FROM categorias ORDER BY id").fetchall()
+        self.categoria_ids = np.array([c[0] for c in categorias], dtype=np.int64)
+        self.categoria_nombres = [c[1] for c in categorias]
+        self.words = max(1, (len(categorias) + 63) // 64)
+
+        contenidos = conn.execute(
+            "SELECT id, rating FROM contenido_formativo WHERE estado = 'activo' ORDER BY id"
+        ).fetchall()
+        self.ids = [c[0] for c in contenidos]
+        self._fila_de = {contenido_id: i for i, contenido_id in enumerate(self.ids)}
+        self.rating = np.array([c[1] if c[1] is not None else 0.0 for c in contenidos], dtype=np.float64)
+
+        pares = conn.execute("SELECT contenido_id, categoria_id FROM contenido_categorias").fetchall()
+        filas = np.array([self._fila_de.get(p[0], -1) for p in pares], dtype=np.int64)
+        bits = self.bits_of(p[1] for p in pares)
+        dentro = (filas >= 0) & (bits >= 0)
+        content = np.zeros((len(self.ids), self.words), dtype=np.uint64)
+        _set_bits(content, filas[dentro], bits[dentro])
+        # Una fila por palabra de 64 bits: el AND y el popcount recorren
+        # memoria contigua de todo el catálogo
+        self.content = np.ascontiguousarray(content.T)
+
+        # Un usuario con varios perfiles tiene la unión de sus intereses
+        intereses = conn.execute(
+            """
+            SELECT p.usuario_id, pi.origen, pi.categoria_id
+            FROM perfil_intereses AS pi
+            JOIN perfiles AS p ON p.id = pi.perfil_id
+            """
+        ).fetchall()
+        self.usuario_ids = np.unique(np.array([i[0] for i in intereses], dtype=np.int64))
+        usuarios = np.searchsorted(self.usuario_ids, np.array([i[0] for i in intereses], dtype=np.int64))
+        bits = self.bits_of(i[2] for i in intereses)
+        self.profiles: Dict[str, np.ndarray] = {}
+        for origen in ORIGEN_COLUMNAS:
+            es_origen = np.array([i[1] == origen for i in intereses], dtype=bool)
+            self.profiles[origen] = np.zeros((len(self.usuario_ids), self.words), dtype=np.uint64)
+            _set_bits(self.profiles[origen], usuarios[es_origen], bits[es_origen])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def bits_of(self, categoria_ids: Iterable[int]) -> np.ndarray:
+        """
+        Posición del bit de cada categoría; -1 si no existe
+        """
+        ids = np.fromiter(categoria_ids, dtype=np.int64)
+        posiciones = np.searchsorted(self.categoria_ids, ids)
+        posiciones = np.minimum(posiciones, max(len(self.categoria_ids) - 1, 0))
+        existe = self.categoria_ids[posiciones] == ids if len(self.categoria_ids) else np.zeros(len(ids), dtype=bool)
+        return np.where(existe, posiciones, -1)
+
+    def mask_for(self, nombres: Iterable[str]) -> np.ndarray:
+        """
+        Bitset de las categorías con esos nombres
+        """
+        buscados = set(nombres)
+        bits = np.array([i for i, nombre in enumerate(self.categoria_nombres) if nombre in buscados], dtype=np.int64)
+        mask = np.zeros((1, self.words), dtype=np.uint64)
+        _set_bits(mask, np.zeros(len(bits), dtype=np.int64), bits)
+        return mask[0]
+
+    def content_mask(self, fila: int) -> np.ndarray:
+        return self.content[:, fila]
+
+    def names_of(self, mask: np.ndarray) -> List[str]:
+        bits = np.unpackbits(np.ascontiguousarray(mask).view(np.uint8), bitorder="little")
+        return [self.categoria_nombres[int(b)] for b in np.flatnonzero(bits[:len(self.categoria_nombres)])]
+
+    def profile(self, usuario_id: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Bitsets de áreas de interés y objetivos del usuario; None si no tiene
+        """
+        i = int(np.searchsorted(self.usuario_ids, usuario_id))
+        if i == len(self.usuario_ids) or self.usuario_ids[i] != usuario_id:
+            return None
+        return {origen: masks[i] for origen, masks in self.profiles.items()}
+
+    def rows_of(self, contenido_ids: Iterable[str]) -> np.ndarray:
+        return np.array(
+            [self._fila_de[c] for c in contenido_ids if c in self._fila_de], dtype=np.int64
+        )
+
+    def relevance(self, perfil: Dict[str, np.ndarray], filas: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Relevancia (0-1) de cada contenido para el perfil: categorías en
+        común con sus áreas de interés y objetivos (estos con menos peso),
+        sobre el máximo posible
+        """
+        content = self.content if filas is None else self.content[:, filas]
+        area, objetivo = perfil[AREA][:, None], perfil[OBJETIVO][:, None]
+        total = float(popcount(area)[0] + OBJETIVO_WEIGHT * popcount(objetivo)[0])
+        if not total:
+            return np.zeros(content.shape[1], dtype=np.float64)
+        comunes = popcount(content & area) + OBJETIVO_WEIGHT * popcount(content & objetivo)
+        return comunes / total
+
+    def top(
+        self, perfil: Dict[str, np.ndarray], limit: int, filas: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Los `limit` contenidos más relevantes para el perfil (a igual
+        relevancia, mejor rating), sin los que no comparten ninguna categoría
+
+        Returns:
+            List[Tuple[int, float]]: (fila, relevancia)
+        """
+        relevancia = self.relevance(perfil, filas)
+        candidatos = np.flatnonzero(relevancia > 0)
+        if filas is not None:
+            relevancia, candidatos = relevancia[candidatos], filas[candidatos]
+        else:
+            relevancia = relevancia[candidatos]
+        rating = self.rating[candidatos]
+        if len(candidatos) > limit:
+            # El rating (0-5) solo desempata: nunca supera un paso de relevancia
+            mejores = np.argpartition(-(relevancia + rating * 1e-6), limit - 1)[:limit]
+            relevancia, candidatos, rating = relevancia[mejores], candidatos[mejores], rating[mejores]
+        orden = np.lexsort((-rating, -relevancia))
+        return [(int(c), float(r)) for c, r in zip(candidatos[orden], relevancia[orden])]
+
+
+class IndexHolder:
+    """
+    Índice de una base de datos, reconstruido cuando tiene más de `ttl` segundos
+
+    Solo la primera construcción bloquea. Cuando caduca, se sigue sirviendo
+    el índice anterior mientras un hilo construye el nuevo.
+    """
+
+    def __init__(self, db_path: str, ttl: float = INTEREST_INDEX_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index: Optional[InterestIndex] = None
+        self._built_at = 0.0
+        self._refreshing = False
+        # Cambia con cada `invalidate`: un índice construido antes ya no vale
+        self._generation = 0
+        self.builds = 0
+        self.build_ms = 0.0
+
+    def _build(self) -> InterestIndex:
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            index = InterestIndex(conn)
+        finally:
+            conn.close()
+        self.builds += 1
+        self.build_ms = 1000 * (time.perf_counter() - t0)
+        logger.info(
+            f"Índice de intereses: {len(index)} contenidos, "
+            f"{len(index.usuario_ids)} usuarios en {self.build_ms:.1f} ms"
+        )
+        return index
+
+    def get(self) -> InterestIndex:
+        """
+        Raises:
+            sqlite3.Error: Si la base de datos no tiene el esquema migrado
+        """
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                    self._built_at = time.monotonic()
+                return self._index
+        if time.monotonic() - self._built_at > self.ttl and not self._refreshing:
+            with self._lock:
+                if not self._refreshing and time.monotonic() - self._built_at > self.ttl:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh, args=(self._generation,), name="interest-index", daemon=True
+                    ).start()
+        return index
+
+    def _refresh(self, generation: int) -> None:
+        try:
+            index = self._build()
+        except sqlite3.Error as e:
+            logger.warning(f"Índice de intereses no reconstruido, se sigue usando el anterior: {e}")
+            index = None
+        with self._lock:
+            self._refreshing = False
+            self._built_at = time.monotonic()
+            if index is not None and self._index is not None and generation == self._generation:
+                self._index = index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        index = self._index
+        return {
+            "builds": self.builds,
+            "refreshing": self._refreshing,
+            "build_ms": self.build_ms,
+            "contents": len(index) if index is not None else 0,
+            "users": len(index.usuario_ids) if index is not None else 0,
+            "categories": len(index.categoria_nombres) if index is not None else 0,
+        }
+
+
+_holders: Dict[str, IndexHolder] = {}
+_holders_lock = threading.Lock()
+
+
+def get_index(db_path: str) -> InterestIndex:
+    """
+    Índice compartido por ruta de base de datos dentro del proceso
+
+    Raises:
+        sqlite3.Error: Si la base de datos no tiene el esquema migrado
+    """
+    with _holders_lock:
+        holder = _holders.get(db_path)
+        if holder is None:
+            holder = _holders[db_path] = IndexHolder(db_path)
+    return holder.get()
+
+
+def invalidate(db_path: Optional[str] = None) -> None:
+    for path, holder in list(_holders.items()):
+        if db_path is None or path == db_path:
+            holder.invalidate()
+
+
+def stats() -> Dict[str, Dict]:
+    return {path: holder.stats() for path, holder in _holders.items()}
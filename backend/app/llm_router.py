@@ -0,0 +1,279 @@
+"""
+Router sobre varios backends de LLM compatibles con OpenAI (réplicas de TGI)
+
+Para cada backend se lleva una media móvil (EWMA) de la latencia y de la
+tasa de error, y las últimas latencias para estimar su p95. Cada llamada va
+al backend disponible con mejor puntuación; si no ha respondido cuando pasa
+su p95, se lanza la misma petición a otro backend (hedging) y se usa la
+primera respuesta. Si un backend falla, se reintenta en el siguiente.
+
+Un backend con `breaker_failures` errores seguidos queda fuera (circuito
+abierto) durante `breaker_cooldown` segundos; después recibe una sola
+petición de prueba y vuelve si sale bien.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+# Espera antes de lanzar el hedge mientras no hay latencias suficientes
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "10"))
+
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 200
+# Latencias necesarias para fiarse del p95
+MIN_SAMPLES = 10
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoBackendAvailable(RuntimeError):
+    """Todos los backends tienen el circuito abierto"""
+
+
+class Backend:
+    """
+    Un endpoint OpenAI-compatible con sus estadísticas y su circuit breaker
+    """
+
+    def __init__(self, url: str, api_key: str, timeout: float = LLM_REQUEST_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        # Hasta cuándo hay una petición de prueba en curso (circuito medio abierto)
+        self.probe_until: Optional[float] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            # Los reintentos los hace el router, sobre otro backend
+            self._client = OpenAI(
+                base_url=f"{self.url}/v1/", api_key=self.api_key, max_retries=0, timeout=self.timeout
+            )
+        return self._client
+
+    def state(self, now: float, cooldown: float) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if now - self.opened_at >= cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordenadas = sorted(self.latencies)
+        return ordenadas[max(0, math.ceil(0.95 * len(ordenadas)) - 1)]
+
+    def score(self) -> float:
+        """
+        Tiempo esperado de respuesta: latencia media, más la cola que ya
+        tiene, penalizada por su tasa de error. Sin datos cuenta como 0 para
+        que se pruebe.
+        """
+        latencia = self.latency_ewma or 0.0
+        return latencia * (1 + self.in_flight) / max(1e-3, 1 - self.error_ewma)
+
+    def record(self, ok: bool, segundos: float, failures_to_open: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.error_ewma += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+            self.probe_until = None
+            if ok:
+                self.latencies.append(segundos)
+                self.latency_ewma = segundos if self.latency_ewma is None else \
+                    self.latency_ewma + EWMA_ALPHA * (segundos - self.latency_ewma)
+                self.consecutive_failures = 0
+                if self.opened_at is not None:
+                    logger.info(f"Backend {self.url} recuperado, se cierra el circuito")
+                self.opened_at = None
+            else:
+                self.errors += 1
+                self.consecutive_failures += 1
+                if self.opened_at is not None or self.consecutive_failures >= failures_to_open:
+                    if self.opened_at is None:
+                        logger.warning(f"Backend {self.url} fuera tras {self.consecutive_failures} errores seguidos")
+                    self.opened_at = time.monotonic()
+
+    def stats(self, now: float, cooldown: float) -> Dict:
+        p95 = self.p95()
+        return {
+            "state": self.state(now, cooldown),
+            "latency_ewma_ms": 1000 * self.latency_ewma if self.latency_ewma is not None else None,
+            "p95_ms": 1000 * p95 if p95 is not None else None,
+            "error_ewma": self.error_ewma,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "wins": self.wins,
+        }
+
+
+class LLMRouter:
+    """
+    Reparte las llamadas de chat entre varios backends
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        hedge: bool = LLM_HEDGE,
+        hedge_delay: float = LLM_HEDGE_DELAY,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+        breaker_failures: int = LLM_BREAKER_FAILURES,
+        breaker_cooldown: float = LLM_BREAKER_COOLDOWN,
+        max_workers: int = 32,
+    ):
+        if not backends:
+            raise ValueError("Hace falta al menos un backend")
+        self.backends: List[Backend] = list(backends)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def ranked(self) -> List[Backend]:
+        """
+        Backends que pueden recibir una petición, del mejor al peor
+
+        De los que tienen el circuito medio abierto entra uno, como prueba, y
+        el primero: si fuera al final, con otro backend sano nunca llegaría a
+        recibir la petición. Si falla, la llamada sigue en los cerrados. La
+        prueba se reserva durante el timeout del backend; si no termina en
+        ese tiempo, otra llamada puede volver a probarlo.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cerrados = [b for b in self.backends if b.state(now, self.breaker_cooldown) == CLOSED]
+            cerrados.sort(key=Backend.score)
+            prueba = next(
+                (
+                    b for b in self.backends
+                    if b.state(now, self.breaker_cooldown) == HALF_OPEN
+                    and (b.probe_until is None or now >= b.probe_until)
+                ),
+                None,
+            )
+            if prueba is not None:
+                prueba.probe_until = now + prueba.timeout
+                cerrados.insert(0, prueba)
+            return cerrados
+
+    def _hedge_after(self, backend: Backend) -> float:
+        p95 = backend.p95()
+        return max(self.hedge_min_delay, p95 if p95 is not None else self.hedge_delay)
+
+    def _call(self, backend: Backend, kwargs: Dict[str, Any]):
+        with backend._lock:
+            backend.in_flight += 1
+            backend.requests += 1
+        inicio = time.monotonic()
+        try:
+            resultado = backend.client.chat.completions.create(**kwargs)
+        except Exception:
+            backend.record(False, time.monotonic() - inicio, self.breaker_failures)
+            raise
+        backend.record(True, time.monotonic() - inicio, self.breaker_failures)
+        return resultado
+
+    def complete(self, **kwargs):
+        """
+        `chat.completions.create(**kwargs)` contra el mejor backend, con
+        hedging y reintento en otro backend si falla
+
+        Raises:
+            NoBackendAvailable: Si todos los backends están fuera
+            Exception: El último error si fallan todos los intentados
+        """
+        candidatos = self.ranked()
+        if not candidatos:
+            raise NoBackendAvailable("Ningún backend del LLM disponible")
+        with self._lock:
+            self.calls += 1
+
+        primero = candidatos.pop(0)
+        en_curso: Dict[Future, Backend] = {self._executor.submit(self._call, primero, kwargs): primero}
+        hedge_en = time.monotonic() + self._hedge_after(primero) if self.hedge and candidatos else None
+        ultimo_error: Optional[BaseException] = None
+
+        while en_curso:
+            espera = max(0.0, hedge_en - time.monotonic()) if hedge_en is not None else None
+            hechos, _ = wait(list(en_curso), timeout=espera, return_when=FIRST_COMPLETED)
+            if not hechos:
+                # El primero tarda más que su p95: se lanza el hedge
+                backend = candidatos.pop(0)
+                en_curso[self._executor.submit(self._call, backend, kwargs)] = backend
+                hedge_en = None
+                with self._lock:
+                    self.hedges += 1
+                continue
+            for futuro in hechos:
+                backend = en_curso.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    logger.warning(f"Error en el backend {backend.url}: {e!r}")
+                    ultimo_error = e
+                    if candidatos:
+                        siguiente = candidatos.pop(0)
+                        en_curso[self._executor.submit(self._call, siguiente, kwargs)] = siguiente
+                        with self._lock:
+                            self.failovers += 1
+                    continue
+                # Las demás peticiones terminan solas y actualizan sus estadísticas
+                with self._lock:
+                    backend.wins += 1
+                    if backend is not primero:
+                        self.hedges_won += 1
+                return resultado
+        raise ultimo_error
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "backends": {b.url: b.stats(now, self.breaker_cooldown) for b in self.backends},
+        }
+
+
+def parse_urls(valor: Optional[str]) -> List[str]:
+    return [url.strip() for url in (valor or "").split(",") if url.strip()]
@@ -1,19 +1,50 @@
 # main.py
 import logging
 import os
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from app.auth import create_access_token, decode_access_token
 from fastapi.responses import JSONResponse
-from typing import Dict
+from typing import Dict, List
 
 from app.chatbot import router as chatbot_router
 from app.users import router as users_router
 from app.recommender import ContentRecommender
 from api.endpoints.recommendations import router as recommendations_router
+from api.endpoints.interacciones import router as interacciones_router
+from api.endpoints.catalogo import router as catalogo_router
+from api.endpoints.listas import router as listas_router
+from app.ingestion import shutdown_interaction_buffer
+from app import admission, chatbot, interests, popularity, retrieval_cache, singleflight, snapshot, tracing
+from starlette.concurrency import run_in_threadpool
+from db.migrations import migrate_path
+from db.session import DB_PATH
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Precalentar el cliente del LLM en segundo plano tras el arranque
+CHATBOT_WARMUP = os.getenv("CHATBOT_WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    version = await run_in_threadpool(migrate_path, DB_PATH)
+    logger.info(f"Esquema de base de datos en la versión {version}")
+    if await run_in_threadpool(popularity.backfill, DB_PATH):
+        logger.info("Contadores de popularidad reconstruidos")
+    if await run_in_threadpool(snapshot.current) is None:
+        logger.info("Sin snapshot del catálogo, se consultará SQLite")
+    if CHATBOT_WARMUP:
+        threading.Thread(target=chatbot.warm_up, name="chatbot-warmup", daemon=True).start()
+    yield
+    shutdown_interaction_buffer()
+    tracing.shutdown()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="AinaHack API",
     description="API para el sistema de recomendaciones de contenidos",
     version="1.0.0"
@@ -28,9 +59,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-logger = logging.getLogger(__name__)
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -73,11 +101,28 @@ async def get_current_user(request: Request):
         raise HTTPException(status_code=403, detail="Invalid session")
     return payload["sub"]
 
+@app.get("/stats", tags=["root"])
+async def stats():
+    """
+    Contadores internos del proceso (peticiones agrupadas, etc.)
+    """
+    return {
+        "singleflight": singleflight.stats(),
+        "snapshot": snapshot.stats(),
+        "tracing": tracing.stats(),
+        "query_rag": chatbot.rag_pipeline.stats(),
+        "admission": admission.stats(),
+        "llm_router": chatbot.router_stats(),
+        "interests": interests.stats(),
+        "popularity": popularity.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+    }
+
 @app.get("/", tags=["root"])
 async def root():
     return {"message": "Bienvenido a la API de JAA"}
 
-@app.get("/recommendations", response_model=Dict, tags=["recommendations"])
+@app.get("/recommendations", response_model=List[Dict], tags=["recommendations"])
 async def get_recommendations(current_user: str = Depends(get_current_user)):
     """
     Obtiene recomendaciones personalizadas para el usuario (demo: siempre usuario 1)
@@ -85,10 +130,13 @@ async def get_recommendations(current_user: str = Depends(get_current_user)):
     try:
         user_id = 1  # ID fijo para demo
         logger.info(f"Solicitando recomendaciones para usuario {user_id}")
-        recommender = ContentRecommender(db_path="db/jaa.sqlite")
-        recommendations = recommender.generate(user_id)
+        recommender = ContentRecommender(db_path=DB_PATH)
+        recommendations = await singleflight.get_flight("recommendations").do(
+            (user_id, None, None, None),
+            lambda: run_in_threadpool(recommender.generate, user_id)
+        )
         
-        if recommendations.get("status") == "error":
+        if isinstance(recommendations, dict) and recommendations.get("error"):
             raise HTTPException(
                 status_code=404, 
                 detail=recommendations.get("error", "Error generando recomendaciones")
@@ -96,6 +144,8 @@ async def get_recommendations(current_user: str = Depends(get_current_user)):
             
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en endpoint de recomendaciones: {str(e)}")
         raise HTTPException(
@@ -106,4 +156,7 @@ async def get_recommendations(current_user: str = Depends(get_current_user)):
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(chatbot_router, prefix="/cb", tags=["chatbot"])
 app.include_router(recommendations_router, prefix="/api", tags=["recommendations"])
+app.include_router(interacciones_router, prefix="/api", tags=["interacciones"])
+app.include_router(catalogo_router, prefix="/api", tags=["catalogo"])
+app.include_router(listas_router, prefix="/api", tags=["listas"])
 
@@ -0,0 +1,217 @@
+"""
+Ejecutor de pipelines como grafo de etapas con dependencias
+
+Cada etapa declara de qué etapas depende y empieza en cuanto terminan
+todas, así que las etapas independientes corren a la vez. Una etapa puede
+tener su propio timeout y un fallback que da un valor por defecto si la
+etapa falla o tarda demasiado; sin fallback, el error se propaga a las
+etapas que dependen de ella.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import admission, tracing
+
+logger = logging.getLogger(__name__)
+
+# Cómo terminó una etapa; con fallback, "reason" dice si fue por timeout o error
+OK = "ok"
+FALLBACK = "fallback"
+TIMEOUT = "timeout"
+ERROR = "error"
+SKIPPED = "skipped"
+
+
+class PipelineError(Exception):
+    """Una etapa sin fallback falló y no se pudo completar el pipeline"""
+
+    def __init__(self, stage: str, cause: BaseException, timings: Dict[str, Dict]):
+        super().__init__(f"La etapa '{stage}' falló: {cause!r}")
+        self.stage = stage
+        self.cause = cause
+        self.timings = timings
+
+
+class Stage:
+    """
+    Una etapa del pipeline
+
+    Args:
+        name: Nombre único de la etapa
+        fn: Recibe un dict con el contexto inicial y los resultados de sus
+            dependencias; puede ser síncrona (se ejecuta en el threadpool) o
+            una corrutina
+        deps: Etapas que deben terminar antes
+        timeout: Segundos máximos de la etapa; None sin límite
+        fallback: Recibe el mismo dict y la excepción y devuelve el valor
+            que se usa en lugar del resultado
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        deps: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        fallback: Optional[Callable[[Dict[str, Any], BaseException], Any]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+
+    async def _call(self, entradas: Dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(self.fn):
+            coro = self.fn(entradas)
+            if self.timeout is None:
+                return await coro
+            return await asyncio.wait_for(coro, self.timeout)
+        hilo = asyncio.ensure_future(run_in_threadpool(self.fn, entradas))
+        if self.timeout is None:
+            return await hilo
+        try:
+            return await asyncio.wait_for(asyncio.shield(hilo), self.timeout)
+        except asyncio.TimeoutError:
+            # Un timeout no puede parar el hilo: la función termina en
+            # segundo plano, su resultado se descarta y, si la petición se
+            # admitió, sigue ocupando su hueco hasta entonces
+            admission.hold_slot(hilo)
+            raise
+
+
+class Pipeline:
+    """
+    Grafo de etapas validado al construirlo (dependencias conocidas y sin ciclos)
+    """
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Etapa repetida: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            desconocidas = [d for d in stage.deps if d not in self.stages]
+            if desconocidas:
+                raise ValueError(f"La etapa '{stage.name}' depende de etapas desconocidas: {desconocidas}")
+        self.order = self._topological_order()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {
+            nombre: {"runs": 0, OK: 0, FALLBACK: 0, TIMEOUT: 0, ERROR: 0, SKIPPED: 0, "total_ms": 0.0, "max_ms": 0.0}
+            for nombre in self.stages
+        }
+
+    def _topological_order(self) -> List[str]:
+        orden: List[str] = []
+        estado: Dict[str, int] = {}
+
+        def visitar(nombre: str, camino: List[str]):
+            if estado.get(nombre) == 2:
+                return
+            if estado.get(nombre) == 1:
+                raise ValueError(f"Ciclo entre etapas: {' -> '.join(camino + [nombre])}")
+            estado[nombre] = 1
+            for dep in self.stages[nombre].deps:
+                visitar(dep, camino + [nombre])
+            estado[nombre] = 2
+            orden.append(nombre)
+
+        for nombre in self.stages:
+            visitar(nombre, [])
+        return orden
+
+    async def run(self, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Ejecuta todas las etapas respetando las dependencias
+
+        Args:
+            context: Valores iniciales visibles para todas las etapas
+
+        Returns:
+            Dict: Resultado de cada etapa por nombre, más "_timings" con
+            inicio, duración y estado de cada una
+
+        Raises:
+            PipelineError: Si una etapa sin fallback falla
+        """
+        context = dict(context or {})
+        timings: Dict[str, Dict] = {}
+        t0 = time.perf_counter()
+        tareas: Dict[str, asyncio.Task] = {}
+
+        async def ejecutar(stage: Stage):
+            try:
+                deps = {dep: await tareas[dep] for dep in stage.deps}
+            except PipelineError:
+                timings[stage.name] = {"start_ms": None, "duration_ms": 0.0, "status": SKIPPED}
+                raise
+            entradas = {**context, **deps}
+            inicio = time.perf_counter()
+            with tracing.span(f"{self.name}.{stage.name}") as span:
+                try:
+                    resultado = await stage._call(entradas)
+                    timings[stage.name] = self._timing(t0, inicio, OK)
+                except Exception as e:
+                    motivo = TIMEOUT if isinstance(e, asyncio.TimeoutError) else ERROR
+                    if stage.fallback is None:
+                        timings[stage.name] = self._timing(t0, inicio, motivo)
+                        raise PipelineError(stage.name, e, timings) from e
+                    logger.warning(f"[{self.name}] etapa '{stage.name}' usa su fallback ({motivo}): {e!r}")
+                    resultado = stage.fallback(entradas, e)
+                    timings[stage.name] = self._timing(t0, inicio, FALLBACK, motivo)
+                estado = timings[stage.name]["status"]
+                span.set_metadata(status=estado, duration_ms=timings[stage.name]["duration_ms"])
+            return resultado
+
+        with tracing.span(self.name, **{k: v for k, v in context.items() if not k.startswith("_")}) as span:
+            for nombre in self.order:
+                tareas[nombre] = asyncio.ensure_future(ejecutar(self.stages[nombre]))
+            try:
+                await asyncio.gather(*tareas.values())
+            except Exception:
+                # Esperar al resto para no dejar tareas sueltas con excepciones sin recoger
+                await asyncio.gather(*tareas.values(), return_exceptions=True)
+                self._record(timings)
+                raise
+            finally:
+                span.set_metadata(timings=timings)
+        self._record(timings)
+        resultados = {nombre: tarea.result() for nombre, tarea in tareas.items()}
+        resultados["_timings"] = timings
+        return resultados
+
+    @staticmethod
+    def _timing(t0: float, inicio: float, estado: str, motivo: Optional[str] = None) -> Dict:
+        fin = time.perf_counter()
+        timing = {
+            "start_ms": round(1000 * (inicio - t0), 3),
+            "duration_ms": round(1000 * (fin - inicio), 3),
+            "status": estado,
+        }
+        if motivo is not None:
+            timing["reason"] = motivo
+        return timing
+
+    def _record(self, timings: Dict[str, Dict]) -> None:
+        with self._lock:
+            for nombre, timing in timings.items():
+                s = self._stats[nombre]
+                s["runs"] += 1
+                s[timing["status"]] += 1
+                s["total_ms"] += timing["duration_ms"]
+                s["max_ms"] = max(s["max_ms"], timing["duration_ms"])
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                nombre: {**s, "mean_ms": s["total_ms"] / s["runs"] if s["runs"] else 0.0}
+                for nombre, s in self._stats.items()
+            }
@@ -0,0 +1,405 @@
+"""
+Popularidad y tendencia del contenido, mantenidas de forma incremental
+
+Cada interacción suma a dos contadores con decaimiento exponencial por
+contenido: `popular` (vida media larga) y `trending` (vida media corta).
+Se usa *forward decay*: en lugar de envejecer todos los contadores con el
+tiempo, cada interacción suma `peso * exp(λ (t - landmark))`, así que los
+contadores solo crecen y ordenarlos por su valor guardado ya da el orden
+por valor decaído. De vez en cuando se compacta: se multiplica todo por
+`exp(-λ (t - landmark))`, se mueve el landmark a t y se borra lo que ya no
+pesa, para que los números no crezcan sin límite.
+
+Los contadores viven en `popularidad_contenido` y se actualizan en la misma
+transacción que escribe cada lote de interacciones (hook `on_flush` de
+`InteractionBuffer`). Cada proceso mantiene además un top-k en memoria que
+se actualiza con sus propios lotes y se recarga de la tabla periódicamente.
+
+Uso:
+    python -m app.popularity [ruta/a/jaa.sqlite]   # reconstruye los contadores
+"""
+import heapq
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db.session import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+POPULAR_HALF_LIFE_DAYS = float(os.getenv("POPULAR_HALF_LIFE_DAYS", "30"))
+TRENDING_HALF_LIFE_DAYS = float(os.getenv("TRENDING_HALF_LIFE_DAYS", "1"))
+# Días de datos entre compactaciones
+POPULARITY_COMPACT_DAYS = float(os.getenv("POPULARITY_COMPACT_DAYS", "7"))
+POPULARITY_TOP_K = int(os.getenv("POPULARITY_TOP_K", "200"))
+# Segundos entre recargas del top-k desde la tabla (cambios de otros procesos)
+POPULARITY_REFRESH = float(os.getenv("POPULARITY_REFRESH", "30"))
+
+POPULAR = "popular"
+TRENDING = "trending"
+SIGNALS = (POPULAR, TRENDING)
+
+# Peso de cada tipo de interacción
+WEIGHTS = {"view": 1.0, "save": 2.0, "like": 3.0, "complete": 4.0}
+# Contadores que tras compactar valen menos que esto se borran
+MIN_SCORE = 1e-3
+
+DAY = 86400.0
+
+POPULARITY_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS popularidad_contenido (
+        contenido_id VARCHAR PRIMARY KEY REFERENCES contenido_formativo (id),
+        popular REAL NOT NULL DEFAULT 0,
+        trending REAL NOT NULL DEFAULT 0,
+        interacciones INTEGER NOT NULL DEFAULT 0,
+        ultima_interaccion DATETIME
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_popularidad_popular ON popularidad_contenido (popular DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_popularidad_trending ON popularidad_contenido (trending DESC)",
+    # Una sola fila: instante (epoch, en segundos) al que están referidos los contadores
+    """
+    CREATE TABLE IF NOT EXISTS popularidad_landmark (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        landmark REAL NOT NULL
+    )
+    """,
+]
+
+UPSERT_SQL = """
+INSERT INTO popularidad_contenido (contenido_id, popular, trending, interacciones, ultima_interaccion)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (contenido_id) DO UPDATE SET
+    popular = popular + excluded.popular,
+    trending = trending + excluded.trending,
+    interacciones = interacciones + excluded.interacciones,
+    ultima_interaccion = MAX(COALESCE(ultima_interaccion, ''), excluded.ultima_interaccion)
+RETURNING contenido_id, popular, trending
+"""
+
+
+def decay_rate(half_life_days: float) -> float:
+    return math.log(2) / (half_life_days * DAY)
+
+
+RATES = {POPULAR: decay_rate(POPULAR_HALF_LIFE_DAYS), TRENDING: decay_rate(TRENDING_HALF_LIFE_DAYS)}
+
+
+def timestamp(fecha) -> float:
+    """
+    Epoch en segundos de una fecha de `interacciones` (las fechas sin zona se toman como UTC)
+    """
+    if not isinstance(fecha, datetime):
+        fecha = datetime.fromisoformat(str(fecha))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.timestamp()
+
+
+class TopK:
+    """
+    Los `k` elementos con más puntuación, para puntuaciones que solo crecen
+
+    Un min-heap con los miembros actuales; las entradas que quedan viejas al
+    subir la puntuación de un miembro se descartan al llegar a la cima.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.scores: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _min(self) -> Tuple[float, str]:
+        while self._heap[0][0] != self.scores.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def update(self, item: str, score: float) -> None:
+        if item in self.scores:
+            self.scores[item] = score
+        elif len(self.scores) < self.k:
+            self.scores[item] = score
+        elif score > self._min()[0]:
+            _, fuera = heapq.heappop(self._heap)
+            del self.scores[fuera]
+            self.scores[item] = score
+        else:
+            return
+        heapq.heappush(self._heap, (score, item))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(s, i) for i, s in self.scores.items()]
+            heapq.heapify(self._heap)
+
+    def items(self) -> List[Tuple[str, float]]:
+        return sorted(self.scores.items(), key=lambda par: (-par[1], par[0]))
+
+
+def get_landmark(conn: sqlite3.Connection) -> Optional[float]:
+    row = conn.execute("SELECT landmark FROM popularidad_landmark WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+def rebuild(conn: sqlite3.Connection, landmark: Optional[float] = None) -> float:
+    """
+    Recalcula los contadores recorriendo `interacciones` (backfill tras la
+    migración y `python -m app.popularity`)
+
+    Args:
+        landmark: Por defecto, la fecha de la última interacción
+
+    Returns:
+        float: Landmark usado
+    """
+    if landmark is None:
+        ultima = conn.execute("SELECT MAX(fecha) FROM interacciones").fetchone()[0]
+        landmark = timestamp(ultima) if ultima else time.time()
+    acumulados: Dict[str, List] = {}
+    for contenido_id, tipo, fecha in conn.execute("SELECT contenido_id, tipo, fecha FROM interacciones"):
+        try:
+            t = timestamp(fecha)
+        except (TypeError, ValueError):
+            continue
+        peso = WEIGHTS.get(tipo, 1.0)
+        a = acumulados.setdefault(contenido_id, [0.0, 0.0, 0, fecha])
+        a[0] += peso * math.exp(RATES[POPULAR] * min(t - landmark, 0.0))
+        a[1] += peso * math.exp(RATES[TRENDING] * min(t - landmark, 0.0))
+        a[2] += 1
+        a[3] = max(a[3], fecha)
+    conn.execute("DELETE FROM popularidad_contenido")
+    conn.executemany(
+        "INSERT INTO popularidad_contenido VALUES (?, ?, ?, ?, ?)",
+        [(contenido_id, *valores) for contenido_id, valores in acumulados.items()],
+    )
+    conn.execute("INSERT OR REPLACE INTO popularidad_landmark (id, landmark) VALUES (1, ?)", (landmark,))
+    logger.info(f"Popularidad reconstruida para {len(acumulados)} contenidos")
+    return landmark
+
+
+def compact(conn: sqlite3.Connection, now: float) -> int:
+    """
+    Lleva los contadores al landmark `now` y borra los que ya no pesan
+
+    Returns:
+        int: Contadores borrados
+    """
+    landmark = get_landmark(conn)
+    if landmark is None or now <= landmark:
+        return 0
+    conn.execute(
+        "UPDATE popularidad_contenido SET popular = popular * ?, trending = trending * ?",
+        (math.exp(-RATES[POPULAR] * (now - landmark)), math.exp(-RATES[TRENDING] * (now - landmark))),
+    )
+    borrados = conn.execute(
+        "DELETE FROM popularidad_contenido WHERE popular < ? AND trending < ?", (MIN_SCORE, MIN_SCORE)
+    ).rowcount
+    conn.execute("UPDATE popularidad_landmark SET landmark = ? WHERE id = 1", (now,))
+    logger.info(f"Popularidad compactada al {datetime.fromtimestamp(now, timezone.utc)}, {borrados} contadores borrados")
+    return borrados
+
+
+def backfill(db_path: str = DB_PATH) -> bool:
+    """
+    Reconstruye los contadores si aún no tienen landmark (recién migrados);
+    se llama al arrancar, antes de que el `InteractionBuffer` escriba nada
+
+    Returns:
+        bool: True si se han reconstruido
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if get_landmark(conn) is not None:
+                return False
+            rebuild(conn)
+    finally:
+        conn.close()
+    invalidate(db_path)
+    return True
+
+
+class Popularity:
+    """
+    Contadores de una base de datos: hook de escritura y top-k en memoria
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        k: int = POPULARITY_TOP_K,
+        refresh_interval: float = POPULARITY_REFRESH,
+        compact_days: float = POPULARITY_COMPACT_DAYS,
+    ):
+        self.db_path = db_path
+        self.k = k
+        self.refresh_interval = refresh_interval
+        self.compact_days = compact_days
+        self._lock = threading.Lock()
+        self._top: Dict[str, TopK] = {signal: TopK(k) for signal in SIGNALS}
+        self._landmark: Optional[float] = None
+        self._loaded_at: Optional[float] = None
+
+        self.updates = 0
+        self.skipped = 0
+        self.compactions = 0
+        self.reloads = 0
+
+    def on_flush(self, conn: sqlite3.Connection, lote: Sequence[tuple]) -> None:
+        """
+        Hook de `InteractionBuffer`: suma el lote a los contadores dentro de
+        la transacción que lo escribe
+        """
+        if not lote:
+            return
+        try:
+            landmark = get_landmark(conn)
+            if landmark is None:
+                # Sin backfill no hay base sobre la que sumar; reconstruir aquí bloquearía al escritor
+                if not self.skipped:
+                    logger.warning("Contadores de popularidad sin landmark: ejecuta `python -m app.popularity`")
+                self.skipped += len(lote)
+                return
+            self._apply(conn, lote, landmark)
+        except sqlite3.OperationalError as e:
+            # Sin la migración de popularidad, las interacciones se escriben igual
+            logger.warning(f"Contadores de popularidad no actualizados: {e}")
+
+    def _apply(self, conn: sqlite3.Connection, lote: Sequence[tuple], landmark: float) -> None:
+        eventos = []
+        for fila in lote:
+            contenido_id, tipo, fecha = fila[1], fila[2], fila[6]
+            try:
+                eventos.append((contenido_id, WEIGHTS.get(tipo, 1.0), fecha, timestamp(fecha)))
+            except (TypeError, ValueError):
+                logger.warning(f"Fecha no válida en una interacción con {contenido_id}: {fecha!r}")
+        if not eventos:
+            return
+
+        # Compactar antes de sumar deja todos los exponentes <= 0: sin desbordamientos
+        ultimo = max(t for *_, t in eventos)
+        compactado = ultimo - landmark > self.compact_days * DAY
+        if compactado:
+            compact(conn, ultimo)
+            landmark = ultimo
+            self.compactions += 1
+
+        deltas: Dict[str, List] = {}
+        for contenido_id, peso, fecha, t in eventos:
+            d = deltas.setdefault(contenido_id, [0.0, 0.0, 0, fecha])
+            d[0] += peso * math.exp(RATES[POPULAR] * (t - landmark))
+            d[1] += peso * math.exp(RATES[TRENDING] * (t - landmark))
+            d[2] += 1
+            d[3] = max(d[3], fecha)
+        nuevos = [conn.execute(UPSERT_SQL, (contenido_id, *d)).fetchone() for contenido_id, d in deltas.items()]
+        self.updates += len(nuevos)
+
+        with self._lock:
+            if compactado:
+                # Los valores cambian de escala: el top-k se recarga entero
+                self._loaded_at = None
+            elif self._landmark == landmark:
+                for contenido_id, popular, trending in nuevos:
+                    self._top[POPULAR].update(contenido_id, popular)
+                    self._top[TRENDING].update(contenido_id, trending)
+
+    def _reload(self) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            landmark = get_landmark(conn)
+            tops = {}
+            for signal in SIGNALS:
+                top = TopK(self.k)
+                for contenido_id, score in conn.execute(
+                    f"SELECT contenido_id, {signal} FROM popularidad_contenido ORDER BY {signal} DESC LIMIT ?",
+                    (self.k,),
+                ):
+                    top.update(contenido_id, score)
+                tops[signal] = top
+        finally:
+            conn.close()
+        with self._lock:
+            self._top = tops
+            self._landmark = landmark
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def top(self, signal: str = POPULAR, limit: int = 10, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Contenidos con más `signal`, con la puntuación relativa al primero (0-1)
+
+        Raises:
+            sqlite3.Error: Si la base de datos no tiene la tabla de popularidad
+        """
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self._reload()
+        excluidos = set(exclude)
+        with self._lock:
+            items = self._top[signal].items()
+        if not items or items[0][1] <= 0:
+            return []
+        maximo = items[0][1]
+        return [(contenido_id, score / maximo) for contenido_id, score in items if contenido_id not in excluidos][:limit]
+
+    def blended(self, limit: int, trending_weight: float = 0.5, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Mezcla de popular y trending (cada una relativa a su máximo)
+        """
+        puntuacion: Dict[str, float] = {}
+        for signal, peso in ((POPULAR, 1 - trending_weight), (TRENDING, trending_weight)):
+            for contenido_id, score in self.top(signal, self.k, exclude):
+                puntuacion[contenido_id] = puntuacion.get(contenido_id, 0.0) + peso * score
+        return sorted(puntuacion.items(), key=lambda par: (-par[1], par[0]))[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "compactions": self.compactions,
+            "reloads": self.reloads,
+            "top_k": {signal: len(top) for signal, top in self._top.items()},
+        }
+
+
+_instances: Dict[str, Popularity] = {}
+_instances_lock = threading.Lock()
+
+
+def get_popularity(db_path: str = DB_PATH) -> Popularity:
+    """
+    Contadores compartidos por ruta de base de datos dentro del proceso
+    """
+    with _instances_lock:
+        if db_path not in _instances:
+            _instances[db_path] = Popularity(db_path)
+        return _instances[db_path]
+
+
+def invalidate(db_path: Optional[str] = None) -> None:
+    """
+    Fuerza la recarga del top-k en la próxima consulta (p. ej. tras `rebuild`)
+    """
+    for path, p in list(_instances.items()):
+        if db_path is None or path == db_path:
+            p._loaded_at = None
+
+
+def stats() -> Dict[str, Dict]:
+    return {path: p.stats() for path, p in _instances.items()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    conexion = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    with conexion:
+        rebuild(conexion)
+    conexion.close()
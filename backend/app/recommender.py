@@ -1,11 +1,24 @@
 from typing import Dict, List, Optional
+import json
 import logging
+import os
+import sqlite3
 from pydantic import BaseModel
 
+from app import geo, interests, popularity
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RECOMMENDATION_LIMIT = int(os.getenv("RECOMMENDATION_LIMIT", "10"))
+# Peso de la popularidad al reordenar las recomendaciones personalizadas (0 = solo intereses)
+POPULARITY_BLEND = float(os.getenv("POPULARITY_BLEND", "0.2"))
+# Candidatos por intereses que se reordenan, por cada recomendación devuelta
+POPULARITY_CANDIDATES = int(os.getenv("POPULARITY_CANDIDATES", "3"))
+
+DETAIL_COLUMNS = ("id", "titulo", "descripcion", "tipo", "modalidad", "nivel", "rating", "precio", "estado")
+
 class Recomendacion(BaseModel):
     id: str
     titulo: str
@@ -27,19 +40,192 @@ class ContentRecommender:
         """
         Initializes the content recommender
         """
-        logger.info("Inicializando ContentRecommender con datos fake")
+        self.db_path = db_path
+        logger.info("Inicializando ContentRecommender")
+
+    def nearby(self, lat: float, lon: float, radio_km: float) -> Dict[str, float]:
+        """
+        Looks up the content located within `radio_km` of (lat, lon).
+
+        Returns:
+            Dict[str, float]: Content ID -> distance in km
+        """
+        if not self.db_path:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            geo.ensure_rtree_once(conn, self.db_path)
+            return dict(geo.nearby_contenido(conn, lat, lon, radio_km))
+        finally:
+            conn.close()
+
+    def personalized(
+        self,
+        usuario_id: int,
+        cercanos: Optional[Dict[str, float]] = None,
+        limit: int = RECOMMENDATION_LIMIT,
+    ) -> List[Dict]:
+        """
+        Contenido del catálogo que comparte categorías con los intereses del
+        perfil, por relevancia, usando los bitsets de `interests`
+
+        Args:
+            usuario_id: Usuario
+            cercanos: Si se da, solo se consideran estos contenidos (ID -> km)
+            limit: Número máximo de recomendaciones
+
+        Returns:
+            List[Dict]: Vacía si no hay base de datos migrada o el usuario
+            no tiene intereses que coincidan con ninguna categoría
+        """
+        if not self.db_path:
+            return []
+        try:
+            index = interests.get_index(self.db_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Índice de intereses no disponible: {e}")
+            return []
+        perfil = index.profile(usuario_id)
+        if perfil is None:
+            return []
+        filas = index.rows_of(cercanos) if cercanos is not None else None
+        populares = self.popularity_scores() if POPULARITY_BLEND > 0 else {}
+        candidatos = limit * POPULARITY_CANDIDATES if populares else limit
+        elegidas = index.top(perfil, candidatos, filas)
+        if populares:
+            elegidas = [
+                (fila, (1 - POPULARITY_BLEND) * relevancia + POPULARITY_BLEND * populares.get(index.ids[fila], 0.0))
+                for fila, relevancia in elegidas
+            ]
+            # sorted es estable: a igual puntuación se mantiene el orden por rating de `top`
+            elegidas = sorted(elegidas, key=lambda par: -par[1])[:limit]
+        if not elegidas:
+            return []
+
+        detalles = self.details([index.ids[fila] for fila, _ in elegidas])
+        recomendaciones = []
+        for fila, relevancia in elegidas:
+            row = detalles.get(index.ids[fila])
+            if row is None:
+                continue
+            areas = index.names_of(index.content_mask(fila) & perfil[interests.AREA])
+            objetivos = index.names_of(index.content_mask(fila) & perfil[interests.OBJETIVO])
+            recomendacion = dict(zip(DETAIL_COLUMNS, row))
+            recomendacion["relevancia"] = round(relevancia, 4)
+            recomendacion["match_razones"] = (
+                [f"Área de interés: {nombre}" for nombre in areas]
+                + [f"Objetivo: {nombre}" for nombre in objetivos]
+            )
+            if populares.get(row[0], 0.0) >= 0.5:
+                recomendacion["match_razones"].append("Popular entre otros usuarios")
+            if cercanos is not None:
+                recomendacion["distancia_km"] = round(cercanos[row[0]], 3)
+            recomendaciones.append(recomendacion)
+        return recomendaciones
+
+    def popularity_scores(self) -> Dict[str, float]:
+        """
+        Popularidad (0-1, relativa al contenido más popular) del top-k que
+        mantiene `popularity`; vacío si la base de datos no tiene contadores
+        """
+        if not self.db_path:
+            return {}
+        try:
+            return dict(popularity.get_popularity(self.db_path).top(popularity.POPULAR, popularity.POPULARITY_TOP_K))
+        except sqlite3.Error as e:
+            logger.warning(f"Popularidad no disponible: {e}")
+            return {}
+
+    def popular(self, cercanos: Optional[Dict[str, float]] = None, limit: int = RECOMMENDATION_LIMIT) -> List[Dict]:
+        """
+        Contenido popular y en tendencia, para usuarios sin intereses que
+        coincidan con el catálogo
+
+        Args:
+            cercanos: Si se da, solo se consideran estos contenidos (ID -> km)
+            limit: Número máximo de recomendaciones
 
-    def generate(self, usuario_id: int) -> List[Dict]:
+        Returns:
+            List[Dict]: Vacía si no hay contadores de popularidad
         """
-        Generates fake personalized recommendations for testing.
+        if not self.db_path:
+            return []
+        try:
+            elegidos = popularity.get_popularity(self.db_path).blended(popularity.POPULARITY_TOP_K)
+        except sqlite3.Error as e:
+            logger.warning(f"Popularidad no disponible: {e}")
+            return []
+        if cercanos is not None:
+            elegidos = [(contenido_id, p) for contenido_id, p in elegidos if contenido_id in cercanos]
+
+        detalles = self.details([contenido_id for contenido_id, _ in elegidos])
+        recomendaciones = []
+        for contenido_id, puntuacion in elegidos:
+            row = detalles.get(contenido_id)
+            if row is None or row[8] != "activo":
+                continue
+            recomendacion = dict(zip(DETAIL_COLUMNS, row))
+            recomendacion["relevancia"] = round(puntuacion, 4)
+            recomendacion["match_razones"] = ["Popular entre otros usuarios"]
+            if cercanos is not None:
+                recomendacion["distancia_km"] = round(cercanos[contenido_id], 3)
+            recomendaciones.append(recomendacion)
+            if len(recomendaciones) == limit:
+                break
+        return recomendaciones
+
+    def details(self, ids: List[str]) -> Dict[str, tuple]:
+        """
+        Columnas `DETAIL_COLUMNS` de los contenidos pedidos, por ID
+        """
+        if not ids:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT id, titulo, COALESCE(descripcion, ''), tipo, COALESCE(modalidad, ''),
+                       nivel, rating, precio, estado
+                FROM contenido_formativo WHERE id IN ({", ".join("?" * len(ids))})
+                """,
+                ids,
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0]: row for row in rows}
+
+    def generate(
+        self,
+        usuario_id: int,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radio_km: Optional[float] = None,
+    ) -> List[Dict]:
+        """
+        Generates personalized recommendations from the profile interests,
+        falling back to popular content and then to fake recommendations
+        when there are none.
         
         Args:
             usuario_id: User ID to generate recommendations for
+            lat, lon, radio_km: Optional "near me" filter; only content
+                located within `radio_km` of (lat, lon) is kept
             
         Returns:
-            List[Dict]: List of fake recommendations
+            List[Dict]: List of recommendations
         """
         try:
+            cerca = lat is not None and lon is not None and radio_km is not None
+            cercanos = self.nearby(lat, lon, radio_km) if cerca else None
+            recomendaciones = self.personalized(usuario_id, cercanos)
+            if recomendaciones:
+                logger.info(f"Generadas {len(recomendaciones)} recomendaciones para usuario {usuario_id}")
+                return recomendaciones
+            recomendaciones = self.popular(cercanos)
+            if recomendaciones:
+                logger.info(f"Generadas {len(recomendaciones)} recomendaciones populares para usuario {usuario_id}")
+                return recomendaciones
+
             fake_recommendations = [
                 {
                     "id": "1001",
@@ -93,6 +279,14 @@ class ContentRecommender:
                     ]
                 }
             ]
+
+            if cerca:
+                fake_recommendations = [
+                    dict(rec, distancia_km=round(cercanos[rec["id"]], 3))
+                    for rec in fake_recommendations
+                    if rec["id"] in cercanos
+                ]
+                fake_recommendations.sort(key=lambda rec: rec["distancia_km"])
             
             logger.info(f"Generadas {len(fake_recommendations)} recomendaciones fake para usuario {usuario_id}")
             return fake_recommendations
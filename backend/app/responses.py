@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+MIN_COMPRESS_SIZE = 500
+
+
+def etag_for(body: bytes) -> str:
+    """
+    ETag débil derivado del contenido (independiente de la codificación)
+    """
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True si la cabecera If-None-Match de la petición incluye `etag`
+    """
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    # La comparación de If-None-Match es débil: W/"x" equivale a "x"
+    valor = etag.removeprefix("W/")
+    return any(candidato.strip().removeprefix("W/") == valor for candidato in cabecera.split(","))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Elige "br" o "gzip" según Accept-Encoding (respetando q=0)
+    """
+    if not accept_encoding:
+        return None
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+    comodin = aceptadas.get("*", 0.0)
+    if brotli is not None and aceptadas.get("br", comodin) > 0:
+        return "br"
+    if aceptadas.get("gzip", comodin) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Respuesta con ETag, 304 si el cliente ya la tiene y compresión negociada
+
+    Args:
+        request: Petición entrante (If-None-Match, Accept-Encoding)
+        body: Cuerpo sin comprimir
+        media_type: Content-Type de la respuesta
+        headers: Cabeceras adicionales
+
+    Returns:
+        Response: 304 sin cuerpo o 200 con el cuerpo (comprimido si procede)
+    """
+    etag = etag_for(body)
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        **(headers or {}),
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cabeceras)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        body = compress(body, encoding)
+        cabeceras["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=cabeceras)
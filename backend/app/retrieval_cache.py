@@ -0,0 +1,244 @@
+"""
+Caché de resultados de `chatbot.sql_query`
+
+La clave es el conjunto de categorías (ordenado, sin repetidos) más el
+filtro "cerca de mí". Un contador en `catalogo_version`, que suben los
+triggers de `contenido_formativo`, `contenido_categorias` y `categorias`,
+hace de versión de los datos: cuando cambia, la caché se vacía entera.
+
+Las filas guardadas son `FrozenRow` (dicts de solo lectura) y se comparten
+entre entradas y entre llamadas: un mismo contenido en varias consultas
+ocupa memoria una sola vez. El tamaño se limita en bytes con LRU.
+"""
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CACHE_MB = float(os.getenv("RETRIEVAL_CACHE_MB", "16"))
+
+VERSION_TABLE = "catalogo_version"
+# Tablas que leen las consultas cacheadas
+VERSIONED_TABLES = ("contenido_formativo", "contenido_categorias", "categorias")
+
+CATALOG_VERSION_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    # Empieza en un valor aleatorio: una base de datos recreada en la misma ruta
+    # no repite las versiones de la anterior
+    f"INSERT OR IGNORE INTO {VERSION_TABLE} (id, version) VALUES (1, abs(random() >> 16))",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {tabla}_version_{sufijo} AFTER {evento} ON {tabla}
+    BEGIN
+        UPDATE {VERSION_TABLE} SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for tabla in VERSIONED_TABLES
+    for sufijo, evento in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+]
+
+
+def data_version(conn: sqlite3.Connection) -> Optional[int]:
+    """
+    Versión actual del catálogo; None si la base de datos no tiene la tabla
+    """
+    try:
+        row = conn.execute(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+class FrozenRow(dict):
+    """
+    Dict de solo lectura: se serializa como cualquier dict, pero no se
+    puede modificar porque lo comparten todas las respuestas cacheadas
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenRow es de solo lectura; copia la fila con dict(fila)")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenRow, (dict(self),))
+
+
+def row_bytes(row: Dict) -> int:
+    # Las claves son las mismas cadenas en todas las filas: no se cuentan
+    return sys.getsizeof(row) + sum(sys.getsizeof(valor) for valor in row.values())
+
+
+PAIR_BYTES = sys.getsizeof((None, None))
+
+
+def entry_bytes(entry: tuple) -> int:
+    # Sin las filas, que se cuentan aparte
+    return sys.getsizeof(entry) + PAIR_BYTES * len(entry)
+
+
+class RetrievalCache:
+    """
+    LRU acotada en bytes de listas de filas, ligada a una versión de los datos
+
+    Cada fila se cuenta una vez aunque la usen varias entradas; sale de la
+    caché cuando la última entrada que la usa es expulsada.
+    """
+
+    def __init__(self, max_bytes: int = int(RETRIEVAL_CACHE_MB * 2**20)):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Filas congeladas por identidad: [fila, entradas que la usan]
+        self._rows: Dict[Hashable, list] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._rows.clear()
+        self.bytes = 0
+
+    def _add(self, key: Hashable, rows: List[Tuple[Hashable, Dict]]) -> tuple:
+        entry = []
+        for clave, row in rows:
+            compartida = self._rows.get(clave)
+            if compartida is None:
+                compartida = self._rows[clave] = [FrozenRow(row), 0]
+                self.bytes += row_bytes(compartida[0])
+            compartida[1] += 1
+            entry.append((clave, compartida[0]))
+        entry = tuple(entry)
+        self._entries[key] = entry
+        self.bytes += entry_bytes(entry)
+        return entry
+
+    def _evict(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry_bytes(entry)
+        for clave, row in entry:
+            compartida = self._rows[clave]
+            compartida[1] -= 1
+            if compartida[1] == 0:
+                del self._rows[clave]
+                self.bytes -= row_bytes(row)
+
+    def get_or_load(
+        self,
+        conn: sqlite3.Connection,
+        key: Hashable,
+        load: Callable[[], List[Tuple[Hashable, Dict]]],
+    ) -> List[FrozenRow]:
+        """
+        Filas de `key` para la versión actual de los datos, llamando a
+        `load` si no están
+
+        Args:
+            conn: Conexión de la que leer la versión
+            key: Clave de la consulta
+            load: Ejecuta la consulta y devuelve pares (identidad, fila); dos
+                filas con la misma identidad son iguales mientras no cambie la
+                versión. Se llama sin el lock de la caché
+
+        Returns:
+            List[FrozenRow]: Lista nueva; las filas son compartidas
+        """
+        version = data_version(conn)
+        if version is None:
+            # Sin migrar no hay forma de saber si los datos cambiaron
+            self.uncacheable += 1
+            return [row for _, row in load()]
+
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                    logger.info(f"Catálogo en la versión {version}: caché de recuperación vaciada")
+                self._clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [row for _, row in entry]
+            self.misses += 1
+
+        rows = load()
+        with self._lock:
+            if version != self._version or key in self._entries:
+                # Otro hilo vio una versión más nueva, o ya guardó la misma consulta
+                return [row for _, row in rows]
+            entry = self._add(key, rows)
+            while self.bytes > self.max_bytes and self._entries:
+                viejo = next(iter(self._entries))
+                self._evict(viejo)
+                if viejo == key:
+                    self.uncacheable += 1
+                else:
+                    self.evictions += 1
+            return [row for _, row in entry]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "rows": len(self._rows),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "uncacheable": self.uncacheable,
+        }
+
+
+_caches: Dict[str, RetrievalCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path: str) -> RetrievalCache:
+    """
+    Caché compartida por ruta de base de datos dentro del proceso
+    """
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = _caches[db_path] = RetrievalCache()
+        return cache
+
+
+def invalidate(db_path: Optional[str] = None) -> None:
+    for path, cache in list(_caches.items()):
+        if db_path is None or path == db_path:
+            cache.clear()
+
+
+def stats() -> Dict[str, Dict]:
+    return {path: cache.stats() for path, cache in _caches.items()}
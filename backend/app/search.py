@@ -0,0 +1,143 @@
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, List
+
+FTS_TABLE = "contenido_fts"
+FTS_IDS_TABLE = "contenido_fts_ids"
+
+# Primera versión (migración 5): índice de contenido externo enlazado por el
+# rowid implícito de contenido_formativo. Como su clave primaria es VARCHAR,
+# un VACUUM puede renumerar ese rowid y el índice apuntaría a otras filas.
+FTS_V1_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        titulo, descripcion,
+        content='contenido_formativo', content_rowid='rowid',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contenido_fts_ai AFTER INSERT ON contenido_formativo
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, titulo, descripcion)
+        VALUES (NEW.rowid, NEW.titulo, NEW.descripcion);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contenido_fts_au AFTER UPDATE OF titulo, descripcion ON contenido_formativo
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, titulo, descripcion)
+        VALUES ('delete', OLD.rowid, OLD.titulo, OLD.descripcion);
+        INSERT INTO {FTS_TABLE} (rowid, titulo, descripcion)
+        VALUES (NEW.rowid, NEW.titulo, NEW.descripcion);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contenido_fts_ad AFTER DELETE ON contenido_formativo
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, titulo, descripcion)
+        VALUES ('delete', OLD.rowid, OLD.titulo, OLD.descripcion);
+    END
+    """,
+]
+
+FTS_V1_BACKFILL = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+
+# Índice FTS5 normal (guarda su copia del texto) con `contenido_id`. Su rowid
+# sale de `contenido_fts_ids`, una clave INTEGER PRIMARY KEY estable por
+# contenido que VACUUM no renumera y que permite borrar por rowid desde los
+# triggers. `remove_diacritics 2` hace que "informatica" encuentre "informàtica".
+_fts_rowid = f"(SELECT fts_rowid FROM {FTS_IDS_TABLE} WHERE contenido_id = {{id}})"
+
+FTS_DDL = [
+    "DROP TRIGGER IF EXISTS contenido_fts_ai",
+    "DROP TRIGGER IF EXISTS contenido_fts_au",
+    "DROP TRIGGER IF EXISTS contenido_fts_ad",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"""
+    CREATE TABLE IF NOT EXISTS {FTS_IDS_TABLE} (
+        fts_rowid INTEGER PRIMARY KEY,
+        contenido_id VARCHAR NOT NULL UNIQUE
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        contenido_id UNINDEXED, titulo, descripcion,
+        tokenize="unicode61 remove_diacritics 2"
+    )
+    """,
+    f"""
+    CREATE TRIGGER contenido_fts_ai AFTER INSERT ON contenido_formativo
+    BEGIN
+        INSERT OR IGNORE INTO {FTS_IDS_TABLE} (contenido_id) VALUES (NEW.id);
+        INSERT INTO {FTS_TABLE} (rowid, contenido_id, titulo, descripcion)
+        VALUES ({_fts_rowid.format(id="NEW.id")}, NEW.id, NEW.titulo, NEW.descripcion);
+    END
+    """,
+    f"""
+    CREATE TRIGGER contenido_fts_au AFTER UPDATE OF id, titulo, descripcion ON contenido_formativo
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = {_fts_rowid.format(id="OLD.id")};
+        UPDATE {FTS_IDS_TABLE} SET contenido_id = NEW.id WHERE contenido_id = OLD.id;
+        INSERT INTO {FTS_TABLE} (rowid, contenido_id, titulo, descripcion)
+        VALUES ({_fts_rowid.format(id="NEW.id")}, NEW.id, NEW.titulo, NEW.descripcion);
+    END
+    """,
+    f"""
+    CREATE TRIGGER contenido_fts_ad AFTER DELETE ON contenido_formativo
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = {_fts_rowid.format(id="OLD.id")};
+        DELETE FROM {FTS_IDS_TABLE} WHERE contenido_id = OLD.id;
+    END
+    """,
+]
+
+FTS_BACKFILL = [
+    f"INSERT OR IGNORE INTO {FTS_IDS_TABLE} (contenido_id) SELECT id FROM contenido_formativo",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, contenido_id, titulo, descripcion)
+    SELECT i.fts_rowid, cf.id, cf.titulo, cf.descripcion
+    FROM contenido_formativo AS cf JOIN {FTS_IDS_TABLE} AS i ON i.contenido_id = cf.id
+    """,
+]
+
+# Palabras de menos letras (articles, preposicions...) no aportan a la búsqueda
+MIN_TERM_LENGTH = 4
+
+
+SEARCH_SQL = f"""
+SELECT cf.titulo, cf.descripcion, cf.tipo, cf.modalidad, cf.nivel,
+       cf.rating, cf.precio, cf.estado
+FROM {FTS_TABLE} AS f
+JOIN contenido_formativo AS cf ON cf.id = f.contenido_id
+WHERE {FTS_TABLE} MATCH ?
+ORDER BY f.rank
+LIMIT ?
+"""
+
+
+def match_expression(texto: str) -> str:
+    """
+    Convierte una pregunta en una consulta FTS5: sus palabras, entre
+    comillas para neutralizar la sintaxis de FTS, unidas con OR
+
+    Returns:
+        str: Expresión MATCH, vacía si la pregunta no tiene palabras útiles
+    """
+    texto = unicodedata.normalize("NFKC", texto).casefold()
+    terminos = dict.fromkeys(t for t in re.findall(r"\w+", texto) if len(t) >= MIN_TERM_LENGTH)
+    return " OR ".join(f'"{t}"' for t in terminos)
+
+
+def search_contenido(conn: sqlite3.Connection, texto: str, limit: int = 20) -> List[Dict]:
+    """
+    Contenido formativo que menciona las palabras de `texto`, por relevancia
+    (bm25), en el mismo formato que `chatbot.sql_query`
+    """
+    expresion = match_expression(texto)
+    if not expresion:
+        return []
+    rows = conn.execute(SEARCH_SQL, (expresion, limit)).fetchall()
+    claves = ("titulo", "descripcion", "tipo", "modalidad", "nivel", "rating", "precio", "estado")
+    return [dict(zip(claves, row)) for row in rows]
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución
+
+    La primera llamada con una clave lanza el trabajo en su propia tarea; las
+    que llegan mientras sigue en curso esperan esa misma tarea y reciben el
+    mismo resultado (o la misma excepción). El resultado se comparte entre
+    todos los que esperan, así que no debe modificarse.
+
+    La tarea no se cancela si el cliente que la lanzó se desconecta: los
+    demás siguen esperándola.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta `fn()` una vez por clave en curso y devuelve su resultado
+
+        Args:
+            key: Clave que identifica trabajo idéntico
+            fn: Función que crea la corrutina a ejecutar
+        """
+        self.calls += 1
+        # Una tarea solo se puede esperar desde su propio bucle de eventos
+        key = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+        else:
+            self.collapsed += 1
+            logger.debug(f"[{self.name}] petición agrupada con otra en curso: {key[1]!r}")
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marca la excepción como recuperada aunque ya no quede nadie esperando
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": self.in_flight(),
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def get_flight(name: str) -> SingleFlight:
+    """
+    Instancia de SingleFlight compartida por nombre dentro del proceso
+    """
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {name: flight.stats() for name, flight in _flights.items()}
+
+
+def normalize_question(texto: str) -> str:
+    """
+    Normaliza una pregunta para usarla como clave: Unicode NFKC, sin
+    mayúsculas, espacios colapsados y sin signos de interrogación o
+    exclamación en los extremos
+    """
+    texto = unicodedata.normalize("NFKC", texto).casefold()
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.strip(" ?!.¿¡")
+
+
+def question_key(texto: str, *extra: Optional[Any]) -> tuple:
+    return (normalize_question(texto),) + extra
@@ -0,0 +1,445 @@
+"""
+Snapshot inmutable del catálogo en formato columnar, mapeado en memoria
+
+`build` compila `contenido_formativo`, `categorias` y `contenido_categorias`
+en un único fichero con arrays NumPy y tablas de strings. Cada worker lo
+abre con mmap en solo lectura, así que el arranque es casi instantáneo y
+todos los procesos comparten las mismas páginas de la caché del sistema.
+
+Publicar un snapshot nuevo es atómico (se escribe a un temporal y se hace
+`os.replace`); los workers detectan el cambio y cambian de mapa sin
+reiniciar.
+
+El snapshot guarda la versión de `catalogo_version` con la que se compiló:
+si la base de datos ya va por otra, `current_for` no lo devuelve y las
+consultas vuelven a SQLite hasta que se publique uno nuevo.
+
+Uso:
+    python -m app.snapshot [--db db/jaa.sqlite] [--out db/catalogo.snap]
+"""
+import argparse
+import bisect
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.retrieval_cache import data_version
+from db.session import DB_DIR, DB_PATH
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", os.path.join(DB_DIR, "db", "catalogo.snap"))
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_CHECK_INTERVAL", "5"))
+
+MAGIC = b"JAASNAP1"
+ALIGN = 64
+
+# Columnas de texto libre, guardadas como tablas de strings
+STRING_COLUMNS = ("id", "titulo", "descripcion")
+# Columnas con pocos valores distintos, guardadas como códigos uint8
+CATEGORICAL_COLUMNS = ("tipo", "modalidad", "nivel", "estado")
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class StringTable:
+    """
+    Lista de strings UTF-8 concatenados con sus offsets (n + 1 posiciones)
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+        # Decodificar desde un memoryview evita crear arrays NumPy por string
+        self._mv = memoryview(data)
+
+    @staticmethod
+    def encode(valores: Iterable[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        codificados = [(valor or "").encode("utf-8") for valor in valores]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in codificados], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(codificados), dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self._mv[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def take(self, filas: np.ndarray) -> List[str]:
+        """
+        Decodifica de golpe los strings de `filas`
+        """
+        inicios = self.offsets[filas].tolist()
+        fines = self.offsets[filas + 1].tolist()
+        mv = self._mv
+        return [str(mv[a:b], "utf-8") for a, b in zip(inicios, fines)]
+
+    def index(self, valor: str) -> int:
+        """
+        Posición de `valor` en una tabla ordenada, o -1 si no está
+        """
+        i = bisect.bisect_left(_LazyStrings(self), valor)
+        return i if i < len(self) and self[i] == valor else -1
+
+
+class _LazyStrings(Sequence):
+    """Vista de una StringTable que solo decodifica lo que bisect consulta"""
+
+    def __init__(self, tabla: StringTable):
+        self.tabla = tabla
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def __getitem__(self, i):
+        return self.tabla[i]
+
+
+def _csr(pares: Sequence[Tuple[int, int]], n_filas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pasa pares (fila, columna) a formato CSR (indptr, indices)
+    """
+    if pares:
+        filas, columnas = np.asarray(pares, dtype=np.int32).T
+    else:
+        filas = columnas = np.zeros(0, dtype=np.int32)
+    orden = np.lexsort((columnas, filas))
+    indptr = np.zeros(n_filas + 1, dtype=np.int32)
+    np.cumsum(np.bincount(filas, minlength=n_filas), out=indptr[1:])
+    return indptr, columnas[orden].astype(np.int32)
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+    """
+    Escribe `arrays` en un fichero nuevo y lo publica de forma atómica
+
+    Formato: MAGIC, longitud de la cabecera (uint64), cabecera JSON y los
+    arrays alineados a 64 bytes a partir del primer múltiplo tras la cabecera.
+    """
+    especificacion = {}
+    offset = 0
+    for nombre, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[nombre] = array
+        especificacion[nombre] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    cabecera = json.dumps({"meta": meta, "arrays": especificacion}).encode()
+    base = _align(16 + len(cabecera))
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(cabecera)).tobytes())
+        f.write(cabecera)
+        for nombre, array in arrays.items():
+            f.seek(base + especificacion[nombre]["offset"])
+            f.write(array.tobytes())
+        f.truncate(base + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def build(db_path: str = DB_PATH, out_path: str = SNAPSHOT_PATH) -> Dict:
+    """
+    Compila el catálogo de `db_path` en un snapshot en `out_path`
+
+    Returns:
+        Dict: Metadatos del snapshot publicado
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        # Una sola transacción de lectura: la versión corresponde a las filas leídas
+        conn.execute("BEGIN")
+        version = data_version(conn)
+        contenidos = conn.execute(
+            f"""
+            SELECT {', '.join(STRING_COLUMNS + CATEGORICAL_COLUMNS)},
+                   rating, precio, ubicacion_id, duracion_horas, destacado
+            FROM contenido_formativo
+            ORDER BY id
+            """
+        ).fetchall()
+        categorias = conn.execute(
+            "SELECT id, nombre, activa FROM categorias ORDER BY id"
+        ).fetchall()
+        relaciones = conn.execute(
+            "SELECT contenido_id, categoria_id FROM contenido_categorias"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    arrays: Dict[str, np.ndarray] = {}
+    columnas = list(zip(*contenidos)) if contenidos else [()] * (len(STRING_COLUMNS) + len(CATEGORICAL_COLUMNS) + 5)
+    for i, nombre in enumerate(STRING_COLUMNS):
+        arrays[f"{nombre}.offsets"], arrays[f"{nombre}.data"] = StringTable.encode(columnas[i])
+        arrays[f"{nombre}.null"] = np.array([v is None for v in columnas[i]], dtype=np.uint8)
+
+    vocabularios = {}
+    for j, nombre in enumerate(CATEGORICAL_COLUMNS):
+        valores = columnas[len(STRING_COLUMNS) + j]
+        vocab = sorted({v for v in valores if v is not None})
+        codigo = {v: k for k, v in enumerate(vocab)}
+        # 255 representa NULL
+        arrays[nombre] = np.array([codigo.get(v, 255) for v in valores], dtype=np.uint8)
+        vocabularios[nombre] = vocab
+
+    rating, precio, ubicacion, duracion, destacado = columnas[len(STRING_COLUMNS) + len(CATEGORICAL_COLUMNS):]
+    arrays["rating"] = np.array([math.nan if v is None else v for v in rating], dtype=np.float64)
+    arrays["precio"] = np.array([math.nan if v is None else v for v in precio], dtype=np.float64)
+    arrays["ubicacion_id"] = np.array([-1 if v is None else v for v in ubicacion], dtype=np.int32)
+    arrays["duracion_horas"] = np.array([-1 if v is None else v for v in duracion], dtype=np.int32)
+    arrays["destacado"] = np.array([bool(v) for v in destacado], dtype=np.uint8)
+
+    arrays["categoria.id"] = np.array([c[0] for c in categorias], dtype=np.int32)
+    arrays["categoria.nombre.offsets"], arrays["categoria.nombre.data"] = StringTable.encode(c[1] for c in categorias)
+    arrays["categoria.activa"] = np.array([bool(c[2]) for c in categorias], dtype=np.uint8)
+
+    fila_contenido = {row[0]: i for i, row in enumerate(contenidos)}
+    fila_categoria = {c[0]: i for i, c in enumerate(categorias)}
+    pares = [
+        (fila_contenido[contenido_id], fila_categoria[categoria_id])
+        for contenido_id, categoria_id in relaciones
+        if contenido_id in fila_contenido and categoria_id in fila_categoria
+    ]
+    arrays["contenido_categorias.indptr"], arrays["contenido_categorias.indices"] = _csr(pares, len(contenidos))
+    arrays["categoria_contenidos.indptr"], arrays["categoria_contenidos.indices"] = _csr(
+        [(c, f) for f, c in pares], len(categorias)
+    )
+
+    meta = {
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "source": os.path.abspath(db_path),
+        "catalog_version": version,
+        "contenidos": len(contenidos),
+        "categorias": len(categorias),
+        "relaciones": len(pares),
+        "vocab": vocabularios,
+    }
+    write_snapshot(out_path, arrays, meta)
+    logger.info(f"Snapshot del catálogo publicado en {out_path}: {meta['contenidos']} contenidos")
+    return meta
+
+
+class CatalogSnapshot:
+    """
+    Vista de solo lectura de un snapshot mapeado en memoria
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buf = np.memmap(path, dtype=np.uint8, mode="r")
+        if self._buf[:8].tobytes() != MAGIC:
+            raise ValueError(f"{path} no es un snapshot del catálogo")
+        longitud = int(np.frombuffer(self._buf, dtype="<u8", count=1, offset=8)[0])
+        cabecera = json.loads(self._buf[16:16 + longitud].tobytes())
+        base = _align(16 + longitud)
+        self.meta: Dict = cabecera["meta"]
+        self.arrays: Dict[str, np.ndarray] = {}
+        for nombre, spec in cabecera["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            n = int(np.prod(spec["shape"], dtype=np.int64))
+            self.arrays[nombre] = np.frombuffer(
+                self._buf, dtype=dtype, count=n, offset=base + spec["offset"]
+            ).reshape(spec["shape"])
+
+        a = self.arrays
+        self.ids = StringTable(a["id.offsets"], a["id.data"])
+        self.titulos = StringTable(a["titulo.offsets"], a["titulo.data"])
+        self.descripciones = StringTable(a["descripcion.offsets"], a["descripcion.data"])
+        self.categoria_nombres = StringTable(a["categoria.nombre.offsets"], a["categoria.nombre.data"])
+        self.vocab: Dict[str, List[str]] = self.meta["vocab"]
+        self._categoria_por_nombre: Dict[str, List[int]] = {}
+        for i in range(len(self.categoria_nombres)):
+            self._categoria_por_nombre.setdefault(self.categoria_nombres[i], []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def categorias_activas(self) -> List[str]:
+        activas = np.flatnonzero(self.arrays["categoria.activa"])
+        return [self.categoria_nombres[int(i)] for i in activas]
+
+    def row_of(self, contenido_id: str) -> int:
+        return self.ids.index(contenido_id)
+
+    def _string(self, tabla: StringTable, columna: str, i: int) -> Optional[str]:
+        return None if self.arrays[f"{columna}.null"][i] else tabla[i]
+
+    def _categorical(self, columna: str, i: int) -> Optional[str]:
+        codigo = int(self.arrays[columna][i])
+        return None if codigo == 255 else self.vocab[columna][codigo]
+
+    def rows_for_categories(self, nombres: Iterable[str]) -> np.ndarray:
+        """
+        Filas (ordenadas, sin repetir) de los contenidos de esas categorías
+        """
+        indptr = self.arrays["categoria_contenidos.indptr"]
+        indices = self.arrays["categoria_contenidos.indices"]
+        trozos = [
+            indices[indptr[c]:indptr[c + 1]]
+            for nombre in nombres
+            for c in self._categoria_por_nombre.get(nombre, ())
+        ]
+        if not trozos:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(trozos))
+
+    def activity(self, i: int) -> Dict:
+        """
+        Fila en el mismo formato que devuelve `chatbot.sql_query`
+        """
+        rating = float(self.arrays["rating"][i])
+        precio = float(self.arrays["precio"][i])
+        return {
+            "titulo": self._string(self.titulos, "titulo", i),
+            "descripcion": self._string(self.descripciones, "descripcion", i),
+            "tipo": self._categorical("tipo", i),
+            "modalidad": self._categorical("modalidad", i),
+            "nivel": self._categorical("nivel", i),
+            "rating": None if math.isnan(rating) else rating,
+            "precio": None if math.isnan(precio) else precio,
+            "estado": self._categorical("estado", i),
+        }
+
+    def _take_strings(self, tabla: StringTable, columna: str, filas: np.ndarray) -> List[Optional[str]]:
+        nulos = self.arrays[f"{columna}.null"][filas].tolist()
+        return [None if nulo else valor for nulo, valor in zip(nulos, tabla.take(filas))]
+
+    def _take_categorical(self, columna: str, filas: np.ndarray) -> List[Optional[str]]:
+        vocab = self.vocab[columna]
+        return [None if codigo == 255 else vocab[codigo] for codigo in self.arrays[columna][filas].tolist()]
+
+    def _take_float(self, columna: str, filas: np.ndarray) -> List[Optional[float]]:
+        return [None if math.isnan(v) else v for v in self.arrays[columna][filas].tolist()]
+
+    def activities(self, filas: np.ndarray) -> List[Dict]:
+        """
+        Igual que `activity` para varias filas, decodificando columna a columna
+        """
+        columnas = {
+            "titulo": self._take_strings(self.titulos, "titulo", filas),
+            "descripcion": self._take_strings(self.descripciones, "descripcion", filas),
+            "tipo": self._take_categorical("tipo", filas),
+            "modalidad": self._take_categorical("modalidad", filas),
+            "nivel": self._take_categorical("nivel", filas),
+            "rating": self._take_float("rating", filas),
+            "precio": self._take_float("precio", filas),
+            "estado": self._take_categorical("estado", filas),
+        }
+        claves = list(columnas)
+        return [dict(zip(claves, valores)) for valores in zip(*columnas.values())]
+
+    def contenido_por_categorias(self, nombres: Iterable[str]) -> List[Dict]:
+        return self.activities(self.rows_for_categories(nombres))
+
+
+class SnapshotHolder:
+    """
+    Mantiene el snapshot abierto y cambia al nuevo cuando se publica otro
+
+    Como mucho una vez cada `check_interval` segundos compara el inodo y la
+    fecha del fichero; si cambiaron, abre el nuevo mapa y lo sustituye. El
+    mapa anterior se libera cuando nadie lo usa.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, check_interval: float = SNAPSHOT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._current: Optional[CatalogSnapshot] = None
+        self._signature = None
+        self._checked = -math.inf
+        self._lock = threading.Lock()
+        self.reloads = 0
+        # Consultas que no usaron el snapshot por estar desfasado
+        self.stale = 0
+
+    def get(self) -> Optional[CatalogSnapshot]:
+        if time.monotonic() - self._checked >= self.check_interval:
+            self._refresh()
+        return self._current
+
+    def _refresh(self) -> None:
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            firma = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if firma == self._signature:
+                return
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"No se pudo abrir el snapshot {self.path}: {e}")
+                return
+            self._current = snapshot
+            self._signature = firma
+            self.reloads += 1
+            logger.info(f"Snapshot del catálogo cargado ({snapshot.meta['built_at']}, {len(snapshot)} contenidos)")
+
+    def stats(self) -> Dict:
+        snapshot = self._current
+        return {
+            "path": self.path,
+            "loaded": snapshot is not None,
+            "built_at": snapshot.meta["built_at"] if snapshot else None,
+            "contenidos": len(snapshot) if snapshot else 0,
+            "catalog_version": snapshot.meta.get("catalog_version") if snapshot else None,
+            "reloads": self.reloads,
+            "stale": self.stale,
+        }
+
+
+_holder = SnapshotHolder()
+
+
+def current() -> Optional[CatalogSnapshot]:
+    """
+    Snapshot vigente del proceso, o None si no se ha publicado ninguno
+    """
+    return _holder.get()
+
+
+def current_for(conn: sqlite3.Connection) -> Optional[CatalogSnapshot]:
+    """
+    Snapshot vigente si se compiló con la versión actual del catálogo de
+    `conn`; None si no hay, es de otra versión o no se puede comprobar
+    """
+    snap = current()
+    if snap is None:
+        return None
+    version = snap.meta.get("catalog_version")
+    if version is None or version != data_version(conn):
+        _holder.stale += 1
+        return None
+    return snap
+
+
+def stats() -> Dict:
+    return _holder.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(build(args.db, args.out), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+Trazas de las llamadas al LLM fuera del camino de la petición
+
+Cada traza se decide al empezar (muestreo en cabeza): si no se muestrea, ni
+ella ni sus spans hijos cuestan más que una consulta a un ContextVar. Los
+spans terminados se encolan en un buffer acotado que un hilo exporta por
+lotes; si el buffer está lleno, el span se descarta y se cuenta en lugar de
+bloquear la petición.
+
+Configuración:
+    TRACING_SINK: langsmith | file | memory | none (por defecto langsmith si
+        LANGCHAIN_TRACING_V2=true, si no none)
+    TRACING_SAMPLE_RATE: fracción de trazas que se exportan (0-1)
+    TRACING_FILE: fichero JSONL del sink `file`
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACING_SINK = os.getenv(
+    "TRACING_SINK", "langsmith" if os.getenv("LANGCHAIN_TRACING_V2", "").lower() == "true" else "none"
+)
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+TRACING_BATCH_SIZE = int(os.getenv("TRACING_BATCH_SIZE", "100"))
+TRACING_FLUSH_INTERVAL = float(os.getenv("TRACING_FLUSH_INTERVAL", "2"))
+
+# Longitud máxima de las entradas y salidas guardadas en un span
+MAX_VALUE_CHARS = 4000
+
+Sink = Callable[[List[Dict]], None]
+
+
+def _truncate(valor: Any) -> Any:
+    if isinstance(valor, str):
+        return valor if len(valor) <= MAX_VALUE_CHARS else valor[:MAX_VALUE_CHARS] + "…"
+    if isinstance(valor, dict):
+        return {k: _truncate(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_truncate(v) for v in valor]
+    if valor is None or isinstance(valor, (int, float, bool)):
+        return valor
+    return _truncate(repr(valor))
+
+
+class Span:
+    """
+    Un tramo de una traza; se exporta como dict al cerrarse
+    """
+
+    __slots__ = ("tracer", "name", "run_type", "id", "trace_id", "parent_id",
+                 "dotted_order", "inputs", "outputs", "metadata", "error", "start", "_t0")
+
+    def __init__(self, tracer: "Tracer", name: str, run_type: str, parent: Optional["Span"], inputs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.run_type = run_type
+        self.id = str(uuid.uuid4())
+        self.start = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.parent_id = parent.id if parent else None
+        self.trace_id = parent.trace_id if parent else self.id
+        orden = f"{self.start:%Y%m%dT%H%M%S%fZ}{self.id}"
+        self.dotted_order = f"{parent.dotted_order}.{orden}" if parent else orden
+        self.inputs = inputs
+        self.outputs: Optional[Dict] = None
+        self.metadata: Dict = {}
+        self.error: Optional[str] = None
+
+    def set_outputs(self, **outputs) -> None:
+        self.outputs = outputs
+
+    def set_metadata(self, **metadata) -> None:
+        self.metadata.update(metadata)
+
+    def to_dict(self, duracion: float) -> Dict:
+        return {
+            "id": self.id,
+            "trace_id": self.trace_id,
+            "parent_id": self.parent_id,
+            "dotted_order": self.dotted_order,
+            "name": self.name,
+            "run_type": self.run_type,
+            "start_time": self.start.isoformat(),
+            "duration_ms": 1000 * duracion,
+            "inputs": _truncate(self.inputs),
+            "outputs": _truncate(self.outputs),
+            "metadata": self.metadata,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Span de una traza no muestreada: no guarda nada"""
+
+    __slots__ = ()
+
+    def set_outputs(self, **outputs) -> None:
+        pass
+
+    def set_metadata(self, **metadata) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Span activo en el contexto actual; NOOP_SPAN si la traza no se muestreó
+_current: contextvars.ContextVar = contextvars.ContextVar("tracing_span", default=None)
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "name", "run_type", "inputs", "span", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, run_type: str, inputs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.run_type = run_type
+        self.inputs = inputs
+
+    def __enter__(self):
+        padre = _current.get()
+        if padre is NOOP_SPAN or (padre is None and not self.tracer.sample()):
+            self.span = NOOP_SPAN
+        else:
+            self.span = Span(self.tracer, self.name, self.run_type, padre, self.inputs)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        span = self.span
+        if span is not NOOP_SPAN:
+            if exc is not None:
+                span.error = f"{exc_type.__name__}: {exc}"
+            self.tracer.exporter.export(span.to_dict(time.perf_counter() - span._t0))
+        return False
+
+
+class _NoopContext:
+    """Contexto de un tracer desactivado: ni muestrea ni toca el ContextVar"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_CONTEXT = _NoopContext()
+
+
+class BatchExporter:
+    """
+    Cola acotada de spans terminados que un hilo entrega al sink por lotes
+
+    `export` nunca bloquea: si la cola está llena descarta el span y lo
+    cuenta en `dropped`.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        max_queue: int = TRACING_QUEUE_SIZE,
+        batch_size: int = TRACING_BATCH_SIZE,
+        flush_interval: float = TRACING_FLUSH_INTERVAL,
+    ):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._done_cond = threading.Condition()
+        self._flush_requested = False
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.enqueued = 0
+        self.exported = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def start(self) -> "BatchExporter":
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def export(self, registro: Dict) -> bool:
+        with self._cond:
+            if self._closing or len(self._pending) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._pending.append(registro)
+            self.enqueued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Entrega al sink todo lo encolado hasta ahora y espera a que termine
+        """
+        with self._cond:
+            objetivo = self.enqueued
+            self._flush_requested = True
+            self._cond.notify()
+        with self._done_cond:
+            return self._done_cond.wait_for(
+                lambda: self.exported + self.failed >= objetivo or not self.running,
+                timeout,
+            )
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "exported": self.exported,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+    def _next_batch(self) -> List[Dict]:
+        with self._cond:
+            if not (self._closing or self._flush_requested or len(self._pending) >= self.batch_size):
+                self._cond.wait(self.flush_interval)
+            n = min(len(self._pending), self.batch_size)
+            lote = [self._pending.popleft() for _ in range(n)]
+            if not self._pending:
+                self._flush_requested = False
+            return lote
+
+    def _run(self) -> None:
+        try:
+            while True:
+                lote = self._next_batch()
+                if lote:
+                    try:
+                        self.sink(lote)
+                        exportados = len(lote)
+                    except Exception as e:
+                        logger.error(f"Error exportando {len(lote)} spans: {e}")
+                        exportados = 0
+                    with self._done_cond:
+                        self.exported += exportados
+                        self.failed += len(lote) - exportados
+                        self.batches += 1
+                        self._done_cond.notify_all()
+                with self._cond:
+                    if self._closing and not self._pending:
+                        break
+        finally:
+            with self._done_cond:
+                self._done_cond.notify_all()
+
+
+class InMemorySink:
+    """Guarda los spans en una lista, para tests y benchmarks"""
+
+    def __init__(self):
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, lote: List[Dict]) -> None:
+        with self._lock:
+            self.spans.extend(lote)
+
+
+class FileSink:
+    """Añade los spans a un fichero JSONL"""
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+
+    def __call__(self, lote: List[Dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for registro in lote:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+class LangSmithSink:
+    """Envía los spans a LangSmith; el cliente se crea en el primer lote"""
+
+    def __init__(self, project: Optional[str] = None):
+        self.project = project or os.getenv("LANGCHAIN_PROJECT", "default")
+        self._client = None
+
+    def __call__(self, lote: List[Dict]) -> None:
+        if self._client is None:
+            from langsmith import Client
+
+            self._client = Client()
+        runs = []
+        for registro in lote:
+            inicio = datetime.fromisoformat(registro["start_time"])
+            runs.append({
+                "id": registro["id"],
+                "trace_id": registro["trace_id"],
+                "parent_run_id": registro["parent_id"],
+                "dotted_order": registro["dotted_order"],
+                "name": registro["name"],
+                "run_type": registro["run_type"],
+                "start_time": inicio,
+                "end_time": datetime.fromtimestamp(inicio.timestamp() + registro["duration_ms"] / 1000, timezone.utc),
+                "inputs": registro["inputs"] or {},
+                "outputs": registro["outputs"] or {},
+                "error": registro["error"],
+                "extra": {"metadata": registro["metadata"]},
+                "session_name": self.project,
+            })
+        # El muestreo ya se hizo al empezar la traza
+        self._client.batch_ingest_runs(create=runs, pre_sampled=True)
+
+
+class Tracer:
+    """
+    Crea spans con muestreo en cabeza y los entrega a un BatchExporter
+
+    Sin exporter (tracing desactivado) `span` no crea nada.
+    """
+
+    def __init__(self, exporter: Optional[BatchExporter] = None, sample_rate: float = TRACING_SAMPLE_RATE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.sampled = 0
+        self.unsampled = 0
+        self._rng = random.Random()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def sample(self) -> bool:
+        if self.enabled and (self.sample_rate >= 1 or self._rng.random() < self.sample_rate):
+            self.sampled += 1
+            return True
+        self.unsampled += 1
+        return False
+
+    def span(self, name: str, run_type: str = "chain", **inputs):
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        return _SpanContext(self, name, run_type, inputs)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "unsampled": self.unsampled,
+            "exporter": self.exporter.stats() if self.exporter else None,
+        }
+
+    def shutdown(self, timeout: Optional[float] = 5.0) -> None:
+        if self.exporter is not None:
+            self.exporter.close(timeout)
+
+
+def make_sink(nombre: str) -> Optional[Sink]:
+    if nombre == "langsmith":
+        return LangSmithSink()
+    if nombre == "file":
+        return FileSink()
+    if nombre == "memory":
+        return InMemorySink()
+    if nombre == "none":
+        return None
+    raise ValueError(f"TRACING_SINK desconocido: {nombre}")
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Tracer del proceso, configurado con las variables TRACING_* en el primer uso
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                sink = make_sink(TRACING_SINK)
+                exporter = BatchExporter(sink).start() if sink is not None else None
+                _tracer = Tracer(exporter)
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """
+    Sustituye el tracer del proceso (p. ej. por uno con InMemorySink en tests)
+
+    Returns:
+        El tracer anterior
+    """
+    global _tracer
+    with _tracer_lock:
+        anterior, _tracer = _tracer, tracer
+    return anterior
+
+
+def span(name: str, run_type: str = "chain", **inputs):
+    return get_tracer().span(name, run_type, **inputs)
+
+
+def traceable(fn: Optional[Callable] = None, *, name: Optional[str] = None, run_type: str = "chain"):
+    """
+    Decorador que abre un span por llamada con los argumentos como entradas
+    y el valor devuelto como salida; admite funciones síncronas y corrutinas
+    """
+    def decorador(f):
+        nombre = name or f.__name__
+
+        if inspect.iscoroutinefunction(f):
+            # El span se abre al ejecutar la corrutina, no al crearla
+            @functools.wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                tracer = get_tracer()
+                if not tracer.enabled:
+                    return await f(*args, **kwargs)
+                with tracer.span(nombre, run_type, args=args, kwargs=kwargs) as s:
+                    resultado = await f(*args, **kwargs)
+                    s.set_outputs(output=resultado)
+                    return resultado
+
+            return async_wrapper
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return f(*args, **kwargs)
+            with tracer.span(nombre, run_type, args=args, kwargs=kwargs) as s:
+                resultado = f(*args, **kwargs)
+                s.set_outputs(output=resultado)
+                return resultado
+
+        return wrapper
+
+    return decorador(fn) if fn is not None else decorador
+
+
+def stats() -> Dict:
+    return get_tracer().stats()
+
+
+def shutdown() -> None:
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.shutdown()
+            _tracer = None
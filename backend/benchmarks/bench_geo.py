@@ -0,0 +1,92 @@
+"""
+Benchmark de búsquedas "cerca de mí" sobre `ubicaciones`
+
+Compara el recorrido completo con haversine en Python puro contra el
+filtro por R*Tree + ranking vectorizado con NumPy.
+
+Uso:
+    python -m benchmarks.bench_geo --n 100000 --queries 200
+"""
+import argparse
+import json
+import math
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app import geo
+
+
+def build_db(path: str, n: int, seed: int = 42) -> sqlite3.Connection:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE ubicaciones (id INTEGER PRIMARY KEY, latitud REAL, longitud REAL)"
+    )
+    # Puntos repartidos por Cataluña (aprox.)
+    conn.executemany(
+        "INSERT INTO ubicaciones (id, latitud, longitud) VALUES (?, ?, ?)",
+        ((i, rng.uniform(40.5, 42.9), rng.uniform(0.15, 3.3)) for i in range(1, n + 1)),
+    )
+    conn.commit()
+    geo.ensure_rtree(conn)
+    return conn
+
+
+def naive_nearby(conn, lat, lon, radio_km):
+    resultados = []
+    for id_, la, lo in conn.execute("SELECT id, latitud, longitud FROM ubicaciones"):
+        dlat = math.radians(la - lat)
+        dlon = math.radians(lo - lon)
+        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat)) * math.cos(math.radians(la)) * math.sin(dlon / 2) ** 2
+        d = 2 * geo.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+        if d <= radio_km:
+            resultados.append((id_, d))
+    resultados.sort(key=lambda r: r[1])
+    return resultados
+
+
+def timed(fn, queries):
+    tiempos = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(*q)
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return {
+        "mean_ms": 1000 * sum(tiempos) / len(tiempos),
+        "p50_ms": 1000 * tiempos[len(tiempos) // 2],
+        "p95_ms": 1000 * tiempos[int(len(tiempos) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radio-km", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_db(str(Path(tmp) / "geo.sqlite"), args.n)
+        queries = [
+            (conn, rng.uniform(40.5, 42.9), rng.uniform(0.15, 3.3), args.radio_km)
+            for _ in range(args.queries)
+        ]
+        rtree = timed(geo.nearby_ubicaciones, queries)
+        naive = timed(naive_nearby, queries[: max(1, args.queries // 20)])
+        conn.close()
+
+    print(json.dumps({
+        "ubicaciones": args.n,
+        "radio_km": args.radio_km,
+        "rtree_numpy": rtree,
+        "full_scan_python": naive,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
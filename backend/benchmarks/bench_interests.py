@@ -0,0 +1,80 @@
+"""
+Benchmark del emparejamiento perfil-catálogo con bitsets frente a JSON
+
+La versión de referencia hace lo que haría el recomendador sin el índice:
+deserializar las listas JSON del perfil y cruzar, contenido a contenido,
+conjuntos de nombres de categoría.
+
+Uso:
+    python -m benchmarks.bench_interests --content 20000 --users 200
+"""
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app.interests import OBJETIVO_WEIGHT, InterestIndex
+from benchmarks.bench_geo import timed
+from benchmarks.synthetic import Scale, generate
+
+
+def json_top(conn, categorias_de, usuario_id, limit):
+    areas, objetivos = conn.execute(
+        "SELECT areas_interes, objetivos FROM perfiles WHERE usuario_id = ?", (usuario_id,)
+    ).fetchone()
+    areas, objetivos = set(json.loads(areas)), set(json.loads(objetivos))
+    total = len(areas) + OBJETIVO_WEIGHT * len(objetivos)
+    puntuaciones = [
+        (len(cats & areas) + OBJETIVO_WEIGHT * len(cats & objetivos)) / total
+        for cats in categorias_de.values()
+    ]
+    return sorted((p for p in puntuaciones if p > 0), reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--content", type=int, default=20_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "jaa.sqlite")
+        generate(db_path, Scale(users=args.users, content=args.content, categories=args.categories, interactions=0))
+        conn = sqlite3.connect(db_path)
+
+        t0 = time.perf_counter()
+        index = InterestIndex(conn)
+        build_s = time.perf_counter() - t0
+
+        # La referencia ya parte del catálogo en memoria, como nombres por contenido
+        categorias_de = {}
+        for contenido_id, nombre in conn.execute(
+            """
+            SELECT cc.contenido_id, c.nombre FROM contenido_categorias AS cc
+            JOIN categorias AS c ON c.id = cc.categoria_id
+            """
+        ):
+            categorias_de.setdefault(contenido_id, set()).add(nombre)
+
+        usuarios = [(u,) for u in range(1, args.users + 1)]
+        resultado = {
+            "contenidos": args.content,
+            "categorias": args.categories,
+            "index_build_s": build_s,
+            "index_bytes": index.content.nbytes + sum(m.nbytes for m in index.profiles.values()),
+            "top_k": {
+                "bitsets": timed(lambda u: index.top(index.profile(u), args.limit), usuarios),
+                "json_sets": timed(lambda u: json_top(conn, categorias_de, u, args.limit), usuarios),
+            },
+        }
+        conn.close()
+
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark del top de contenido popular: contadores incrementales frente a
+agregar `interacciones` en cada consulta
+
+La referencia calcula la misma puntuación con decaimiento (peso por tipo y
+exp(-λ·edad)) con un GROUP BY sobre todas las interacciones. También mide
+el coste que añade el hook a la escritura de un lote.
+
+Uso:
+    python -m benchmarks.bench_popularity --interactions 500000
+"""
+import argparse
+import json
+import math
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from app.ingestion import InteractionBuffer
+from app.popularity import POPULAR, RATES, WEIGHTS, Popularity, timestamp
+from benchmarks.bench_geo import timed
+from benchmarks.synthetic import FECHA_BASE, Scale, generate
+
+
+def group_by_top(conn, limit):
+    ahora = conn.execute("SELECT MAX(fecha) FROM interacciones").fetchone()[0]
+    ahora = timestamp(ahora)
+    puntuacion = {}
+    for contenido_id, tipo, fecha in conn.execute("SELECT contenido_id, tipo, fecha FROM interacciones"):
+        edad = ahora - timestamp(fecha)
+        puntuacion[contenido_id] = puntuacion.get(contenido_id, 0.0) + WEIGHTS.get(tipo, 1.0) * math.exp(-RATES[POPULAR] * edad)
+    return sorted(puntuacion.items(), key=lambda par: -par[1])[:limit]
+
+
+def write_batches(db_path, batches, batch_size, on_flush):
+    buffer = InteractionBuffer(db_path, batch_size=batch_size, flush_interval=60, on_flush=on_flush).start()
+    t0 = time.perf_counter()
+    try:
+        for n in range(batches):
+            fecha = FECHA_BASE + timedelta(days=400, minutes=n)
+            buffer.submit(
+                {"usuario_id": 1, "contenido_id": str(1001 + (n * batch_size + i) % 500), "tipo": "view", "fecha": fecha}
+                for i in range(batch_size)
+            )
+            buffer.flush()
+    finally:
+        buffer.close()
+    return 1000 * (time.perf_counter() - t0) / batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--content", type=int, default=20_000)
+    parser.add_argument("--interactions", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "jaa.sqlite")
+        generate(db_path, Scale(users=1_000, content=args.content, interactions=args.interactions))
+        conn = sqlite3.connect(db_path)
+        pop = Popularity(db_path, refresh_interval=3600)
+        consultas = [()] * args.queries
+        resultado = {
+            "interacciones": args.interactions,
+            "top_k": {
+                "contadores": timed(lambda: pop.top(POPULAR, args.limit), consultas),
+                "group_by": timed(lambda: group_by_top(conn, args.limit), consultas[:3]),
+            },
+            "lote_ms": {
+                "sin_hook": write_batches(db_path, args.batches, args.batch_size, []),
+                "con_hook": write_batches(db_path, args.batches, args.batch_size, [pop.on_flush]),
+            },
+        }
+        conn.close()
+
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark de la caché de recuperación de `chatbot.sql_query`
+
+Compara la consulta sin caché con aciertos de caché (que solo leen la
+versión del catálogo) y mide cuánta memoria ocupan las entradas.
+
+Uso:
+    python -m benchmarks.bench_retrieval_cache --content 20000 --queries 200
+"""
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from app import chatbot, retrieval_cache, snapshot
+from benchmarks.bench_geo import timed
+from benchmarks.synthetic import Scale, category_names, generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--content", type=int, default=20_000)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--per-query", type=int, default=2, help="Categorías por consulta")
+    parser.add_argument("--cache-mb", type=float, default=retrieval_cache.RETRIEVAL_CACHE_MB)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "jaa.sqlite")
+        generate(db_path, Scale(users=100, content=args.content, categories=args.categories, interactions=0))
+        chatbot.DB_PATH = db_path
+        snapshot.current = lambda: None
+
+        rng = random.Random(1)
+        nombres = category_names(args.categories)
+        consultas = [(rng.sample(nombres, args.per_query),) for _ in range(args.queries)]
+        conn = sqlite3.connect(db_path)
+        sin_cache = timed(lambda c: chatbot.consultar_contenido(conn, c, None, None, None), consultas)
+        conn.close()
+
+        cache = retrieval_cache.get_cache(db_path)
+        cache.max_bytes = int(args.cache_mb * 2**20)
+        # Primera vez de cada consulta: paga la consulta y guardar la entrada
+        fallos = timed(chatbot.sql_query, consultas)
+        aciertos = timed(chatbot.sql_query, consultas)
+        stats = cache.stats()
+
+    print(json.dumps({
+        "contenidos": args.content,
+        "sql_query": {"sin_cache": sin_cache, "fallo": fallos, "acierto": aciertos},
+        "cache": stats,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark del snapshot del catálogo frente a las consultas a SQLite
+
+Mide lo que cuesta a un worker tener el catálogo listo (abrir el snapshot
+frente a cargar las tablas desde SQLite) y la consulta de contenido por
+categorías que hace el chatbot.
+
+Uso:
+    python -m benchmarks.bench_snapshot --content 20000 --queries 200
+"""
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app.snapshot import CatalogSnapshot, build
+from benchmarks.bench_geo import timed
+from benchmarks.synthetic import Scale, category_names, generate
+
+CONTENIDO_POR_CATEGORIAS = """
+SELECT cf.titulo, cf.descripcion, cf.tipo, cf.modalidad, cf.nivel, cf.rating, cf.precio, cf.estado
+FROM contenido_formativo AS cf
+JOIN contenido_categorias AS cc ON cf.id = cc.contenido_id
+JOIN categorias AS c ON cc.categoria_id = c.id
+WHERE c.nombre IN ({placeholders})
+GROUP BY cf.id
+"""
+
+
+def sqlite_load(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("SELECT * FROM contenido_formativo").fetchall()
+    conn.execute("SELECT * FROM contenido_categorias").fetchall()
+    conn.close()
+
+
+def sqlite_query(db_path, nombres):
+    conn = sqlite3.connect(db_path)
+    conn.execute(CONTENIDO_POR_CATEGORIAS.format(placeholders=", ".join("?" for _ in nombres)), nombres).fetchall()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--content", type=int, default=20_000)
+    parser.add_argument("--categories", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    nombres = category_names(args.categories)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "jaa.sqlite")
+        snap_path = str(Path(tmp) / "catalogo.snap")
+        generate(db_path, Scale(users=10, content=args.content, categories=args.categories, interactions=0))
+        t0 = time.perf_counter()
+        build(db_path, snap_path)
+        build_s = time.perf_counter() - t0
+        snap = CatalogSnapshot(snap_path)
+
+        consultas = [rng.sample(nombres, rng.randint(1, 3)) for _ in range(args.queries)]
+        resultado = {
+            "contenidos": args.content,
+            "build_s": build_s,
+            "snapshot_bytes": Path(snap_path).stat().st_size,
+            "open": {
+                "snapshot_mmap": timed(CatalogSnapshot, [(snap_path,)] * 20),
+                "sqlite_load": timed(sqlite_load, [(db_path,)] * 5),
+            },
+            "contenido_por_categorias": {
+                "snapshot": timed(snap.contenido_por_categorias, [(c,) for c in consultas]),
+                "sqlite": timed(sqlite_query, [(db_path, c) for c in consultas]),
+            },
+        }
+
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Coste por llamada del tracing en el camino de la petición
+
+Mide una función trivial decorada como `chatbot.ask` (span de la función
+más span del LLM) sin tracing, con el tracer desactivado y con distintas
+tasas de muestreo exportando a memoria, y la compara con
+`langsmith.traceable` sin trazas activas.
+
+Uso:
+    python -m benchmarks.bench_tracing --calls 20000
+"""
+import argparse
+import json
+import os
+import time
+
+from app import tracing
+from app.tracing import BatchExporter, InMemorySink, Tracer
+
+
+def ask(prompt, question):
+    with tracing.span("chat.completions", run_type="llm", messages=[prompt, question]) as span:
+        span.set_outputs(content=question)
+    return question
+
+
+def plain(prompt, question):
+    return question
+
+
+def per_call_us(fn, calls: int) -> float:
+    for _ in range(min(calls, 1000)):
+        fn("prompt", "pregunta")
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn("prompt", "pregunta")
+    return 1e6 * (time.perf_counter() - t0) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    resultado = {"sin_tracing": per_call_us(plain, args.calls)}
+    traced = tracing.traceable(ask)
+
+    tracing.set_tracer(Tracer(None))
+    resultado["desactivado"] = per_call_us(traced, args.calls)
+
+    for tasa in (0.0, 0.01, 0.1, 1.0):
+        exporter = BatchExporter(InMemorySink(), max_queue=args.calls * 2).start()
+        tracing.set_tracer(Tracer(exporter, sample_rate=tasa))
+        resultado[f"muestreo_{tasa:g}"] = per_call_us(traced, args.calls)
+        exporter.close(timeout=30)
+        resultado[f"muestreo_{tasa:g}_descartados"] = exporter.dropped
+
+    os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+    try:
+        from langsmith import traceable
+
+        resultado["langsmith_traceable_sin_trazas"] = per_call_us(traceable(plain), args.calls)
+    except ImportError:
+        pass
+
+    print(json.dumps({"calls": args.calls, "us_por_llamada": resultado}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Benchmark end-to-end de la API
+
+Genera una `jaa.sqlite` sintética, levanta stubs locales de TGI y Whisper,
+arranca la aplicación con uvicorn y mide throughput y latencias
+(p50/p95/p99) de cada endpoint bajo carga concurrente. El informe se
+escribe en JSON para poder comparar commits.
+
+Uso:
+    python -m benchmarks.e2e --output report.json
+    python -m benchmarks.e2e --output nuevo.json --baseline report.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from benchmarks.stubs import LLMStub, WhisperStub
+from benchmarks.synthetic import Scale, category_names, generate
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PREGUNTAS = [
+    "Quins cursos d'informàtica hi ha?",
+    "Busco un taller de cuina presencial",
+    "Vull millorar el meu anglès",
+    "Hi ha activitats d'esport a prop?",
+    "Formació per emprendre un negoci",
+]
+
+SCENARIOS = ["cb_query", "cb_audio_query", "recommendations", "api_recommendations"]
+
+
+def percentile(valores: Sequence[float], p: float) -> float:
+    """
+    Percentil por rango más cercano (`p` entre 0 y 100)
+    """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+def summarize(latencias: List[float], codigos: Dict[int, int], duracion: float) -> Dict:
+    total = sum(codigos.values())
+    errores = sum(n for codigo, n in codigos.items() if codigo >= 400 or codigo == 0)
+    ms = [1000 * t for t in latencias]
+    return {
+        "requests": total,
+        "errors": errores,
+        "status_codes": {str(k): v for k, v in sorted(codigos.items())},
+        "throughput_rps": total / duracion if duracion else 0.0,
+        "latency_ms": {
+            "mean": sum(ms) / len(ms) if ms else 0.0,
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "max": max(ms) if ms else 0.0,
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_app(env: Dict[str, str], port: int, workers: int, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    proceso = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"La aplicación no arrancó, ver {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError(f"La aplicación no respondió a tiempo, ver {log_path}")
+
+
+def _request(scenario: str, i: int, users: int):
+    if scenario == "cb_query":
+        return "POST", "/cb/query", {"json": {"request": PREGUNTAS[i % len(PREGUNTAS)]}}
+    if scenario == "cb_audio_query":
+        return "POST", "/cb/audio-query", {"files": {"file": ("pregunta.wav", b"RIFF" + bytes(2048), "audio/wav")}}
+    if scenario == "recommendations":
+        return "GET", "/recommendations", {}
+    if scenario == "api_recommendations":
+        return "GET", f"/api/recommendations/{i % users + 1}", {}
+    raise ValueError(f"Escenario desconocido: {scenario}")
+
+
+async def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int, users: int, warmup: int) -> Dict:
+    latencias: List[float] = []
+    codigos: Dict[int, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        if scenario == "recommendations":
+            await client.post("/users/login", json={"email": "bench@example.com", "password": "x"})
+        for i in range(warmup):
+            metodo, ruta, kwargs = _request(scenario, i, users)
+            await client.request(metodo, ruta, **kwargs)
+
+        siguiente = iter(range(requests))
+
+        async def worker():
+            for i in siguiente:
+                metodo, ruta, kwargs = _request(scenario, i, users)
+                t0 = time.perf_counter()
+                try:
+                    codigo = (await client.request(metodo, ruta, **kwargs)).status_code
+                except httpx.HTTPError:
+                    codigo = 0
+                latencias.append(time.perf_counter() - t0)
+                codigos[codigo] = codigos.get(codigo, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duracion = time.perf_counter() - t0
+    return summarize(latencias, codigos, duracion)
+
+
+def compare(report: Dict, baseline: Dict) -> str:
+    lineas = [f"{'escenario':<22}{'métrica':<16}{'base':>12}{'actual':>12}{'cambio':>10}"]
+    for scenario, actual in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        metricas = [("throughput_rps", actual["throughput_rps"], base["throughput_rps"])]
+        metricas += [(f"{p}_ms", actual["latency_ms"][p], base["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        for nombre, valor, referencia in metricas:
+            cambio = (valor - referencia) / referencia * 100 if referencia else 0.0
+            lineas.append(f"{scenario:<22}{nombre:<16}{referencia:>12.2f}{valor:>12.2f}{cambio:>+9.1f}%")
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for campo, valor in asdict(Scale()).items():
+        parser.add_argument(f"--{campo.replace('_', '-')}", type=int, default=valor)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia de los stubs de LLM y Whisper")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--db", help="Reutilizar una jaa.sqlite ya generada")
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--baseline", help="Informe anterior con el que comparar")
+    args = parser.parse_args()
+
+    scale = Scale(**{campo: getattr(args, campo) for campo in asdict(Scale())})
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / "jaa.sqlite")
+        if not args.db:
+            t0 = time.perf_counter()
+            generate(db_path, scale)
+            print(f"Base de datos sintética generada en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+        respuesta_llm = ", ".join(category_names(scale.categories)[:2])
+        with LLMStub(respuesta_llm, args.latency_ms, args.jitter_ms, seed=scale.seed) as llm, \
+                WhisperStub(PREGUNTAS[0], args.latency_ms, args.jitter_ms, seed=scale.seed) as whisper:
+            port = _free_port()
+            env = {
+                "JAA_DB_PATH": db_path,
+                "HF_TOKEN": "stub",
+                "BASE_URL": llm.url,
+                "WHISPER_API_URL": whisper.url,
+                "LANGCHAIN_TRACING_V2": "false",
+                # Todas las peticiones salen de la misma IP
+                "LLM_CLIENT_RATE": "0",
+            }
+            app = start_app(env, port, args.workers, Path(tmp) / "uvicorn.log")
+            try:
+                resultados = {}
+                for scenario in args.scenarios:
+                    resultados[scenario] = asyncio.run(run_scenario(
+                        f"http://127.0.0.1:{port}", scenario, args.requests,
+                        args.concurrency, scale.users, args.warmup,
+                    ))
+                    print(f"{scenario}: {json.dumps(resultados[scenario]['latency_ms'])}", file=sys.stderr)
+            finally:
+                app.terminate()
+                app.wait(timeout=30)
+            llamadas = {"llm": llm.requests, "whisper": whisper.requests}
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "scale": asdict(scale),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "workers": args.workers,
+        },
+        "upstream_calls": llamadas,
+        "scenarios": resultados,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Informe escrito en {args.output}", file=sys.stderr)
+    if args.baseline:
+        print(compare(report, json.loads(Path(args.baseline).read_text())))
+
+
+if __name__ == "__main__":
+    main()
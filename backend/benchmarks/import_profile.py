@@ -0,0 +1,117 @@
+"""
+Perfil del tiempo de importación de la aplicación
+
+Importa el módulo en un proceso nuevo con `python -X importtime` y lista
+los módulos que más tardan, tanto en tiempo propio como acumulado. Sirve
+para ver qué alarga el arranque en frío de los contenedores.
+
+Uso:
+    python -m benchmarks.import_profile [--module app.main] [--top 25]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Variables que no deberían hacer falta para importar la aplicación
+LLM_ENV = ("HF_TOKEN", "BASE_URL", "WHISPER_API_URL")
+
+_MEDIR = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+importlib.import_module(sys.argv[1])
+segundos = time.perf_counter() - t0
+print(json.dumps({{"seconds": segundos, "loaded": [m for m in {watch!r} if m in sys.modules]}}))
+"""
+
+
+def _env(extra: Optional[Dict[str, str]]) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in LLM_ENV}
+    env.update(extra or {})
+    return env
+
+
+def import_time(
+    module: str = "app.main",
+    watch: Sequence[str] = (),
+    env: Optional[Dict[str, str]] = None,
+) -> Dict:
+    """
+    Mide cuánto tarda en importarse `module` en un intérprete nuevo
+
+    Args:
+        module: Módulo a importar
+        watch: Módulos de los que se quiere saber si quedaron cargados
+        env: Variables de entorno adicionales
+
+    Returns:
+        Dict: {"seconds": float, "loaded": [módulos de `watch` cargados]}
+    """
+    salida = subprocess.run(
+        [sys.executable, "-c", _MEDIR.format(watch=tuple(watch)), module],
+        cwd=BACKEND_DIR,
+        env=_env(env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def parse_importtime(texto: str) -> List[Dict]:
+    """
+    Convierte la salida de `-X importtime` en filas {module, self_us, cumulative_us, depth}
+    """
+    filas = []
+    for linea in texto.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|", 2)
+        filas.append({
+            "module": nombre.strip(),
+            "self_us": int(propio),
+            "cumulative_us": int(acumulado),
+            "depth": (len(nombre) - len(nombre.lstrip())) // 2,
+        })
+    return filas
+
+
+def profile(module: str = "app.main", env: Optional[Dict[str, str]] = None) -> List[Dict]:
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=_env(env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(salida.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", action="store_true", help="Escribir todas las filas en JSON")
+    args = parser.parse_args()
+
+    filas = profile(args.module)
+    if args.json:
+        print(json.dumps(filas, indent=2))
+        return
+    total = next((f["cumulative_us"] for f in reversed(filas) if f["module"] == args.module), 0)
+    print(f"{args.module}: {total / 1000:.1f} ms\n")
+    for clave, titulo in (("cumulative_us", "acumulado"), ("self_us", "propio")):
+        print(f"{'módulo':<48}{titulo + ' (ms)':>16}")
+        for fila in sorted(filas, key=lambda f: f[clave], reverse=True)[:args.top]:
+            print(f"{fila['module']:<48}{fila[clave] / 1000:>16.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
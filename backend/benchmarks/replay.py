@@ -0,0 +1,422 @@
+"""
+Evaluación offline del recomendador reproduciendo `interacciones`
+
+Las interacciones se vuelven a escribir en orden de fecha, por lotes, en
+una copia de la base de datos que empieza sin ninguna (catálogo y perfiles
+intactos), a través del mismo `InteractionBuffer` que usa la API, así que
+los contadores de popularidad solo ven el pasado. Antes de escribir cada
+lote se piden las top-k recomendaciones de los usuarios de sus
+interacciones evaluadas y se comparan con los contenidos con los que
+interactúa cada uno desde ese momento hasta `horizon_days` después:
+precision@k, recall@k y NDCG@k, con la latencia y la memoria de cada
+llamada.
+
+Las escrituras (y la actualización de la popularidad) se hacen una sola
+vez, en el proceso principal, que lee las interacciones de origen lote a
+lote. Los usuarios se reparten en shards (`usuario_id % shards`) y los
+shards entre procesos, que consultan la misma copia: en cada lote el
+principal les pasa los usuarios a evaluar, espera a que acaben y solo
+entonces escribe el lote, así que el resultado no depende del número de
+procesos. Cada proceso carga solo el contenido y la fecha de las
+interacciones de sus usuarios, para calcular su futuro.
+
+Uso:
+    python -m benchmarks.replay --db db/jaa.sqlite --k 10 --workers 4
+    python -m benchmarks.replay --interactions 20000 --output replay.json
+"""
+import argparse
+import bisect
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from multiprocessing import Pipe, Process
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app import popularity
+from app.ingestion import InteractionBuffer
+from app.popularity import timestamp
+from app.recommender import ContentRecommender
+from benchmarks.e2e import git_commit, percentile
+from benchmarks.synthetic import Scale, generate
+from db.migrations import migrate
+
+DAY = 86400.0
+
+
+@dataclass
+class ReplayConfig:
+    # Se miden las k primeras; el recomendador devuelve RECOMMENDATION_LIMIT
+    k: int = 10
+    horizon_days: float = 7.0
+    # Interacciones que se escriben juntas (y ven el mismo estado)
+    batch_size: int = 200
+    # Se evalúa una de cada `every` interacciones de cada usuario
+    every: int = 1
+    # Una de cada `memory_every` llamadas se repite con tracemalloc
+    memory_every: int = 20
+    shards: int = 1
+
+
+def precision_at_k(recomendados: Sequence[str], relevantes: Set[str], k: int) -> float:
+    return sum(1 for r in recomendados[:k] if r in relevantes) / k
+
+
+def recall_at_k(recomendados: Sequence[str], relevantes: Set[str], k: int) -> float:
+    if not relevantes:
+        return 0.0
+    return sum(1 for r in recomendados[:k] if r in relevantes) / len(relevantes)
+
+
+def ndcg_at_k(recomendados: Sequence[str], relevantes: Set[str], k: int) -> float:
+    """
+    NDCG con relevancia binaria
+    """
+    dcg = sum(1 / math.log2(i + 2) for i, r in enumerate(recomendados[:k]) if r in relevantes)
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevantes), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+COLUMNAS = ("usuario_id", "contenido_id", "tipo", "tiempo_consumido", "progreso", "valoracion", "fecha")
+
+
+def stream_interactions(db_path: str, size: int) -> Iterator[List[Dict]]:
+    """
+    Interacciones de `db_path` en orden de fecha, en lotes de `size`
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(
+            f"""
+            SELECT {", ".join(COLUMNAS)}
+            FROM interacciones WHERE fecha IS NOT NULL
+            ORDER BY fecha, id
+            """
+        )
+        while True:
+            filas = cursor.fetchmany(size)
+            if not filas:
+                return
+            yield [dict(zip(COLUMNAS, fila)) for fila in filas]
+    finally:
+        conn.close()
+
+
+def load_shards(db_path: str, shards: Sequence[int], total: int) -> Dict[int, Tuple[List[str], List[float]]]:
+    """
+    Contenidos y fechas (epoch) de las interacciones de cada usuario de
+    `shards`, en el mismo orden que `stream_interactions`
+    """
+    por_usuario: Dict[int, Tuple[List[str], List[float]]] = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        for usuario_id, contenido_id, fecha in conn.execute(
+            f"""
+            SELECT usuario_id, contenido_id, fecha
+            FROM interacciones WHERE fecha IS NOT NULL AND usuario_id % ? IN ({", ".join("?" * len(shards))})
+            ORDER BY fecha, id
+            """,
+            (total, *shards),
+        ):
+            contenidos, tiempos = por_usuario.setdefault(usuario_id, ([], []))
+            contenidos.append(contenido_id)
+            tiempos.append(timestamp(fecha))
+    finally:
+        conn.close()
+    return por_usuario
+
+
+def prepare(db_path: str, destino: str) -> None:
+    """
+    Copia de `db_path` sin interacciones ni contadores derivados de ellas
+    """
+    origen = sqlite3.connect(db_path)
+    copia = sqlite3.connect(destino)
+    try:
+        origen.backup(copia)
+    finally:
+        origen.close()
+    try:
+        migrate(copia)
+        primera = copia.execute("SELECT MIN(fecha) FROM interacciones").fetchone()[0]
+        copia.execute("DELETE FROM interacciones")
+        # Contadores vacíos referidos a la primera interacción: el buffer los actualiza desde ahí
+        popularity.rebuild(copia, landmark=timestamp(primera) if primera else None)
+        copia.commit()
+    finally:
+        copia.close()
+
+
+def future_items(contenidos: List[str], tiempos: List[float], i: int, horizonte: float) -> Set[str]:
+    """
+    Contenidos del usuario desde su evento `i` hasta `horizonte` segundos después
+    """
+    fin = bisect.bisect_right(tiempos, tiempos[i] + horizonte)
+    return set(contenidos[i:fin])
+
+
+class ShardEvaluator:
+    """
+    Evalúa el recomendador para los usuarios de `shards` sobre la copia
+    `db_path`, que escribe otro (ver `replay`)
+    """
+
+    def __init__(self, source_path: str, db_path: str, shards: Sequence[int], config: ReplayConfig):
+        logging.getLogger("app").setLevel(logging.WARNING)
+        self.db_path = db_path
+        self.shards = list(shards)
+        self.config = config
+        self.recommender = ContentRecommender(db_path=db_path)
+        self.por_usuario = load_shards(source_path, self.shards, config.shards)
+        self.posicion = {u: 0 for u in self.por_usuario}
+
+        self.sumas = {"precision": 0.0, "recall": 0.0, "ndcg": 0.0}
+        self.latencias: List[float] = []
+        self.memoria: List[int] = []
+        self.vacias = 0
+
+    def submit(self, usuarios: Sequence[int]) -> None:
+        """
+        Evalúa la siguiente interacción de cada usuario de `usuarios`
+        (un usuario aparece una vez por interacción suya en el lote)
+        """
+        # El top-k de popularidad de este proceso no ve las escrituras del principal
+        popularity.invalidate(self.db_path)
+        horizonte = self.config.horizon_days * DAY
+        for u in usuarios:
+            i = self.posicion[u]
+            self.posicion[u] += 1
+            if i % self.config.every:
+                continue
+            relevantes = future_items(*self.por_usuario[u], i, horizonte)
+
+            t0 = time.perf_counter()
+            recomendaciones = self.recommender.generate(u)
+            self.latencias.append(time.perf_counter() - t0)
+            if (len(self.latencias) - 1) % self.config.memory_every == 0:
+                tracemalloc.start()
+                self.recommender.generate(u)
+                self.memoria.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            # generate devuelve {"error": ...} si falla
+            ids = [r["id"] for r in recomendaciones] if isinstance(recomendaciones, list) else []
+            self.vacias += not ids
+            self.sumas["precision"] += precision_at_k(ids, relevantes, self.config.k)
+            self.sumas["recall"] += recall_at_k(ids, relevantes, self.config.k)
+            self.sumas["ndcg"] += ndcg_at_k(ids, relevantes, self.config.k)
+
+    def wait(self) -> None:
+        pass
+
+    def result(self) -> Dict:
+        """
+        Returns:
+            Dict: Sumas de las métricas y latencias/memoria de cada llamada
+        """
+        return {
+            "shards": self.shards,
+            "points": len(self.latencias),
+            "empty": self.vacias,
+            "sums": self.sumas,
+            "latencies": self.latencias,
+            "memory": self.memoria,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+    def close(self) -> None:
+        pass
+
+
+def _serve(conexion, source_path: str, db_path: str, shards: Sequence[int], config: ReplayConfig) -> None:
+    try:
+        evaluador = ShardEvaluator(source_path, db_path, shards, config)
+        while (usuarios := conexion.recv()) is not None:
+            evaluador.submit(usuarios)
+            conexion.send(None)
+        conexion.send(evaluador.result())
+    except Exception as e:
+        conexion.send(e)
+    finally:
+        conexion.close()
+
+
+class RemoteEvaluator:
+    """
+    `ShardEvaluator` en otro proceso; `submit` no espera a que acabe
+    """
+
+    def __init__(self, source_path: str, db_path: str, shards: Sequence[int], config: ReplayConfig):
+        self._conexion, remota = Pipe()
+        self._proceso = Process(target=_serve, args=(remota, source_path, db_path, shards, config), daemon=True)
+        self._proceso.start()
+        remota.close()
+
+    def _recv(self):
+        respuesta = self._conexion.recv()
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    def submit(self, usuarios: Sequence[int]) -> None:
+        self._conexion.send(list(usuarios))
+
+    def wait(self) -> None:
+        self._recv()
+
+    def result(self) -> Dict:
+        self._conexion.send(None)
+        return self._recv()
+
+    def close(self) -> None:
+        self._conexion.close()
+        self._proceso.join(timeout=5)
+        if self._proceso.is_alive():
+            self._proceso.terminate()
+
+
+def replay(source_path: str, db_path: str, config: ReplayConfig, evaluadores: Sequence) -> List[Dict]:
+    """
+    Escribe las interacciones de `source_path` en `db_path` lote a lote y,
+    antes de cada lote, hace que cada evaluador evalúe sus usuarios; los
+    shards se reparten entre los evaluadores por `shard % len(evaluadores)`
+    """
+    buffer = InteractionBuffer(
+        db_path, batch_size=config.batch_size, flush_interval=3600,
+        on_flush=[popularity.get_popularity(db_path).on_flush],
+    ).start()
+    try:
+        for lote in stream_interactions(source_path, config.batch_size):
+            por_evaluador: List[List[int]] = [[] for _ in evaluadores]
+            for e in lote:
+                shard = e["usuario_id"] % config.shards
+                por_evaluador[shard % len(evaluadores)].append(e["usuario_id"])
+            activos = []
+            for evaluador, usuarios in zip(evaluadores, por_evaluador):
+                if usuarios:
+                    evaluador.submit(usuarios)
+                    activos.append(evaluador)
+            for evaluador in activos:
+                evaluador.wait()
+            buffer.submit(lote)
+            buffer.flush()
+    finally:
+        buffer.close()
+    return [evaluador.result() for evaluador in evaluadores]
+
+
+def merge(parciales: List[Dict], config: ReplayConfig) -> Dict:
+    puntos = sum(p["points"] for p in parciales)
+    ms = [1000 * t for p in parciales for t in p["latencies"]]
+    kb = [b / 1024 for p in parciales for b in p["memory"]]
+    metricas = {
+        f"{nombre}@{config.k}": (sum(p["sums"][nombre] for p in parciales) / puntos if puntos else 0.0)
+        for nombre in ("precision", "recall", "ndcg")
+    }
+    return {
+        "points": puntos,
+        "empty_recommendations": sum(p["empty"] for p in parciales),
+        "metrics": metricas,
+        "latency_ms": {
+            "mean": sum(ms) / len(ms) if ms else 0.0,
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "max": max(ms) if ms else 0.0,
+        },
+        "peak_alloc_kb": {
+            "samples": len(kb),
+            "p50": percentile(kb, 50),
+            "p95": percentile(kb, 95),
+            "max": max(kb) if kb else 0.0,
+        },
+        "max_rss_kb_per_worker": max((p["max_rss_kb"] for p in parciales), default=0),
+    }
+
+
+def run(db_path: str, config: ReplayConfig, workers: int = 1, workdir: Optional[str] = None) -> Dict:
+    """
+    Evalúa el recomendador sobre `db_path` en `config.shards` shards
+    repartidos entre `workers` procesos
+    """
+    workers = max(1, min(workers, config.shards))
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        copia = str(Path(tmp) / "replay.sqlite")
+        prepare(db_path, copia)
+        tipo = ShardEvaluator if workers == 1 else RemoteEvaluator
+        evaluadores = []
+        try:
+            for w in range(workers):
+                evaluadores.append(tipo(db_path, copia, range(w, config.shards, workers), config))
+            parciales = replay(db_path, copia, config, evaluadores)
+        finally:
+            for evaluador in evaluadores:
+                evaluador.close()
+    return merge(parciales, config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="jaa.sqlite a evaluar (por defecto se genera una sintética)")
+    for campo, valor in asdict(Scale()).items():
+        parser.add_argument(f"--{campo.replace('_', '-')}", type=int, default=valor)
+    for campo, valor in asdict(ReplayConfig()).items():
+        if campo != "shards":
+            parser.add_argument(f"--{campo.replace('_', '-')}", type=type(valor), default=valor)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Procesos que reparten las consultas; las escrituras se hacen una vez",
+    )
+    parser.add_argument("--shards", type=int, help="Por defecto, uno por worker")
+    parser.add_argument("--output", help="Escribir el informe JSON en este fichero")
+    args = parser.parse_args()
+
+    config = ReplayConfig(**{
+        campo: getattr(args, campo) for campo in asdict(ReplayConfig()) if campo != "shards"
+    }, shards=args.shards or args.workers)
+    scale = Scale(**{campo: getattr(args, campo) for campo in asdict(Scale())})
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = str(Path(tmp) / "jaa.sqlite")
+            generate(db_path, scale)
+        t0 = time.perf_counter()
+        resultado = run(db_path, config, args.workers)
+        duracion = time.perf_counter() - t0
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "db": args.db,
+            "scale": None if args.db else asdict(scale),
+            "replay": asdict(config),
+            "workers": args.workers,
+        },
+        "duration_s": duracion,
+        **resultado,
+    }
+    texto = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(texto)
+        print(f"Informe escrito en {args.output}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Servidores locales que imitan las APIs de TGI (OpenAI-compatible) y Whisper
+
+Responden siempre lo mismo tras una latencia configurable, para poder medir
+la aplicación sin depender de los endpoints reales.
+
+Uso:
+    python -m benchmarks.stubs --llm-port 8081 --whisper-port 8082 --latency-ms 200
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubServer:
+    """
+    Servidor HTTP en un hilo que responde `reply` tras `latency_ms` (+ jitter)
+
+    Con `error_rate` > 0 esa fracción de las peticiones responde 500, para
+    simular una réplica que falla.
+    """
+
+    kind = ""
+
+    def __init__(
+        self,
+        reply: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+        error_rate: float = 0.0,
+    ):
+        self.reply = reply
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"{self.kind}-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self) -> bool:
+        """
+        Espera la latencia configurada
+
+        Returns:
+            bool: Si la petición debe fallar
+        """
+        with self._lock:
+            self.requests += 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            falla = self.error_rate > 0 and self._rng.random() < self.error_rate
+        espera = max(self.latency_ms + jitter, 0.0) / 1000
+        if espera:
+            time.sleep(espera)
+        return falla
+
+    def body(self, path: str, payload: bytes) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if stub._delay():
+                    self.send_error(500)
+                    return
+                body = stub.body(self.path, payload)
+                if body is None:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class LLMStub(StubServer):
+    """Imita `POST /v1/chat/completions` de TGI"""
+
+    kind = "llm"
+
+    def body(self, path, payload):
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return None
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "tgi",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self.reply},
+            }],
+            "usage": {"prompt_tokens": len(payload) // 4, "completion_tokens": len(self.reply) // 4, "total_tokens": 0},
+        }
+
+
+class WhisperStub(StubServer):
+    """Imita el endpoint de inferencia de Whisper: devuelve `{"text": ...}`"""
+
+    kind = "whisper"
+
+    def body(self, path, payload):
+        return {"text": self.reply}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-port", type=int, default=8081)
+    parser.add_argument("--whisper-port", type=int, default=8082)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--llm-reply", default="Informàtica, Idiomes")
+    parser.add_argument("--transcription", default="Quins cursos d'informàtica hi ha?")
+    args = parser.parse_args()
+
+    llm = LLMStub(args.llm_reply, args.latency_ms, args.jitter_ms, port=args.llm_port).start()
+    whisper = WhisperStub(args.transcription, args.latency_ms, args.jitter_ms, port=args.whisper_port).start()
+    print(f"BASE_URL={llm.url}")
+    print(f"WHISPER_API_URL={whisper.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        llm.stop()
+        whisper.stop()
+
+
+if __name__ == "__main__":
+    main()
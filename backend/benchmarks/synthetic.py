@@ -0,0 +1,194 @@
+"""
+Generador determinista de una `jaa.sqlite` sintética
+
+Con la misma semilla y escala produce siempre los mismos datos, para que
+los benchmarks de distintos commits sean comparables.
+
+Uso:
+    python -m benchmarks.synthetic /tmp/jaa.sqlite --users 1000 --content 5000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from app import popularity
+from db.migrations import migrate
+
+AREAS = [
+    "Informàtica", "Idiomes", "Cultura", "Art", "Esports", "Salut", "Gastronomia",
+    "Empleabilitat", "Administració Pública", "Emprenedoria", "Música", "Medi Ambient",
+]
+TIPOS = ["curso", "taller", "master", "certificacion"]
+MODALIDADES = ["presencial", "online", "hibrido"]
+NIVELES = ["basico", "intermedio", "avanzado"]
+TIPOS_INTERACCION = ["view", "view", "view", "like", "save", "complete"]
+FECHA_BASE = datetime(2024, 1, 1)
+# created_at fijo: con el DEFAULT CURRENT_TIMESTAMP dos generaciones no coincidirían
+CREADO = FECHA_BASE.isoformat(sep=" ")
+
+
+@dataclass
+class Scale:
+    users: int = 1_000
+    content: int = 5_000
+    categories: int = 40
+    locations: int = 2_000
+    interactions: int = 50_000
+    categories_per_content: int = 3
+    seed: int = 42
+
+
+def category_names(n: int) -> List[str]:
+    return [AREAS[i] if i < len(AREAS) else f"Àrea {i + 1}" for i in range(n)]
+
+
+def _chunks(rows, size=10_000):
+    lote = []
+    for row in rows:
+        lote.append(row)
+        if len(lote) == size:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def generate(db_path: str, scale: Scale) -> None:
+    """
+    Crea (o recrea) `db_path` con el esquema migrado y datos sintéticos
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(scale.seed)
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    nombres = category_names(scale.categories)
+    conn.executemany(
+        "INSERT INTO categorias (id, nombre, tipo, activa, created_at) VALUES (?, ?, 'area', 1, ?)",
+        [(i + 1, nombre, CREADO) for i, nombre in enumerate(nombres)],
+    )
+    conn.executemany(
+        "INSERT INTO ubicaciones (id, distrito, latitud, longitud, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (i, f"Districte {i % 10 + 1}", rng.uniform(41.32, 41.47), rng.uniform(2.07, 2.23), CREADO)
+            for i in range(1, scale.locations + 1)
+        ],
+    )
+
+    def contenidos():
+        for i in range(1, scale.content + 1):
+            tipo = rng.choice(TIPOS)
+            modalidad = rng.choice(MODALIDADES)
+            nivel = rng.choice(NIVELES)
+            yield (
+                str(1000 + i),
+                f"{tipo.capitalize()} {modalidad} {i}",
+                f"Activitat formativa sintètica número {i} de nivell {nivel}.",
+                tipo,
+                modalidad,
+                nivel,
+                round(rng.uniform(2.5, 5.0), 1),
+                round(rng.uniform(0, 400), 2),
+                rng.choice(["activo"] * 8 + ["inactivo", "borrador"]),
+                rng.randint(1, scale.locations) if modalidad != "online" and scale.locations else None,
+                rng.randint(4, 120),
+                (FECHA_BASE - timedelta(days=rng.randint(0, 720))).isoformat(sep=" "),
+                CREADO,
+            )
+
+    for lote in _chunks(contenidos()):
+        conn.executemany(
+            """
+            INSERT INTO contenido_formativo (
+                id, titulo, descripcion, tipo, modalidad, nivel, rating, precio,
+                estado, ubicacion_id, duracion_horas, fecha_publicacion, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            lote,
+        )
+
+    def contenido_categorias():
+        k = min(scale.categories_per_content, scale.categories)
+        for i in range(1, scale.content + 1):
+            for categoria_id in rng.sample(range(1, scale.categories + 1), k):
+                yield (str(1000 + i), categoria_id)
+
+    for lote in _chunks(contenido_categorias()):
+        conn.executemany("INSERT INTO contenido_categorias VALUES (?, ?)", lote)
+
+    def usuarios():
+        for i in range(1, scale.users + 1):
+            yield (i, f"user{i}@example.com", f"Usuari {i}", "x", CREADO)
+
+    for lote in _chunks(usuarios()):
+        conn.executemany("INSERT INTO usuarios (id, email, nombre, password, created_at) VALUES (?, ?, ?, ?, ?)", lote)
+
+    def perfiles():
+        for i in range(1, scale.users + 1):
+            yield (
+                i,
+                i,
+                rng.choice(["estudiant", "professional", "aturat"]),
+                json.dumps(rng.sample(nombres, min(3, len(nombres))), ensure_ascii=False),
+                rng.choice(NIVELES),
+                json.dumps(rng.sample(nombres, min(2, len(nombres))), ensure_ascii=False),
+                CREADO,
+            )
+
+    for lote in _chunks(perfiles()):
+        conn.executemany(
+            """
+            INSERT INTO perfiles (id, usuario_id, tipo, areas_interes, nivel_formacion, objetivos, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            lote,
+        )
+
+    def interacciones():
+        # Popularidad sesgada (Zipf aproximado) para que haya contenido "popular"
+        pesos = [1.0 / (rank + 1) for rank in range(scale.content)]
+        contenido_ids = rng.choices(range(1, scale.content + 1), weights=pesos, k=scale.interactions)
+        for n, contenido in enumerate(contenido_ids):
+            yield (
+                rng.randint(1, scale.users),
+                str(1000 + contenido),
+                rng.choice(TIPOS_INTERACCION),
+                (FECHA_BASE + timedelta(seconds=n * 60)).isoformat(sep=" "),
+                CREADO,
+            )
+
+    for lote in _chunks(interacciones()):
+        conn.executemany(
+            "INSERT INTO interacciones (usuario_id, contenido_id, tipo, fecha, created_at) VALUES (?, ?, ?, ?, ?)",
+            lote,
+        )
+    # Las interacciones no pasan por el buffer de ingestión: los contadores se calculan aquí
+    popularity.rebuild(conn)
+
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("db_path")
+    for campo, valor in asdict(Scale()).items():
+        parser.add_argument(f"--{campo.replace('_', '-')}", type=int, default=valor)
+    args = vars(parser.parse_args())
+    db_path = args.pop("db_path")
+    scale = Scale(**args)
+    generate(db_path, scale)
+    print(json.dumps({"db_path": db_path, **asdict(scale)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Migraciones del esquema de `jaa.sqlite`
+
+Cada migración es una lista de sentencias SQL que se aplica dentro de una
+única transacción. La versión aplicada se guarda en `PRAGMA user_version`,
+así que ejecutar `migrate` varias veces es seguro.
+
+Uso:
+    python -m db.migrations [ruta/a/jaa.sqlite]
+"""
+import logging
+import sqlite3
+import sys
+from typing import List, Optional, Tuple
+
+from app import geo, interests, popularity, retrieval_cache, search
+from db.session import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Esquema de los modelos de `models/`. Se usa IF NOT EXISTS para poder
+# adoptar bases de datos creadas antes de tener migraciones.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY,
+        email VARCHAR NOT NULL UNIQUE,
+        nombre VARCHAR NOT NULL,
+        password VARCHAR NOT NULL,
+        fecha_registro DATETIME,
+        status VARCHAR DEFAULT 'activo',
+        preferencias JSON,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS perfiles (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL REFERENCES usuarios (id),
+        tipo VARCHAR NOT NULL,
+        areas_interes JSON,
+        nivel_formacion VARCHAR,
+        situacion_laboral VARCHAR,
+        objetivos JSON,
+        ultima_actualizacion DATETIME,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ubicaciones (
+        id INTEGER PRIMARY KEY,
+        direccion VARCHAR,
+        codigo_postal VARCHAR,
+        distrito VARCHAR,
+        barrio VARCHAR,
+        latitud REAL CHECK (latitud BETWEEN -90 AND 90),
+        longitud REAL CHECK (longitud BETWEEN -180 AND 180),
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categorias (
+        id INTEGER PRIMARY KEY,
+        nombre VARCHAR NOT NULL,
+        descripcion VARCHAR,
+        tipo VARCHAR NOT NULL CHECK (tipo IN ('area', 'nivel', 'modalidad')),
+        activa BOOLEAN NOT NULL DEFAULT 1,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS contenido_formativo (
+        id VARCHAR PRIMARY KEY,
+        titulo VARCHAR NOT NULL,
+        descripcion VARCHAR,
+        tipo VARCHAR NOT NULL CHECK (tipo IN ('curso', 'taller', 'master', 'certificacion')),
+        proveedor VARCHAR,
+        centro_nombre VARCHAR,
+        duracion_horas INTEGER,
+        modalidad VARCHAR CHECK (modalidad IN ('presencial', 'online', 'hibrido')),
+        nivel VARCHAR CHECK (nivel IN ('basico', 'intermedio', 'avanzado')),
+        rating REAL CHECK (rating BETWEEN 0 AND 5),
+        metadatos JSON,
+        ubicacion_id INTEGER REFERENCES ubicaciones (id),
+        fecha_publicacion DATETIME,
+        fecha_inicio DATETIME,
+        fecha_fin DATETIME,
+        plazas INTEGER CHECK (plazas >= 0),
+        precio REAL CHECK (precio >= 0),
+        url_mas_info VARCHAR,
+        destacado BOOLEAN NOT NULL DEFAULT 0,
+        estado VARCHAR NOT NULL DEFAULT 'activo' CHECK (estado IN ('activo', 'inactivo', 'borrador')),
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS contenido_categorias (
+        contenido_id VARCHAR NOT NULL REFERENCES contenido_formativo (id),
+        categoria_id INTEGER NOT NULL REFERENCES categorias (id),
+        PRIMARY KEY (contenido_id, categoria_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS listas (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL REFERENCES usuarios (id),
+        nombre VARCHAR NOT NULL,
+        descripcion VARCHAR,
+        publica BOOLEAN NOT NULL DEFAULT 0,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS items_lista (
+        id INTEGER PRIMARY KEY,
+        lista_id INTEGER NOT NULL REFERENCES listas (id),
+        contenido_id VARCHAR NOT NULL REFERENCES contenido_formativo (id),
+        orden INTEGER,
+        fecha_agregado DATETIME,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS interacciones (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL REFERENCES usuarios (id),
+        contenido_id VARCHAR NOT NULL REFERENCES contenido_formativo (id),
+        tipo VARCHAR NOT NULL CHECK (tipo IN ('view', 'like', 'complete', 'save')),
+        tiempo_consumido REAL CHECK (tiempo_consumido >= 0),
+        progreso REAL CHECK (progreso BETWEEN 0 AND 100),
+        valoracion INTEGER CHECK (valoracion BETWEEN 1 AND 5),
+        fecha DATETIME NOT NULL,
+        metadatos JSON,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME
+    )
+    """,
+]
+
+# Índices de las consultas calientes. Los de categorías y
+# contenido_categorias son cubrientes para que el JOIN de
+# `chatbot.sql_query` no tenga que leer las tablas base.
+HOT_PATH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_categorias_activa_nombre ON categorias (activa, nombre)",
+    "CREATE INDEX IF NOT EXISTS idx_categorias_nombre_id ON categorias (nombre, id)",
+    "CREATE INDEX IF NOT EXISTS idx_contenido_categorias_categoria ON contenido_categorias (categoria_id, contenido_id)",
+    "CREATE INDEX IF NOT EXISTS idx_contenido_formativo_ubicacion ON contenido_formativo (ubicacion_id)",
+    "CREATE INDEX IF NOT EXISTS idx_interacciones_usuario_fecha ON interacciones (usuario_id, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_interacciones_contenido_fecha ON interacciones (contenido_id, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_items_lista_lista_orden ON items_lista (lista_id, orden)",
+    "CREATE INDEX IF NOT EXISTS idx_listas_usuario ON listas (usuario_id)",
+    "CREATE INDEX IF NOT EXISTS idx_perfiles_usuario ON perfiles (usuario_id)",
+]
+
+# Filtros del catálogo paginado por cursor: (filtro, id) permite resolver
+# `filtro = ? AND id > ? ORDER BY id` sin ordenar ni recorrer la tabla.
+CATALOGUE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_contenido_formativo_tipo_id ON contenido_formativo (tipo, id)",
+    "CREATE INDEX IF NOT EXISTS idx_contenido_formativo_modalidad_id ON contenido_formativo (modalidad, id)",
+    "CREATE INDEX IF NOT EXISTS idx_contenido_formativo_nivel_id ON contenido_formativo (nivel, id)",
+    "CREATE INDEX IF NOT EXISTS idx_contenido_formativo_estado_id ON contenido_formativo (estado, id)",
+]
+
+# Un contenido aparece una sola vez en cada lista; antes de crear el índice
+# se quitan los repetidos, dejando el primero que se añadió
+LIST_ITEMS_UNIQUE = [
+    """
+    DELETE FROM items_lista
+    WHERE id NOT IN (SELECT MIN(id) FROM items_lista GROUP BY lista_id, contenido_id)
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_items_lista_lista_contenido ON items_lista (lista_id, contenido_id)",
+]
+
+# (versión, nombre, sentencias)
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "esquema_inicial", SCHEMA),
+    (2, "indices_consultas_calientes", HOT_PATH_INDEXES),
+    (3, "indice_espacial_ubicaciones", geo.RTREE_DDL + [geo.RTREE_BACKFILL]),
+    (4, "indices_catalogo", CATALOGUE_INDEXES),
+    (5, "busqueda_texto_contenido", search.FTS_V1_DDL + [search.FTS_V1_BACKFILL]),
+    (6, "intereses_perfil", interests.INTERESTS_DDL + interests.INTERESTS_BACKFILL),
+    # Los contadores se rellenan en Python (`popularity.rebuild`) con la primera escritura
+    (7, "popularidad_contenido", popularity.POPULARITY_DDL),
+    (8, "version_catalogo", retrieval_cache.CATALOG_VERSION_DDL),
+    # El índice de la 5 iba por el rowid implícito, que VACUUM puede renumerar
+    (9, "busqueda_texto_por_id", search.FTS_DDL + search.FTS_BACKFILL),
+    (10, "items_lista_unicos", LIST_ITEMS_UNIQUE),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    """
+    Aplica las migraciones pendientes hasta `target` (por defecto, todas)
+
+    Args:
+        conn: Conexión SQLite
+        target: Versión final deseada
+
+    Returns:
+        int: Versión del esquema tras migrar
+    """
+    target = MIGRATIONS[-1][0] if target is None else target
+    if conn.in_transaction:
+        conn.commit()
+    for version, nombre, sentencias in MIGRATIONS:
+        if version > target:
+            break
+        # BEGIN IMMEDIATE toma el lock de escritura antes de leer la versión,
+        # así dos workers arrancando a la vez no aplican la misma migración.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.execute("COMMIT")
+                continue
+            for sentencia in sentencias:
+                conn.execute(sentencia)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("COMMIT")
+            logger.info(f"Migración {version} ({nombre}) aplicada")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error aplicando la migración {version} ({nombre})")
+            raise
+    return current_version(conn)
+
+
+def migrate_path(db_path: str = DB_PATH, target: Optional[int] = None) -> int:
+    """
+    Igual que `migrate`, abriendo y cerrando la conexión a `db_path`
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        return migrate(conn, target)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    version = migrate_path(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    print(f"Esquema en la versión {version}")
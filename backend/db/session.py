@@ -5,6 +5,7 @@ from contextlib import contextmanager
 import logging
 from typing import Generator
 import os
+import sqlite3
 from pathlib import Path
 
 # Configurar logging
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 
 # Obtener la ruta absoluta al directorio de la base de datos
 DB_DIR = Path(__file__).parent.parent
-DB_PATH = os.path.join(DB_DIR, "db", "jaa.sqlite")
+DB_PATH = os.getenv("JAA_DB_PATH", os.path.join(DB_DIR, "db", "jaa.sqlite"))
 
 # Crear URL de la base de datos asegurando que la ruta es absoluta
 DATABASE_URL = f"sqlite:///{DB_PATH}"
@@ -72,4 +73,19 @@ def get_db() -> Generator[Session, None, None]:
         Session: Sesión de SQLAlchemy configurada
     """
     with get_db_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def get_sqlite() -> Generator[sqlite3.Connection, None, None]:
+    """
+    Conexión sqlite3 por petición para consultas SQL directas
+
+    Yields:
+        sqlite3.Connection: Conexión con `row_factory = sqlite3.Row`
+    """
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -1,30 +1,33 @@
-from typing import Optional, Dict, List
-from pydantic import Field, HttpUrl
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Float, Boolean, DateTime, JSON, ForeignKey
 from .base import TimestampedModel
 from datetime import datetime
+from typing import Optional
 
 class ContenidoFormativo(TimestampedModel):
-    """
-    Modelo de datos para la tabla contenido_formativo
-    """
-    id: str
-    titulo: str  # Título real de la actividad formativa
-    descripcion: Optional[str] = None
-    tipo: str = Field(..., pattern="^(curso|taller|master|certificacion)$")
-    proveedor: Optional[str] = None
-    centro_nombre: Optional[str] = None  # Nombre del centro que lo imparte
-    duracion_horas: Optional[int] = None
-    modalidad: str = Field(None, pattern="^(presencial|online|hibrido)$")
-    nivel: str = Field(None, pattern="^(basico|intermedio|avanzado)$")
-    rating: Optional[float] = Field(None, ge=0, le=5)
-    metadatos: Optional[Dict] = None
-    ubicacion_id: Optional[int] = None
-    categorias: List[str] = Field(default_factory=list)
-    fecha_publicacion: Optional[datetime] = None
-    fecha_inicio: Optional[datetime] = None
-    fecha_fin: Optional[datetime] = None
-    plazas: Optional[int] = Field(None, ge=0)
-    precio: Optional[float] = Field(None, ge=0)
-    url_mas_info: Optional[HttpUrl] = None
-    destacado: bool = False
-    estado: str = Field("activo", pattern="^(activo|inactivo|borrador)$")
\ No newline at end of file
+    """Modelo de datos para la tabla contenido_formativo"""
+    __tablename__ = 'contenido_formativo'
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    titulo: Mapped[str] = mapped_column(String, nullable=False)  # Título real de la actividad formativa
+    descripcion: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    tipo: Mapped[str] = mapped_column(String, nullable=False)  # curso, taller, master, certificacion
+    proveedor: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    centro_nombre: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Nombre del centro que lo imparte
+    duracion_horas: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    modalidad: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # presencial, online, hibrido
+    nivel: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # basico, intermedio, avanzado
+    rating: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    metadatos: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    ubicacion_id: Mapped[Optional[int]] = mapped_column(ForeignKey("ubicaciones.id"), nullable=True)
+    fecha_publicacion: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    fecha_inicio: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    fecha_fin: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    plazas: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    precio: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    url_mas_info: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    destacado: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    estado: Mapped[str] = mapped_column(String, default='activo', nullable=False)  # activo, inactivo, borrador
+
+    def __repr__(self):
+        return f"<ContenidoFormativo(id={self.id}, titulo='{self.titulo}')>"
@@ -1,14 +1,25 @@
-from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index
 from .base import TimestampedModel
 from datetime import datetime
-from pydantic import Field
+from typing import Optional
 
 class ItemLista(TimestampedModel):
-    """
-    Modelo de datos para la tabla items_lista
-    """
-    id: Optional[int] = None
-    lista_id: int
-    contenido_id: str
-    orden: Optional[int] = None
-    fecha_agregado: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    """Modelo de datos para la tabla items_lista"""
+    __tablename__ = 'items_lista'
+    __table_args__ = (
+        Index("idx_items_lista_lista_contenido", "lista_id", "contenido_id", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    lista_id: Mapped[int] = mapped_column(ForeignKey("listas.id"), nullable=False)
+    contenido_id: Mapped[str] = mapped_column(ForeignKey("contenido_formativo.id"), nullable=False)
+    orden: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    fecha_agregado: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    lista = relationship("Lista", back_populates="items")
+    # Sin carga implícita: quien necesite el contenido lo pide con joinedload
+    contenido = relationship("ContenidoFormativo", lazy="raise")
+
+    def __repr__(self):
+        return f"<ItemLista(lista_id={self.lista_id}, contenido_id='{self.contenido_id}', orden={self.orden})>"
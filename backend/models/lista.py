@@ -14,6 +14,16 @@ class Lista(TimestampedModel):
 
     # Relación con Usuario usando string
     usuario = relationship("Usuario", back_populates="listas")
+    # Sin carga implícita, para que acceder a los items de varias listas no
+    # lance una consulta por lista: se piden con selectinload
+    items = relationship(
+        "ItemLista",
+        back_populates="lista",
+        order_by="ItemLista.orden",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
 
     def __repr__(self):
         return f"<Lista(id={self.id}, nombre='{self.nombre}')>"
\ No newline at end of file
@@ -18,7 +18,9 @@ class Usuario(TimestampedModel):
 
     # Relaciones usando strings para evitar referencias circulares
     perfil = relationship("Perfil", back_populates="usuario", uselist=False)
-    listas = relationship("Lista", back_populates="usuario", lazy="dynamic")
+    # "dynamic" lanzaba una consulta en cada acceso; las listas con sus
+    # items se cargan con selectinload desde api/endpoints/listas.py
+    listas = relationship("Lista", back_populates="usuario", order_by="Lista.id", lazy="raise")
 
     def __repr__(self):
         return f"<Usuario(id={self.id}, email='{self.email}')>"
\ No newline at end of file
@@ -0,0 +1,273 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.admission import AdmissionController, Overloaded, RateLimited, TokenBucket
+
+
+def controller(**kwargs):
+    opciones = {"max_concurrency": 2, "max_queue": 4, "client_rate": 0, "initial_service_time": 0.05}
+    opciones.update(kwargs)
+    return AdmissionController("test", **opciones)
+
+
+async def trabajo(segundos, registro=None, nombre=None):
+    if registro is not None:
+        registro.append(nombre)
+    await asyncio.sleep(segundos)
+    return nombre
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, burst=2, now=0.0)
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0
+
+
+def test_rate_limit_per_client():
+    c = controller(client_rate=1, client_burst=2)
+    c.check_rate("a")
+    c.check_rate("a")
+    with pytest.raises(RateLimited) as info:
+        c.check_rate("a")
+    assert info.value.status_code == 429
+    assert info.value.retry_after_header == "1"
+    c.check_rate("b")
+    assert c.stats()["rate_limited"] == 1
+
+
+def test_concurrency_is_bounded():
+    c = controller()
+    en_curso = maximo = 0
+
+    async def medir():
+        nonlocal en_curso, maximo
+        en_curso += 1
+        maximo = max(maximo, en_curso)
+        await asyncio.sleep(0.02)
+        en_curso -= 1
+
+    async def main():
+        await asyncio.gather(*(c.run(medir) for _ in range(6)))
+
+    asyncio.run(main())
+    assert maximo == 2
+    stats = c.stats()
+    assert stats["admitted"] == 6 and stats["active"] == 0 and stats["queued"] == {"interactive": 0, "batch": 0}
+
+
+def test_full_queue_rejects_immediately():
+    c = controller()
+
+    async def main():
+        tareas = [asyncio.ensure_future(c.run(lambda: trabajo(0.2))) for _ in range(6)]
+        await asyncio.sleep(0.01)
+        t0 = time.perf_counter()
+        with pytest.raises(Overloaded) as info:
+            await c.run(lambda: trabajo(0.2))
+        assert time.perf_counter() - t0 < 0.05
+        assert info.value.status_code == 503 and int(info.value.retry_after_header) >= 1
+        await asyncio.gather(*tareas)
+
+    asyncio.run(main())
+    assert c.stats()["rejected_full"] == 1
+
+
+def test_interactive_lane_goes_first():
+    c = controller(max_concurrency=1, max_queue=10)
+    orden = []
+
+    async def main():
+        primera = asyncio.ensure_future(c.run(lambda: trabajo(0.05)))
+        await asyncio.sleep(0.01)
+        tareas = [asyncio.ensure_future(c.run(lambda n=n: trabajo(0, orden, n), lane="batch")) for n in ("b1", "b2")]
+        await asyncio.sleep(0)
+        tareas += [asyncio.ensure_future(c.run(lambda n=n: trabajo(0, orden, n))) for n in ("i1", "i2")]
+        await asyncio.gather(primera, *tareas)
+
+    asyncio.run(main())
+    assert orden == ["i1", "i2", "b1", "b2"]
+
+
+def test_interactive_request_evicts_batch_when_full():
+    c = controller(max_concurrency=1, max_queue=2)
+
+    async def main():
+        primera = asyncio.ensure_future(c.run(lambda: trabajo(0.05)))
+        await asyncio.sleep(0.01)
+        lotes = [asyncio.ensure_future(c.run(lambda: trabajo(0), lane="batch")) for _ in range(2)]
+        await asyncio.sleep(0)
+        interactiva = asyncio.ensure_future(c.run(lambda: trabajo(0, nombre="interactiva")))
+        resultados = await asyncio.gather(primera, *lotes, interactiva, return_exceptions=True)
+        return resultados
+
+    resultados = asyncio.run(main())
+    assert resultados[-1] == "interactiva"
+    assert isinstance(resultados[2], Overloaded)
+    assert c.stats()["evicted"] == 1
+
+
+def test_deadline_that_cannot_be_met_is_rejected_up_front():
+    c = controller(max_concurrency=1, initial_service_time=0.5)
+
+    async def main():
+        primera = asyncio.ensure_future(c.run(lambda: trabajo(0.05)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await c.run(lambda: trabajo(0), deadline=time.monotonic() + 0.3)
+        await primera
+
+    asyncio.run(main())
+    assert c.stats()["rejected_deadline"] == 1
+
+
+def test_queued_request_past_its_deadline_is_dropped():
+    c = controller(max_concurrency=1, initial_service_time=0.01)
+    ejecutadas = []
+
+    async def main():
+        # La primera tarda mucho más de lo que el controlador estima
+        primera = asyncio.ensure_future(c.run(lambda: trabajo(0.3)))
+        await asyncio.sleep(0.01)
+        segunda = asyncio.ensure_future(
+            c.run(lambda: trabajo(0, ejecutadas, "segunda"), deadline=time.monotonic() + 0.1)
+        )
+        resultados = await asyncio.gather(primera, segunda, return_exceptions=True)
+        return resultados
+
+    resultados = asyncio.run(main())
+    assert isinstance(resultados[1], Overloaded)
+    assert ejecutadas == []
+    assert c.stats()["dropped_deadline"] == 1 and c.stats()["active"] == 0
+
+
+def test_cancelled_waiter_frees_its_place():
+    c = controller(max_concurrency=1)
+
+    async def main():
+        primera = asyncio.ensure_future(c.run(lambda: trabajo(0.05)))
+        await asyncio.sleep(0.01)
+        esperando = asyncio.ensure_future(c.run(lambda: trabajo(0)))
+        await asyncio.sleep(0.01)
+        esperando.cancel()
+        await primera
+        await c.run(lambda: trabajo(0))
+
+    asyncio.run(main())
+    stats = c.stats()
+    assert stats["active"] == 0 and stats["queued"]["interactive"] == 0
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from app import chatbot
+
+    c = controller(max_concurrency=2, max_queue=3, client_rate=100, client_burst=100, initial_service_time=0.2)
+    monkeypatch.setattr(chatbot, "llm_admission", c)
+
+    async def answer_question(request):
+        await asyncio.sleep(0.2)
+        return [{"answer": request.request, "activitats": []}]
+
+    monkeypatch.setattr(chatbot, "answer_question", answer_question)
+    aplicacion = FastAPI()
+    aplicacion.include_router(chatbot.router, prefix="/cb")
+    return aplicacion, c
+
+
+def test_endpoint_under_overload(app):
+    aplicacion, c = app
+
+    async def main():
+        transport = httpx.ASGITransport(app=aplicacion)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def pedir(i):
+                t0 = time.perf_counter()
+                r = await client.post("/cb/query", json={"request": f"pregunta {i}"})
+                return r, time.perf_counter() - t0
+
+            return await asyncio.gather(*(pedir(i) for i in range(20)))
+
+    respuestas = asyncio.run(main())
+    ok = [r for r, _ in respuestas if r.status_code == 200]
+    rechazadas = [(r, t) for r, t in respuestas if r.status_code == 503]
+    assert len(ok) + len(rechazadas) == 20
+    assert len(ok) == 5
+    assert all(r.headers["Retry-After"].isdigit() for r, _ in rechazadas)
+    # Los rechazos son inmediatos, no esperan a que se libere el LLM
+    assert max(t for _, t in rechazadas) < 0.15
+    assert c.stats()["active"] == 0
+
+
+def test_endpoint_rate_limit_and_priority_headers(app):
+    aplicacion, c = app
+    c.client_rate, c.client_burst = 0.5, 1
+
+    async def main():
+        transport = httpx.ASGITransport(app=aplicacion)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            cabeceras = {"X-Forwarded-For": "10.0.0.1", "X-Request-Priority": "batch"}
+            primera = await client.post("/cb/query", json={"request": "a"}, headers=cabeceras)
+            segunda = await client.post("/cb/query", json={"request": "b"}, headers=cabeceras)
+            otra = await client.post("/cb/query", json={"request": "c"}, headers={"X-Request-Priority": "urgente"})
+            return primera, segunda, otra
+
+    primera, segunda, otra = asyncio.run(main())
+    assert primera.status_code == 200
+    assert segunda.status_code == 429 and segunda.headers["Retry-After"] == "2"
+    assert otra.status_code == 400
+
+
+def test_collapsed_requests_keep_their_own_lane_and_deadline(monkeypatch):
+    from app import chatbot
+
+    carriles = []
+
+    class Controlador:
+        async def run(self, fn, lane, deadline):
+            carriles.append(lane)
+            await asyncio.sleep(0.05)
+            if deadline < 1:
+                raise Overloaded("La petición no terminaría antes de su deadline", 1)
+            return await fn()
+
+    async def answer_question(request):
+        return [{"answer": request.request, "activitats": []}]
+
+    monkeypatch.setattr(chatbot, "llm_admission", Controlador())
+    monkeypatch.setattr(chatbot, "answer_question", answer_question)
+    pregunta = chatbot.QueryRequest(request="Igual?")
+
+    async def main():
+        corta = asyncio.ensure_future(chatbot.answer_admitted(pregunta, {"lane": "interactive", "deadline": 0}))
+        await asyncio.sleep(0.01)
+        larga = asyncio.ensure_future(chatbot.answer_admitted(pregunta, {"lane": "interactive", "deadline": 10}))
+        batch = asyncio.ensure_future(chatbot.answer_admitted(pregunta, {"lane": "batch", "deadline": 10}))
+        return await asyncio.gather(corta, larga, batch, return_exceptions=True)
+
+    corta, larga, batch = asyncio.run(main())
+    assert isinstance(corta, Overloaded)
+    # La idéntica con más margen se reintenta con su propio deadline
+    assert larga == batch == [{"answer": "Igual?", "activitats": []}]
+    # La batch no se agrupa con las interactivas
+    assert carriles == ["interactive", "batch", "interactive"]
+
+
+def test_query_coordinates_are_validated(app):
+    aplicacion, c = app
+    client = TestClient(aplicacion)
+    for invalida in ({"lat": 91, "lon": 2.17, "radio_km": 5}, {"lat": 41.39, "lon": -181, "radio_km": 5},
+                     {"lat": 41.39, "lon": 2.17, "radio_km": 0}):
+        assert client.post("/cb/query", json={"request": "a prop", **invalida}).status_code == 422
+    assert client.post("/cb/query", json={"request": "a prop", "lat": -90, "lon": 180, "radio_km": 0.5}).status_code == 200
+    assert c.stats()["admitted"] == 1
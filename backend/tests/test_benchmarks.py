@@ -0,0 +1,89 @@
+import hashlib
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from benchmarks.e2e import compare, percentile, summarize
+from benchmarks.replay import ReplayConfig, ndcg_at_k, precision_at_k, prepare, recall_at_k, run
+from benchmarks.stubs import LLMStub, WhisperStub
+from benchmarks.synthetic import Scale, generate
+
+SMALL = Scale(users=20, content=50, categories=8, locations=10, interactions=300)
+
+
+def digest(db_path):
+    conn = sqlite3.connect(db_path)
+    h = hashlib.sha256()
+    for tabla in ["categorias", "contenido_formativo", "contenido_categorias", "perfiles", "interacciones"]:
+        for row in conn.execute(f"SELECT * FROM {tabla} ORDER BY rowid"):
+            h.update(repr(row).encode())
+    conn.close()
+    return h.hexdigest()
+
+
+def test_synthetic_db_is_deterministic(tmp_path):
+    a, b = str(tmp_path / "a.sqlite"), str(tmp_path / "b.sqlite")
+    generate(a, SMALL)
+    generate(b, SMALL)
+    assert digest(a) == digest(b)
+    conn = sqlite3.connect(a)
+    assert conn.execute("SELECT COUNT(*) FROM interacciones").fetchone()[0] == SMALL.interactions
+    assert conn.execute("SELECT COUNT(*) FROM contenido_categorias").fetchone()[0] == 3 * SMALL.content
+    conn.close()
+
+
+def test_stub_servers():
+    with LLMStub("Art, Cultura", latency_ms=20) as llm, WhisperStub("hola") as whisper:
+        respuesta = requests.post(f"{llm.url}/v1/chat/completions", json={"messages": []}, timeout=5)
+        assert respuesta.json()["choices"][0]["message"]["content"] == "Art, Cultura"
+        assert respuesta.elapsed.total_seconds() >= 0.02
+        assert requests.post(whisper.url, data=b"RIFF", timeout=5).json() == {"text": "hola"}
+        assert (llm.requests, whisper.requests) == (1, 1)
+
+
+def test_percentiles_and_report():
+    assert percentile(list(range(1, 101)), 50) == 50
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([], 95) == 0.0
+    resumen = summarize([0.01] * 9 + [0.1], {200: 9, 503: 1}, duracion=1.0)
+    assert resumen["errors"] == 1
+    assert resumen["latency_ms"]["p50"] == 10.0
+    assert resumen["latency_ms"]["p99"] == 100.0
+    tabla = compare({"scenarios": {"x": resumen}}, {"scenarios": {"x": resumen}})
+    assert "+0.0%" in tabla
+
+
+def test_ranking_metrics():
+    recomendados = ["a", "b", "c", "d"]
+    assert precision_at_k(recomendados, {"b", "d", "x"}, 4) == 0.5
+    assert recall_at_k(recomendados, {"b", "d", "x"}, 4) == 2 / 3
+    assert recall_at_k(recomendados, set(), 4) == 0.0
+    assert ndcg_at_k(recomendados, {"a"}, 4) == 1.0
+    assert ndcg_at_k(["x", "a"], {"a"}, 2) < 1.0
+    assert ndcg_at_k([], {"a"}, 2) == 0.0
+
+
+def test_replay_starts_empty_and_is_shard_independent(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, SMALL)
+    base = str(tmp_path / "base.sqlite")
+    prepare(db_path, base)
+    conn = sqlite3.connect(base)
+    assert conn.execute("SELECT COUNT(*) FROM interacciones").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM popularidad_contenido").fetchone()[0] == 0
+    conn.close()
+
+    config = ReplayConfig(k=5, batch_size=50, memory_every=10)
+    uno = run(db_path, config)
+    varios = run(db_path, ReplayConfig(**{**config.__dict__, "shards": 2}), workers=2)
+    assert uno["points"] == varios["points"] == SMALL.interactions
+    assert uno["metrics"] == pytest.approx(varios["metrics"])
+    assert 0 < uno["metrics"]["recall@5"] <= 1
+    assert uno["peak_alloc_kb"]["samples"] == SMALL.interactions // 10
+
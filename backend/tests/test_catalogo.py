@@ -0,0 +1,159 @@
+import gzip
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from api.endpoints.catalogo import router
+from app import responses
+from benchmarks.synthetic import Scale, generate
+from db.session import get_sqlite
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("catalogo") / "jaa.sqlite")
+    generate(path, Scale(users=10, content=300, categories=8, locations=20, interactions=100))
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    def conexion():
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_sqlite] = conexion
+    return TestClient(app)
+
+
+def fetch_all(client, **params):
+    items, cursor = [], None
+    while True:
+        respuesta = client.get("/api/catalogo", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert respuesta.status_code == 200
+        pagina = respuesta.json()
+        items += pagina["items"]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_keyset_pagination_covers_catalogue(client, db_path):
+    items = fetch_all(client, limit=37)
+    ids = [item["id"] for item in items]
+    conn = sqlite3.connect(db_path)
+    esperados = [r[0] for r in conn.execute("SELECT id FROM contenido_formativo ORDER BY id")]
+    conn.close()
+    assert ids == esperados
+
+
+def test_filters(client, db_path):
+    items = fetch_all(client, tipo="curso", estado="activo", limit=25)
+    assert items and all(item["tipo"] == "curso" and item["estado"] == "activo" for item in items)
+    conn = sqlite3.connect(db_path)
+    esperados = conn.execute(
+        "SELECT COUNT(*) FROM contenido_formativo WHERE tipo = 'curso' AND estado = 'activo'"
+    ).fetchone()[0]
+    conn.close()
+    assert len(items) == esperados
+
+
+def test_category_filter_and_projection(client):
+    items = fetch_all(client, categoria="Art", fields="titulo,categorias", limit=10)
+    assert items
+    assert all(set(item) == {"id", "titulo", "categorias"} for item in items)
+    assert all("Art" in item["categorias"] for item in items)
+    assert client.get("/api/catalogo", params={"categoria": "No existe"}).json()["items"] == []
+
+
+def test_category_filter_matches_every_category_with_that_name(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=1, content=50, categories=4, locations=5, interactions=0))
+    conn = sqlite3.connect(db_path)
+    # Mismo nombre en otro tipo de categoría
+    categoria_id = conn.execute("INSERT INTO categorias (nombre, tipo) VALUES ('Art', 'nivel')").lastrowid
+    contenido_id = conn.execute(
+        "SELECT id FROM contenido_formativo WHERE id NOT IN "
+        "(SELECT contenido_id FROM contenido_categorias cc JOIN categorias c ON c.id = cc.categoria_id WHERE c.nombre = 'Art')"
+    ).fetchone()[0]
+    conn.execute("INSERT INTO contenido_categorias VALUES (?, ?)", (contenido_id, categoria_id))
+    # Y un contenido que está en las dos
+    conn.execute(
+        "INSERT INTO contenido_categorias SELECT cc.contenido_id, ? FROM contenido_categorias cc "
+        "JOIN categorias c ON c.id = cc.categoria_id WHERE c.nombre = 'Art' AND c.id != ? LIMIT 1",
+        (categoria_id, categoria_id),
+    )
+    conn.commit()
+    esperados = {r[0] for r in conn.execute(
+        "SELECT cc.contenido_id FROM contenido_categorias cc JOIN categorias c ON c.id = cc.categoria_id WHERE c.nombre = 'Art'"
+    )}
+    conn.close()
+
+    def conexion():
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_sqlite] = conexion
+    items = fetch_all(TestClient(app), categoria="Art", limit=7)
+    assert contenido_id in esperados
+    # Cada contenido una sola vez, en orden de id
+    assert [item["id"] for item in items] == sorted(esperados)
+
+
+def test_invalid_parameters(client):
+    assert client.get("/api/catalogo", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/api/catalogo", params={"cursor": "%%%"}).status_code == 400
+    assert client.get("/api/catalogo", params={"tipo": "conferencia"}).status_code == 422
+    assert client.get("/api/catalogo", params={"limit": 10_000}).status_code == 422
+
+
+def test_etag_and_not_modified(client):
+    primera = client.get("/api/catalogo", params={"limit": 5})
+    etag = primera.headers["etag"]
+    assert etag.startswith('W/"')
+    segunda = client.get("/api/catalogo", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert segunda.status_code == 304
+    assert segunda.content == b""
+    assert segunda.headers["etag"] == etag
+    otra = client.get("/api/catalogo", params={"limit": 6}, headers={"If-None-Match": etag})
+    assert otra.status_code == 200
+
+
+def test_gzip_compression(client, monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    respuesta = client.get(
+        "/api/catalogo", params={"limit": 50, "fields": "titulo,descripcion"},
+        headers={"Accept-Encoding": "br, gzip"},
+    )
+    assert respuesta.headers["content-encoding"] == "gzip"
+    assert respuesta.json()["items"]
+    sin = client.get("/api/catalogo", params={"limit": 50}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sin.headers
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", object())
+    assert responses.negotiate_encoding("gzip, br") == "br"
+    assert responses.negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert responses.negotiate_encoding("*") == "br"
+    assert responses.negotiate_encoding("identity") is None
+    monkeypatch.setattr(responses, "brotli", None)
+    assert responses.negotiate_encoding("br") is None
+    assert gzip.decompress(responses.compress(b"x" * 1000, "gzip")) == b"x" * 1000
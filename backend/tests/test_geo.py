@@ -0,0 +1,94 @@
+import sqlite3
+import sys
+import random
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app import geo
+from app.recommender import ContentRecommender
+
+
+@pytest.fixture
+def geo_db(tmp_path):
+    """Base de datos con ubicaciones y contenidos repartidos por Barcelona"""
+    db_path = str(tmp_path / "geo.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE ubicaciones (id INTEGER PRIMARY KEY, latitud REAL, longitud REAL)")
+    conn.execute("CREATE TABLE contenido_formativo (id TEXT PRIMARY KEY, ubicacion_id INTEGER)")
+    rng = random.Random(1)
+    puntos = [(i, rng.uniform(41.30, 41.50), rng.uniform(2.05, 2.25)) for i in range(1, 2001)]
+    conn.executemany("INSERT INTO ubicaciones VALUES (?, ?, ?)", puntos)
+    conn.executemany(
+        "INSERT INTO contenido_formativo VALUES (?, ?)",
+        [(str(1000 + i), i) for i in range(1, 2001)],
+    )
+    conn.commit()
+    geo.ensure_rtree(conn)
+    yield db_path, conn, puntos
+    conn.close()
+
+
+def brute_force(puntos, lat, lon, radio_km):
+    ids = [p[0] for p in puntos]
+    d = geo.haversine_km(lat, lon, [p[1] for p in puntos], [p[2] for p in puntos])
+    return sorted((i for i, dist in zip(ids, d) if dist <= radio_km), key=lambda i: d[ids.index(i)])
+
+
+def test_haversine_barcelona_madrid():
+    d = geo.haversine_km(41.3874, 2.1686, [40.4168], [-3.7038])
+    assert d[0] == pytest.approx(505, abs=3)
+
+
+def test_nearby_matches_brute_force(geo_db):
+    _, conn, puntos = geo_db
+    for lat, lon, radio in [(41.40, 2.17, 1.0), (41.35, 2.10, 3.5), (41.45, 2.20, 0.2)]:
+        resultado = geo.nearby_ubicaciones(conn, lat, lon, radio)
+        assert [r[0] for r in resultado] == brute_force(puntos, lat, lon, radio)
+        distancias = [r[1] for r in resultado]
+        assert distancias == sorted(distancias)
+        assert all(d <= radio for d in distancias)
+
+
+def test_nearby_limit_returns_closest(geo_db):
+    _, conn, puntos = geo_db
+    completo = geo.nearby_ubicaciones(conn, 41.40, 2.17, 5.0)
+    assert geo.nearby_ubicaciones(conn, 41.40, 2.17, 5.0, limit=10) == completo[:10]
+
+
+def test_rtree_follows_ubicaciones_changes(geo_db):
+    _, conn, _ = geo_db
+    conn.execute("INSERT INTO ubicaciones VALUES (9999, 0.0, 0.0)")
+    assert geo.nearby_ubicaciones(conn, 0.0, 0.0, 1.0) == [(9999, 0.0)]
+    conn.execute("UPDATE ubicaciones SET latitud = 10.0 WHERE id = 9999")
+    assert geo.nearby_ubicaciones(conn, 0.0, 0.0, 1.0) == []
+    assert geo.nearby_ubicaciones(conn, 10.0, 0.0, 1.0)[0][0] == 9999
+    conn.execute("DELETE FROM ubicaciones WHERE id = 9999")
+    assert geo.nearby_ubicaciones(conn, 10.0, 0.0, 1.0) == []
+
+
+def test_bbox_across_antimeridian(geo_db):
+    _, conn, _ = geo_db
+    conn.execute("INSERT INTO ubicaciones VALUES (9001, 0.0, 179.99)")
+    conn.execute("INSERT INTO ubicaciones VALUES (9002, 0.0, -179.99)")
+    ids = {r[0] for r in geo.nearby_ubicaciones(conn, 0.0, -179.995, 5.0)}
+    assert ids == {9001, 9002}
+
+
+def test_nearby_contenido(geo_db):
+    _, conn, puntos = geo_db
+    esperados = [str(1000 + i) for i in brute_force(puntos, 41.40, 2.17, 1.0)]
+    assert [r[0] for r in geo.nearby_contenido(conn, 41.40, 2.17, 1.0)] == esperados
+
+
+def test_recommender_near_filter(geo_db):
+    db_path, conn, _ = geo_db
+    conn.execute("UPDATE ubicaciones SET latitud = 0.0, longitud = 0.0 WHERE id = 1")
+    conn.execute("UPDATE ubicaciones SET latitud = 0.0, longitud = 0.01 WHERE id = 3")
+    conn.commit()
+    recomendaciones = ContentRecommender(db_path=db_path).generate(1, lat=0.0, lon=0.0, radio_km=5.0)
+    assert [r["id"] for r in recomendaciones] == ["1001", "1003"]
+    assert recomendaciones[1]["distancia_km"] == pytest.approx(1.112, abs=0.001)
@@ -0,0 +1,168 @@
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from api.endpoints.interacciones import router
+from app.ingestion import IngestionQueueFull, InteractionBuffer, get_interaction_buffer
+from db.migrations import migrate_path
+
+
+def evento(i, tipo="view"):
+    return {"usuario_id": i % 10, "contenido_id": str(1000 + i), "tipo": tipo}
+
+
+def count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM interacciones").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "jaa.sqlite")
+    migrate_path(path)
+    return path
+
+
+def test_flush_by_batch_size(db_path):
+    buffer = InteractionBuffer(db_path, batch_size=50, flush_interval=60).start()
+    try:
+        buffer.submit(evento(i) for i in range(120))
+        deadline = time.monotonic() + 5
+        while buffer.written < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert buffer.written == 100
+        assert buffer.stats()["pending"] == 20
+    finally:
+        buffer.close()
+    assert count(db_path) == 120
+
+
+def test_flush_by_interval(db_path):
+    buffer = InteractionBuffer(db_path, batch_size=1000, flush_interval=0.05).start()
+    try:
+        buffer.submit([evento(1)])
+        deadline = time.monotonic() + 5
+        while buffer.written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count(db_path) == 1
+    finally:
+        buffer.close()
+
+
+def test_backpressure_rejects_whole_request(db_path):
+    buffer = InteractionBuffer(db_path, max_queue=10, batch_size=100, flush_interval=60)
+    buffer.submit(evento(i) for i in range(8))
+    with pytest.raises(IngestionQueueFull) as excinfo:
+        buffer.submit(evento(i) for i in range(3))
+    assert excinfo.value.retry_after >= 1
+    assert buffer.stats()["pending"] == 8
+    assert buffer.rejected == 3
+
+
+def test_close_drains_pending_events(db_path):
+    buffer = InteractionBuffer(db_path, batch_size=1000, flush_interval=60).start()
+    buffer.submit(evento(i) for i in range(250))
+    buffer.close()
+    assert count(db_path) == 250
+    with pytest.raises(RuntimeError):
+        buffer.submit([evento(1)])
+
+
+def test_invalid_rows_do_not_drop_batch(db_path):
+    buffer = InteractionBuffer(db_path, batch_size=1000, flush_interval=60).start()
+    try:
+        buffer.submit([evento(1), evento(2, tipo="share"), evento(3)])
+        assert buffer.flush(timeout=5)
+        assert (buffer.written, buffer.failed) == (2, 1)
+    finally:
+        buffer.close()
+    assert count(db_path) == 2
+
+
+def test_flush_hooks_run_in_write_transaction(db_path):
+    vistos = []
+    buffer = InteractionBuffer(
+        db_path, batch_size=10, flush_interval=60,
+        on_flush=[lambda conn, lote: vistos.append(len(lote))],
+    ).start()
+    try:
+        buffer.submit(evento(i) for i in range(25))
+        assert buffer.flush(timeout=5)
+    finally:
+        buffer.close()
+    assert sum(vistos) == 25
+
+
+def test_failing_hook_keeps_batch_and_writer(db_path):
+    def hook(conn, lote):
+        if any(fila[1] == "1001" for fila in lote):
+            # Lo que haya hecho el hook se deshace; las interacciones no
+            conn.execute("DELETE FROM interacciones")
+            raise ValueError("hook roto")
+
+    buffer = InteractionBuffer(db_path, batch_size=1000, flush_interval=60, on_flush=[hook]).start()
+    try:
+        buffer.submit([evento(1), evento(2)])
+        assert buffer.flush(timeout=5)
+        buffer.submit([evento(3)])
+        assert buffer.flush(timeout=5)
+        assert (buffer.written, buffer.failed, buffer.hook_errors) == (3, 0, 1)
+        assert buffer.stats()["writer_alive"]
+    finally:
+        buffer.close()
+    assert count(db_path) == 3
+    assert not buffer.stats()["writer_alive"]
+
+
+def test_concurrent_producers(db_path):
+    buffer = InteractionBuffer(db_path, batch_size=200, flush_interval=0.05).start()
+
+    def producir(base):
+        for i in range(500):
+            buffer.submit([evento(base + i)])
+
+    hilos = [threading.Thread(target=producir, args=(k * 1000,)) for k in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    buffer.close()
+    assert count(db_path) == 2000
+
+
+def test_endpoints(db_path):
+    buffer = InteractionBuffer(db_path, max_queue=3, batch_size=100, flush_interval=60)
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_interaction_buffer] = lambda: buffer
+    client = TestClient(app)
+
+    respuesta = client.post("/api/interacciones", json=evento(1, tipo="like"))
+    assert respuesta.status_code == 202
+    assert respuesta.json() == {"aceptadas": 1}
+
+    assert client.post("/api/interacciones", json=evento(1, tipo="share")).status_code == 422
+
+    respuesta = client.post("/api/interacciones/lote", json=[evento(i) for i in range(3)])
+    assert respuesta.status_code == 503
+    assert "Retry-After" in respuesta.headers
+
+    assert client.post("/api/interacciones/lote", json=[evento(2), evento(3)]).status_code == 202
+    stats = client.get("/api/interacciones/stats").json()
+    assert stats["pending"] == 3 and stats["writer_alive"] is False
+
+    buffer.start()
+    buffer.close()
+    assert count(db_path) == 3
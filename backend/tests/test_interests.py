@@ -0,0 +1,138 @@
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app import interests
+from app.interests import OBJETIVO_WEIGHT, InterestIndex, popcount
+from app.recommender import ContentRecommender
+from benchmarks.synthetic import Scale, generate
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    # Más de 64 categorías para que los bitsets ocupen varias palabras
+    generate(db_path, Scale(users=30, content=400, categories=90, locations=20, interactions=0))
+    conn = sqlite3.connect(db_path)
+    yield db_path, conn
+    conn.close()
+    interests.invalidate(db_path)
+
+
+def intereses(conn, perfil_id):
+    return set(conn.execute(
+        """
+        SELECT pi.origen, c.nombre FROM perfil_intereses AS pi
+        JOIN categorias AS c ON c.id = pi.categoria_id WHERE pi.perfil_id = ?
+        """,
+        (perfil_id,),
+    ))
+
+
+def test_popcount():
+    masks = np.array([[0, 1, 2**64 - 1], [3, 2**63, 0]], dtype=np.uint64)
+    assert popcount(masks).tolist() == [2, 2, 64]
+
+
+def test_triggers_keep_interests_in_sync(db):
+    _, conn = db
+    areas, objetivos = conn.execute("SELECT areas_interes, objetivos FROM perfiles WHERE id = 1").fetchone()
+    assert intereses(conn, 1) == (
+        {("area", n) for n in json.loads(areas)} | {("objetivo", n) for n in json.loads(objetivos)}
+    )
+
+    conn.execute("""UPDATE perfiles SET areas_interes = '["Àrea 70", "No existeix"]', objetivos = NULL WHERE id = 1""")
+    assert intereses(conn, 1) == {("area", "Àrea 70")}
+    conn.execute("UPDATE perfiles SET areas_interes = 'no és JSON' WHERE id = 1")
+    assert intereses(conn, 1) == set()
+
+    # Una categoría nueva recoge los perfiles que ya la mencionaban
+    conn.execute("""UPDATE perfiles SET areas_interes = '["Robòtica"]' WHERE id = 2""")
+    conn.execute("INSERT INTO categorias (id, nombre, tipo) VALUES (500, 'Robòtica', 'area')")
+    assert {i for i in intereses(conn, 2) if i[0] == "area"} == {("area", "Robòtica")}
+    conn.execute("DELETE FROM perfiles WHERE id = 2")
+    assert intereses(conn, 2) == set()
+
+
+def test_relevance_matches_set_operations(db):
+    _, conn = db
+    index = InterestIndex(conn)
+    categorias_de = {}
+    for contenido_id, nombre in conn.execute(
+        "SELECT cc.contenido_id, c.nombre FROM contenido_categorias AS cc JOIN categorias AS c ON c.id = cc.categoria_id"
+    ):
+        categorias_de.setdefault(contenido_id, set()).add(nombre)
+
+    for usuario_id, areas, objetivos in conn.execute("SELECT usuario_id, areas_interes, objetivos FROM perfiles"):
+        areas, objetivos = set(json.loads(areas)), set(json.loads(objetivos))
+        total = len(areas) + OBJETIVO_WEIGHT * len(objetivos)
+        esperada = [
+            (len(categorias_de.get(c, set()) & areas) + OBJETIVO_WEIGHT * len(categorias_de.get(c, set()) & objetivos)) / total
+            for c in index.ids
+        ]
+        assert index.relevance(index.profile(usuario_id)) == pytest.approx(esperada)
+
+
+def test_top_orders_by_relevance_then_rating(db):
+    _, conn = db
+    index = InterestIndex(conn)
+    perfil = index.profile(1)
+    todas = index.relevance(perfil)
+    top = index.top(perfil, 10)
+    assert len(top) == 10
+    claves = [(r, index.rating[fila]) for fila, r in top]
+    assert claves == sorted(claves, reverse=True)
+    assert top[-1][1] >= np.sort(todas)[-10]
+    assert index.profile(10_000) is None
+
+
+def test_expired_index_is_served_while_rebuilding(db, monkeypatch):
+    db_path, _ = db
+    holder = interests.IndexHolder(db_path, ttl=0)
+    viejo = holder.get()
+
+    liberar = threading.Event()
+    construir = interests.InterestIndex
+
+    def lento(conn):
+        liberar.wait(5)
+        return construir(conn)
+
+    monkeypatch.setattr(interests, "InterestIndex", lento)
+    assert holder.get() is viejo and holder.get() is viejo
+    assert holder.stats()["refreshing"]
+
+    liberar.set()
+    for _ in range(100):
+        if not holder.stats()["refreshing"]:
+            break
+        threading.Event().wait(0.05)
+    assert holder.builds == 2 and holder._index is not viejo
+
+
+def test_recommender_uses_profile_interests(db):
+    db_path, conn = db
+    recomendaciones = ContentRecommender(db_path=db_path).generate(1)
+    areas = set(json.loads(conn.execute("SELECT areas_interes FROM perfiles WHERE usuario_id = 1").fetchone()[0]))
+    assert recomendaciones and all(0 < r["relevancia"] <= 1 for r in recomendaciones)
+    for r in recomendaciones:
+        categorias = {n for (n,) in conn.execute(
+            "SELECT c.nombre FROM contenido_categorias AS cc JOIN categorias AS c ON c.id = cc.categoria_id "
+            "WHERE cc.contenido_id = ?", (r["id"],)
+        )}
+        assert {f"Área de interés: {n}" for n in categorias & areas} <= set(r["match_razones"])
+
+
+def test_recommender_falls_back_without_interests(tmp_path):
+    db_path = str(tmp_path / "buida.sqlite")
+    sqlite3.connect(db_path).close()
+    recomendaciones = ContentRecommender(db_path=db_path).generate(1)
+    assert [r["id"] for r in recomendaciones] == ["1001", "1002", "1003"]
@@ -0,0 +1,188 @@
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from api.endpoints.listas import router
+from benchmarks.synthetic import Scale, generate
+from db.session import get_db
+
+
+class ContadorConsultas:
+    def __init__(self, engine):
+        self.sentencias = []
+        event.listen(engine, "before_cursor_execute", self._registrar)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.sentencias.append(statement)
+
+    def __call__(self, fn, *args, **kwargs):
+        self.sentencias = []
+        resultado = fn(*args, **kwargs)
+        return resultado, list(self.sentencias)
+
+
+@pytest.fixture
+def entorno(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=5, content=200, categories=6, locations=10, interactions=0))
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def sesion():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_db] = sesion
+    yield TestClient(app), ContadorConsultas(engine), db_path
+    engine.dispose()
+
+
+def crear_listas(db_path, usuario_id, n_listas, items_por_lista):
+    conn = sqlite3.connect(db_path)
+    for n in range(n_listas):
+        lista_id = conn.execute(
+            "INSERT INTO listas (usuario_id, nombre) VALUES (?, ?)", (usuario_id, f"Lista {n}")
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO items_lista (lista_id, contenido_id, orden) VALUES (?, ?, ?)",
+            [(lista_id, str(1001 + (n * items_por_lista + i) % 200), items_por_lista - i) for i in range(items_por_lista)],
+        )
+    conn.commit()
+    conn.close()
+
+
+def test_user_lists_load_in_constant_queries(entorno):
+    client, contador, db_path = entorno
+    crear_listas(db_path, 1, 2, 3)
+    crear_listas(db_path, 2, 25, 8)
+
+    pocas, consultas_pocas = contador(client.get, "/api/usuarios/1/listas")
+    muchas, consultas_muchas = contador(client.get, "/api/usuarios/2/listas")
+    assert pocas.status_code == 200 and muchas.status_code == 200
+    assert len(pocas.json()) == 2 and len(muchas.json()) == 25
+    assert len(consultas_pocas) == len(consultas_muchas) == 2
+
+    lista = muchas.json()[0]
+    assert [item["orden"] for item in lista["items"]] == sorted(item["orden"] for item in lista["items"])
+    assert all(item["contenido"]["titulo"] for item in lista["items"])
+    assert client.get("/api/usuarios/99/listas").json() == []
+
+
+def test_list_crud(entorno):
+    client, _, _ = entorno
+    creada = client.post("/api/usuarios/1/listas", json={"nombre": "Per fer", "publica": True})
+    assert creada.status_code == 201
+    lista_id = creada.json()["id"]
+    assert creada.json()["items"] == []
+
+    cambiada = client.patch(f"/api/listas/{lista_id}", json={"descripcion": "Cursos pendents"})
+    assert cambiada.json()["descripcion"] == "Cursos pendents" and cambiada.json()["nombre"] == "Per fer"
+
+    assert client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ["1001", "1002"]}).status_code == 200
+    assert client.delete(f"/api/listas/{lista_id}").status_code == 204
+    assert client.get(f"/api/listas/{lista_id}").status_code == 404
+    assert client.post("/api/usuarios/99/listas", json={"nombre": "x"}).status_code == 404
+
+
+def test_bulk_add_is_a_single_insert(entorno):
+    client, contador, _ = entorno
+    lista_id = client.post("/api/usuarios/1/listas", json={"nombre": "Lot"}).json()["id"]
+
+    pocos, consultas_pocos = contador(client.post, f"/api/listas/{lista_id}/items", json={"contenido_ids": ["1001", "1002"]})
+    ids = [str(1003 + i) for i in range(60)]
+    muchos, consultas_muchos = contador(client.post, f"/api/listas/{lista_id}/items", json={"contenido_ids": ids + ["1001"]})
+    assert len(consultas_pocos) == len(consultas_muchos)
+    assert sum(s.lstrip().upper().startswith("INSERT") for s in consultas_muchos) == 1
+
+    items = muchos.json()["items"]
+    assert [item["contenido_id"] for item in items] == ["1001", "1002"] + ids
+    assert [item["orden"] for item in items] == list(range(62))
+
+    desconocido = client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ["1004", "no-existeix"]})
+    assert desconocido.status_code == 404 and "no-existeix" in desconocido.json()["detail"]
+
+
+def test_bulk_remove_and_reorder(entorno):
+    client, contador, _ = entorno
+    lista_id = client.post("/api/usuarios/1/listas", json={"nombre": "Ordre"}).json()["id"]
+    ids = [str(1001 + i) for i in range(30)]
+    client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ids})
+
+    quitada = client.request("DELETE", f"/api/listas/{lista_id}/items", json={"contenido_ids": ids[:10]})
+    assert [item["contenido_id"] for item in quitada.json()["items"]] == ids[10:]
+
+    nuevo_orden = list(reversed(ids[10:]))
+    reordenada, consultas = contador(client.put, f"/api/listas/{lista_id}/items/orden", json={"contenido_ids": nuevo_orden})
+    assert reordenada.status_code == 200
+    assert [item["contenido_id"] for item in reordenada.json()["items"]] == nuevo_orden
+    # Primero el lock (UPDATE listas) y luego un único UPDATE de los items
+    assert consultas[0].lstrip().upper().startswith("UPDATE LISTAS")
+    assert sum(s.lstrip().upper().startswith("UPDATE ITEMS_LISTA") for s in consultas) == 1
+
+    incompleto = client.put(f"/api/listas/{lista_id}/items/orden", json={"contenido_ids": nuevo_orden[:-1]})
+    assert incompleto.status_code == 400
+
+
+def test_concurrent_adds_do_not_duplicate_items(entorno):
+    client, _, db_path = entorno
+    lista_id = client.post("/api/usuarios/1/listas", json={"nombre": "Concurrent"}).json()["id"]
+    ids = [str(1001 + i) for i in range(20)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        respuestas = list(pool.map(
+            lambda n: client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ids[n % 3:]}),
+            range(16),
+        ))
+    assert all(r.status_code == 200 for r in respuestas)
+    items = client.get(f"/api/listas/{lista_id}").json()["items"]
+    assert sorted(item["contenido_id"] for item in items) == sorted(ids)
+    ordenes = [item["orden"] for item in items]
+    assert len(set(ordenes)) == len(ordenes)
+
+    conn = sqlite3.connect(db_path)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO items_lista (lista_id, contenido_id, orden) VALUES (?, ?, 99)", (lista_id, ids[0]))
+    conn.close()
+
+
+def test_reorder_beyond_batch_limit(entorno, monkeypatch):
+    from api.endpoints import listas
+
+    client, _, _ = entorno
+    monkeypatch.setattr(listas, "MAX_ITEMS_LISTA", 150)
+    lista_id = client.post("/api/usuarios/1/listas", json={"nombre": "Llarga"}).json()["id"]
+    ids = [str(1001 + i) for i in range(150)]
+    for inicio in range(0, len(ids), 50):
+        client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ids[inicio:inicio + 50]})
+
+    reordenada = client.put(f"/api/listas/{lista_id}/items/orden", json={"contenido_ids": list(reversed(ids))})
+    assert reordenada.status_code == 200
+    assert [item["contenido_id"] for item in reordenada.json()["items"]] == list(reversed(ids))
+
+    llena = client.post(f"/api/listas/{lista_id}/items", json={"contenido_ids": ["1200"]})
+    assert llena.status_code == 409
+
+    # Un reordenado lleva la lista entera, no está limitado por MAX_ITEMS_LOTE
+    todos = [str(i) for i in range(listas.MAX_ITEMS_LOTE + 1)]
+    assert listas.OrdenLista(contenido_ids=todos).contenido_ids == todos
+    with pytest.raises(ValueError):
+        listas.ContenidosLote(contenido_ids=todos)
@@ -0,0 +1,122 @@
+import socket
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.llm_router import CLOSED, HALF_OPEN, OPEN, Backend, LLMRouter, NoBackendAvailable
+from benchmarks.stubs import LLMStub
+
+
+def preguntar(router):
+    respuesta = router.complete(model="tgi", messages=[{"role": "user", "content": "Hola"}], max_tokens=10)
+    return respuesta.choices[0].message.content
+
+
+def router_sobre(*stubs, **kwargs):
+    opciones = {"hedge": False, "breaker_failures": 2, "breaker_cooldown": 0.3}
+    opciones.update(kwargs)
+    return LLMRouter([Backend(stub.url, "stub", timeout=5) for stub in stubs], **opciones)
+
+
+def puerto_cerrado():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_routes_to_the_fastest_backend():
+    with LLMStub("lenta", latency_ms=150) as lenta, LLMStub("rapida", latency_ms=5) as rapida:
+        router = router_sobre(lenta, rapida)
+        respuestas = [preguntar(router) for _ in range(20)]
+    # Cada backend se prueba al menos una vez; después gana el rápido
+    assert respuestas[-10:] == ["rapida"] * 10
+    assert lenta.requests <= 2
+    stats = router.stats()
+    assert stats["calls"] == 20
+    assert stats["backends"][rapida.url]["wins"] >= 18
+
+
+def test_hedge_cuts_tail_latency():
+    with LLMStub("lenta", latency_ms=400) as lenta, LLMStub("rapida", latency_ms=20) as rapida:
+        # El backend lento va primero porque aún no hay estadísticas
+        router = router_sobre(lenta, rapida, hedge=True, hedge_delay=0.05)
+        t0 = time.perf_counter()
+        assert preguntar(router) == "rapida"
+        assert time.perf_counter() - t0 < 0.3
+    stats = router.stats()
+    assert stats["hedges"] == 1 and stats["hedges_won"] == 1
+
+
+def test_failover_and_circuit_breaker():
+    with LLMStub("rota", error_rate=1.0) as rota, LLMStub("sana") as sana:
+        router = router_sobre(rota, sana)
+        # Sin estadísticas el primero es el roto: falla y se reintenta en el sano
+        assert preguntar(router) == "sana"
+        assert preguntar(router) == "sana"
+        assert router.stats()["backends"][rota.url]["state"] == OPEN
+        peticiones = rota.requests
+        for _ in range(5):
+            assert preguntar(router) == "sana"
+        assert rota.requests == peticiones
+        assert router.stats()["failovers"] == 2
+
+
+def test_breaker_half_open_probe_closes_circuit():
+    with LLMStub("ok") as stub:
+        backend = Backend(stub.url, "stub", timeout=5)
+        router = LLMRouter([backend], hedge=False, breaker_failures=1, breaker_cooldown=0.1)
+        stub.error_rate = 1.0
+        with pytest.raises(Exception):
+            preguntar(router)
+        assert backend.state(time.monotonic(), 0.1) == OPEN
+        with pytest.raises(NoBackendAvailable):
+            preguntar(router)
+        time.sleep(0.15)
+        assert backend.state(time.monotonic(), 0.1) == HALF_OPEN
+        stub.error_rate = 0.0
+        assert preguntar(router) == "ok"
+        assert backend.state(time.monotonic(), 0.1) == CLOSED
+
+
+def test_half_open_backend_recovers_while_another_is_healthy():
+    with LLMStub("a") as a, LLMStub("b") as b:
+        router = router_sobre(a, b, breaker_failures=1, breaker_cooldown=0.1)
+        a.error_rate = 1.0
+        assert preguntar(router) == "b"
+        assert router.stats()["backends"][a.url]["state"] == OPEN
+        a.error_rate = 0.0
+        time.sleep(0.15)
+        peticiones = a.requests
+        # La prueba sale en la siguiente llamada aunque b esté sano
+        preguntar(router)
+        assert a.requests == peticiones + 1
+        assert router.stats()["backends"][a.url]["state"] == CLOSED
+        assert router.backends[0].probe_until is None
+
+
+def test_unused_probe_lease_expires():
+    backend = Backend("http://127.0.0.1:1", "stub", timeout=0.05)
+    backend.opened_at = time.monotonic() - 1
+    router = LLMRouter([backend], hedge=False, breaker_cooldown=0.1)
+    assert router.ranked() == [backend]
+    # Sin usar la prueba, nadie más puede probar hasta que caduque la reserva
+    assert router.ranked() == []
+    time.sleep(0.06)
+    assert router.ranked() == [backend]
+
+
+def test_unreachable_backend_is_ejected():
+    with LLMStub("sana") as sana:
+        router = LLMRouter(
+            [Backend(puerto_cerrado(), "stub", timeout=1), Backend(sana.url, "stub", timeout=5)],
+            hedge=False, breaker_failures=1, breaker_cooldown=60,
+        )
+        assert [preguntar(router) for _ in range(3)] == ["sana"] * 3
+        stats = router.stats()
+    caido = next(s for url, s in stats["backends"].items() if url != sana.url)
+    assert caido["state"] == OPEN and caido["requests"] == 1
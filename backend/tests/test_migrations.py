@@ -0,0 +1,193 @@
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from api.endpoints import catalogo
+from app import chatbot, geo, search
+from db.migrations import MIGRATIONS, current_version, migrate, migrate_path
+
+NEAR_CLAUSE, NEAR_PARAMS = geo.near_filter("r", 41.39, 2.17, 5.0)
+
+# Consultas calientes de la aplicación: (sql, parámetros), con el SQL que
+# generan los propios módulos
+HOT_QUERIES = {
+    "categorias_activas": (chatbot.CATEGORIAS_ACTIVAS_SQL, []),
+    "contenido_por_categoria": (chatbot.contenido_query(2), ["Art", "Cultura"]),
+    # chatbot.sql_query con filtro "cerca de mí"
+    "contenido_por_categoria_cerca": (chatbot.contenido_query(1, NEAR_CLAUSE), ["Art"] + NEAR_PARAMS),
+    "ubicaciones_cerca": (geo.NEARBY_UBICACIONES_SQL.format(near=NEAR_CLAUSE), NEAR_PARAMS),
+    "contenido_cerca": (geo.NEARBY_CONTENIDO_SQL.format(near=NEAR_CLAUSE), NEAR_PARAMS),
+    # Primera página y siguientes
+    "catalogo_filtrado": catalogo.build_query(["id", "titulo"], {"tipo": "curso"}, None, None, 51),
+    "catalogo_filtrado_cursor": catalogo.build_query(["id", "titulo"], {"tipo": "curso"}, None, "1500", 51),
+    "catalogo_por_categoria": catalogo.build_query(["id", "titulo"], {"modalidad": "online"}, [3], None, 51),
+    "catalogo_por_categoria_cursor": catalogo.build_query(["id", "titulo"], {"modalidad": "online"}, [3], "1500", 51),
+    "busqueda_texto": (search.SEARCH_SQL, ['"t15" OR "t16"', 20]),
+    "perfil_usuario": (chatbot.PERFIL_SQL, [1]),
+    # Accesos por usuario, contenido y lista que deben ir por índice
+    "interacciones_usuario": (
+        "SELECT contenido_id, tipo, fecha FROM interacciones WHERE usuario_id = ? ORDER BY fecha",
+        [1],
+    ),
+    "interacciones_contenido": (
+        "SELECT COUNT(*) FROM interacciones WHERE contenido_id = ?",
+        ["1001"],
+    ),
+    "items_lista": (
+        "SELECT contenido_id, orden FROM items_lista WHERE lista_id = ? ORDER BY orden",
+        [1],
+    ),
+}
+
+# Pasos que leen mucho más de lo que devuelven:
+# - "SCAN t" o "SCAN t USING [COVERING] INDEX i" recorren la tabla o el
+#   índice entero;
+# - "SEARCH t ... (col>?)", un rango sin igualdad delante, lee toda la cola;
+# - en tablas virtuales R*Tree, "INDEX 2:" sin restricciones.
+FULL_SCAN = re.compile(r"^SCAN \w+( USING (COVERING )?INDEX \w+)?$|^SEARCH .*\(\w+[<>]|VIRTUAL TABLE INDEX (0|2):$")
+# En una consulta con LIMIT, ordenar en un B-tree temporal obliga a leer
+# todas las filas candidatas antes de devolver la primera
+TEMP_BTREE = re.compile(r"USE TEMP B-TREE")
+
+# Restricción con la que debe empezar el plan de algunas consultas
+EXPECTED_SEARCH = {
+    "catalogo_por_categoria": "SEARCH cc USING COVERING INDEX idx_contenido_categorias_categoria (categoria_id=?",
+    "catalogo_por_categoria_cursor": "SEARCH cc USING COVERING INDEX idx_contenido_categorias_categoria (categoria_id=?",
+}
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def seed(conn):
+    conn.executemany(
+        "INSERT INTO categorias (id, nombre, tipo, activa) VALUES (?, ?, 'area', ?)",
+        [(i, f"cat{i}", i % 2) for i in range(1, 51)],
+    )
+    conn.executemany(
+        "INSERT INTO ubicaciones (id, latitud, longitud) VALUES (?, ?, ?)",
+        [(i, 41.0 + i / 1000, 2.0 + i / 1000) for i in range(1, 501)],
+    )
+    conn.executemany(
+        "INSERT INTO contenido_formativo (id, titulo, tipo, ubicacion_id) VALUES (?, ?, 'curso', ?)",
+        [(str(i), f"t{i}", i % 500 + 1) for i in range(1, 2001)],
+    )
+    conn.executemany(
+        "INSERT INTO contenido_categorias VALUES (?, ?)",
+        [(str(i), i % 50 + 1) for i in range(1, 2001)],
+    )
+    conn.executemany(
+        "INSERT INTO interacciones (usuario_id, contenido_id, tipo, fecha) VALUES (?, ?, 'view', ?)",
+        [(i % 100, str(i % 2000 + 1), f"2024-01-{i % 28 + 1:02d}") for i in range(5000)],
+    )
+    conn.executemany(
+        "INSERT INTO items_lista (lista_id, contenido_id, orden) VALUES (?, ?, ?)",
+        [(i % 40, str(i + 1), i) for i in range(1000)],
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "jaa.sqlite"))
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_migrate_creates_schema(migrated_db):
+    assert current_version(migrated_db) == MIGRATIONS[-1][0]
+    tablas = {r[0] for r in migrated_db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {
+        "usuarios", "perfiles", "ubicaciones", "categorias", "contenido_formativo",
+        "contenido_categorias", "listas", "items_lista", "interacciones", "ubicaciones_rtree",
+        "perfil_intereses", "popularidad_contenido", "catalogo_version",
+    } <= tablas
+
+
+def test_migrate_is_idempotent(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    assert migrate_path(db_path) == MIGRATIONS[-1][0]
+    assert migrate_path(db_path) == MIGRATIONS[-1][0]
+
+
+def test_migrate_adopts_existing_database(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE ubicaciones (id INTEGER PRIMARY KEY, latitud REAL, longitud REAL)")
+    conn.execute("INSERT INTO ubicaciones VALUES (1, 41.39, 2.17)")
+    conn.commit()
+    migrate(conn)
+    assert geo.nearby_ubicaciones(conn, 41.39, 2.17, 1.0) == [(1, 0.0)]
+    conn.close()
+
+
+def test_text_search_survives_vacuum(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO contenido_formativo (id, titulo, descripcion, tipo) VALUES (?, ?, ?, 'curso')",
+        [(f"c{i}", f"Curs {i}", "Fotografia digital" if i == 7 else "Altres") for i in range(20)],
+    )
+    # Huecos en el rowid implícito: VACUUM los compacta y renumera las filas
+    conn.execute("DELETE FROM contenido_formativo WHERE id IN ('c1', 'c2', 'c3')")
+    conn.execute("VACUUM")
+    assert [r["titulo"] for r in search.search_contenido(conn, "fotografia")] == ["Curs 7"]
+
+    conn.execute("UPDATE contenido_formativo SET descripcion = 'Fotografia analògica', id = 'c7b' WHERE id = 'c7'")
+    conn.execute("UPDATE contenido_formativo SET descripcion = 'Fotografia de natura' WHERE id = 'c9'")
+    assert sorted(r["titulo"] for r in search.search_contenido(conn, "fotografia")) == ["Curs 7", "Curs 9"]
+    conn.execute("DELETE FROM contenido_formativo WHERE id = 'c9'")
+    assert [r["titulo"] for r in search.search_contenido(conn, "fotografia")] == ["Curs 7"]
+    conn.close()
+
+
+def test_duplicate_list_items_are_removed_before_unique_index(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "jaa.sqlite"))
+    migrate(conn, target=9)
+    conn.executemany(
+        "INSERT INTO items_lista (lista_id, contenido_id, orden) VALUES (?, ?, ?)",
+        [(1, "a", 0), (1, "b", 1), (1, "a", 2), (2, "a", 0)],
+    )
+    conn.commit()
+    migrate(conn)
+    assert conn.execute("SELECT lista_id, contenido_id, orden FROM items_lista ORDER BY id").fetchall() == [
+        (1, "a", 0), (1, "b", 1), (2, "a", 0),
+    ]
+    conn.close()
+
+
+def test_failed_migration_rolls_back(migrated_db, monkeypatch):
+    import db.migrations as migrations
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [
+        (99, "rota", ["CREATE TABLE temporal (id INTEGER)", "SELECT * FROM no_existe"]),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(migrated_db)
+    assert current_version(migrated_db) == MIGRATIONS[-1][0]
+    assert not migrated_db.execute("SELECT 1 FROM sqlite_master WHERE name = 'temporal'").fetchone()
+
+
+@pytest.mark.parametrize("analyzed", [False, True], ids=["sin_estadisticas", "con_analyze"])
+@pytest.mark.parametrize("nombre", sorted(HOT_QUERIES))
+def test_hot_query_does_not_scan(migrated_db, nombre, analyzed):
+    if analyzed:
+        seed(migrated_db)
+    sql, params = HOT_QUERIES[nombre]
+    plan = query_plan(migrated_db, sql, params)
+    scans = [paso for paso in plan if FULL_SCAN.search(paso)]
+    if re.search(r"\bLIMIT \?\s*$", sql):
+        scans += [paso for paso in plan if TEMP_BTREE.search(paso)]
+    assert not scans, f"{nombre} recorre la tabla completa: {plan}"
+    if nombre in EXPECTED_SEARCH:
+        assert plan[0].startswith(EXPECTED_SEARCH[nombre]), f"{nombre} no usa el índice esperado: {plan}"
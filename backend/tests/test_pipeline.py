@@ -0,0 +1,163 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.admission import AdmissionController
+from app.pipeline import Pipeline, PipelineError, Stage
+from benchmarks.stubs import LLMStub
+from benchmarks.synthetic import Scale, category_names, generate
+
+
+def dormir(segundos, valor):
+    def fn(ctx):
+        time.sleep(segundos)
+        return valor
+    return fn
+
+
+def test_independent_stages_run_concurrently():
+    pipeline = Pipeline("p", [
+        Stage("a", dormir(0.2, 1)),
+        Stage("b", dormir(0.2, 2)),
+        Stage("c", dormir(0.2, 3)),
+        Stage("suma", lambda ctx: ctx["a"] + ctx["b"] + ctx["c"] + ctx["extra"], deps=["a", "b", "c"]),
+    ])
+    t0 = time.perf_counter()
+    resultados = asyncio.run(pipeline.run({"extra": 10}))
+    assert time.perf_counter() - t0 < 0.5
+    assert resultados["suma"] == 16
+    timings = resultados["_timings"]
+    assert timings["suma"]["start_ms"] >= max(timings[n]["duration_ms"] for n in "abc") - 5
+    assert {t["status"] for t in timings.values()} == {"ok"}
+
+
+def test_async_stages_are_supported():
+    async def doble(ctx):
+        await asyncio.sleep(0.01)
+        return ctx["x"] * 2
+
+    pipeline = Pipeline("p", [Stage("doble", doble)])
+    assert asyncio.run(pipeline.run({"x": 4}))["doble"] == 8
+
+
+def test_timeout_uses_fallback():
+    pipeline = Pipeline("p", [
+        Stage("lenta", dormir(1.0, "tarde"), timeout=0.05, fallback=lambda ctx, e: "por defecto"),
+        Stage("final", lambda ctx: ctx["lenta"], deps=["lenta"]),
+    ])
+    t0 = time.perf_counter()
+    resultados = asyncio.run(pipeline.run())
+    assert time.perf_counter() - t0 < 0.5
+    assert resultados["final"] == "por defecto"
+    assert resultados["_timings"]["lenta"]["status"] == "fallback"
+    assert resultados["_timings"]["lenta"]["reason"] == "timeout"
+    assert pipeline.stats()["lenta"]["fallback"] == 1
+
+
+def test_timed_out_thread_keeps_admission_slot():
+    liberado = threading.Event()
+
+    def lenta(ctx):
+        liberado.wait(5)
+        return "tarde"
+
+    pipeline = Pipeline("p", [Stage("lenta", lenta, timeout=0.05, fallback=lambda ctx, e: "por defecto")])
+    controlador = AdmissionController("test", max_concurrency=1, client_rate=0)
+
+    async def main():
+        resultados = await controlador.run(pipeline.run)
+        assert resultados["lenta"] == "por defecto"
+        # El hilo sigue usando el recurso: el hueco no se ha liberado
+        assert controlador.stats()["active"] == 1 and controlador.lingering == 1
+        liberado.set()
+        for _ in range(100):
+            if not controlador.stats()["active"]:
+                break
+            await asyncio.sleep(0.01)
+        assert controlador.stats()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_error_without_fallback_skips_dependents():
+    def falla(ctx):
+        raise RuntimeError("sin base de datos")
+
+    pipeline = Pipeline("p", [
+        Stage("falla", falla),
+        Stage("independiente", lambda ctx: 1),
+        Stage("depende", lambda ctx: ctx["falla"], deps=["falla"]),
+    ])
+    with pytest.raises(PipelineError) as info:
+        asyncio.run(pipeline.run())
+    assert info.value.stage == "falla"
+    assert isinstance(info.value.cause, RuntimeError)
+    assert info.value.timings["depende"]["status"] == "skipped"
+    stats = pipeline.stats()
+    assert stats["falla"]["error"] == 1 and stats["independiente"]["ok"] == 1
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="desconocidas"):
+        Pipeline("p", [Stage("a", lambda ctx: 1, deps=["b"])])
+    with pytest.raises(ValueError, match="Ciclo"):
+        Pipeline("p", [Stage("a", lambda ctx: 1, deps=["b"]), Stage("b", lambda ctx: 1, deps=["a"])])
+    with pytest.raises(ValueError, match="repetida"):
+        Pipeline("p", [Stage("a", lambda ctx: 1), Stage("a", lambda ctx: 2)])
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    from app import chatbot, snapshot
+
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=5, content=200, categories=6, locations=10, interactions=0))
+    with LLMStub(category_names(6)[0], latency_ms=200) as llm:
+        monkeypatch.setattr(chatbot, "DB_PATH", db_path)
+        monkeypatch.setattr(snapshot, "current", lambda: None)
+        monkeypatch.setattr(chatbot, "get_settings", lambda: {"HF_TOKEN": "stub", "BASE_URL": llm.url, "BASE_URLS": None, "WHISPER_API_URL": None})
+        chatbot.get_router.cache_clear()
+        yield chatbot, db_path, llm
+    chatbot.get_router.cache_clear()
+
+
+def test_query_rag_stages(rag):
+    chatbot, db_path, llm = rag
+    resultados = asyncio.run(chatbot.rag_pipeline.run({"request": chatbot.QueryRequest(request="Cursos?")}))
+    assert resultados["clasificar"] == [category_names(6)[0]]
+    assert resultados["recuperar"]
+    assert resultados["responder"] == category_names(6)[0]
+    assert llm.requests == 2
+    timings = resultados["_timings"]
+    # Las etapas de base de datos empiezan a la vez, sin esperar al LLM
+    assert timings["palabras_clave"]["start_ms"] < timings["clasificar"]["start_ms"] + 50
+
+
+def test_classification_timeout_falls_back_to_keywords(rag, monkeypatch):
+    chatbot, db_path, llm = rag
+    monkeypatch.setattr(chatbot.rag_pipeline.stages["clasificar"], "timeout", 0.05)
+    request = chatbot.QueryRequest(request="Activitat formativa sintètica")
+    resultados = asyncio.run(chatbot.rag_pipeline.run({"request": request}))
+    assert resultados["_timings"]["clasificar"]["status"] == "fallback"
+    assert resultados["recuperar"] == resultados["palabras_clave"]
+    assert resultados["recuperar"]
+    assert resultados["responder"]
+
+
+def test_classification_timeout_uses_profile_interests(rag, monkeypatch):
+    chatbot, db_path, llm = rag
+    monkeypatch.setattr(chatbot.rag_pipeline.stages["clasificar"], "timeout", 0.05)
+    with sqlite3.connect(db_path) as conn:
+        usuario_id = conn.execute("SELECT usuario_id FROM perfiles LIMIT 1").fetchone()[0]
+    request = chatbot.QueryRequest(request="Què em recomanes?", usuario_id=usuario_id)
+    resultados = asyncio.run(chatbot.rag_pipeline.run({"request": request}))
+    assert resultados["perfil"] and set(resultados["perfil"]) <= set(category_names(6))
+    assert resultados["recuperar"] == chatbot.sql_query(resultados["perfil"])
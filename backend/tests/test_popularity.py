@@ -0,0 +1,180 @@
+import math
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app import popularity
+from app.ingestion import InteractionBuffer
+from app.popularity import POPULAR, RATES, TRENDING, WEIGHTS, Popularity, TopK, timestamp
+from app.recommender import ContentRecommender
+from benchmarks.synthetic import Scale, generate
+from db.migrations import migrate_path
+
+INICIO = datetime(2024, 3, 1)
+
+
+def evento(contenido_id, tipo, fecha):
+    return {"usuario_id": 1, "contenido_id": contenido_id, "tipo": tipo, "fecha": fecha}
+
+
+def escribir(db_path, eventos, pop):
+    buffer = InteractionBuffer(db_path, batch_size=len(eventos), flush_interval=60, on_flush=[pop.on_flush]).start()
+    try:
+        buffer.submit(eventos)
+        buffer.flush()
+    finally:
+        buffer.close()
+
+
+def contadores(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        landmark = conn.execute("SELECT landmark FROM popularidad_landmark").fetchone()[0]
+        filas = conn.execute("SELECT contenido_id, popular, trending, interacciones FROM popularidad_contenido")
+        return landmark, {f[0]: f[1:] for f in filas}
+    finally:
+        conn.close()
+
+
+def esperado(eventos, landmark, signal):
+    """Suma de pesos decaídos hasta el landmark, calculada de cero"""
+    total = {}
+    for e in eventos:
+        edad = landmark - timestamp(e["fecha"])
+        total[e["contenido_id"]] = total.get(e["contenido_id"], 0.0) + WEIGHTS[e["tipo"]] * math.exp(-RATES[signal] * edad)
+    return total
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "jaa.sqlite")
+    migrate_path(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        popularity.rebuild(conn, landmark=timestamp(INICIO))
+    conn.close()
+    return path
+
+
+def test_top_k_matches_sort():
+    rng = random.Random(7)
+    top, puntuaciones = TopK(10), {}
+    for _ in range(2_000):
+        item = f"c{rng.randrange(100)}"
+        puntuaciones[item] = puntuaciones.get(item, 0.0) + rng.random()
+        top.update(item, puntuaciones[item])
+    esperados = sorted(puntuaciones.items(), key=lambda par: (-par[1], par[0]))[:10]
+    assert top.items() == esperados
+
+
+def test_incremental_counters_match_recomputation(db_path):
+    pop = Popularity(db_path, compact_days=1000)
+    tipos = list(WEIGHTS)
+    rng = random.Random(3)
+    lotes = [
+        [evento(f"c{rng.randrange(20)}", rng.choice(tipos), INICIO + timedelta(hours=12 * n + i)) for i in range(30)]
+        for n in range(5)
+    ]
+    for lote in lotes:
+        escribir(db_path, lote, pop)
+    assert pop.skipped == 0 and pop.updates > 0
+
+    todos = [dict(e, fecha=e["fecha"].isoformat(sep=" ")) for lote in lotes for e in lote]
+    landmark, filas = contadores(db_path)
+    for signal, columna in ((POPULAR, 0), (TRENDING, 1)):
+        referencia = esperado(todos, landmark, signal)
+        assert {c: f[columna] for c, f in filas.items()} == pytest.approx(referencia)
+    assert sum(f[2] for f in filas.values()) == len(todos)
+
+
+def test_compaction_moves_landmark_and_keeps_ranking(db_path):
+    pop = Popularity(db_path, compact_days=7)
+    escribir(db_path, [evento("a", "view", INICIO)], pop)
+    viejos = [evento("viejo", "complete", INICIO + timedelta(hours=i)) for i in range(20)]
+    escribir(db_path, viejos, pop)
+    nuevos = [evento("nuevo", "view", INICIO + timedelta(days=30, hours=i)) for i in range(3)]
+    escribir(db_path, nuevos, pop)
+    assert pop.compactions == 1
+
+    landmark, filas = contadores(db_path)
+    assert landmark == timestamp(nuevos[-1]["fecha"])
+    # Tras un mes, un solo evento apenas cuenta en trending pero sigue contando en popular
+    assert "a" in filas and filas["a"][1] < 1e-6
+    assert filas["viejo"][0] == pytest.approx(esperado(viejos, landmark, POPULAR)["viejo"])
+    assert [c for c, _ in pop.top(POPULAR, 2)] == ["viejo", "nuevo"]
+    assert [c for c, _ in pop.top(TRENDING, 1)] == ["nuevo"]
+
+
+def test_in_memory_top_follows_writes(db_path):
+    pop = Popularity(db_path, refresh_interval=3600)
+    escribir(db_path, [evento("a", "like", INICIO), evento("b", "view", INICIO)], pop)
+    assert [c for c, _ in pop.top(POPULAR)] == ["a", "b"]
+    recargas = pop.reloads
+
+    escribir(db_path, [evento("b", "complete", INICIO + timedelta(minutes=1))], pop)
+    top = pop.top(POPULAR)
+    assert pop.reloads == recargas
+    assert [c for c, _ in top] == ["b", "a"] and top[0][1] == 1.0
+    assert [c for c, _ in pop.top(POPULAR, exclude=["b"])] == ["a"]
+
+
+def test_hook_skips_until_backfill(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    migrate_path(db_path)
+    pop = Popularity(db_path)
+    escribir(db_path, [evento("a", "view", INICIO), evento("b", "like", INICIO)], pop)
+    assert pop.skipped == 2 and pop.updates == 0
+
+    assert popularity.backfill(db_path)
+    assert not popularity.backfill(db_path)
+    landmark, filas = contadores(db_path)
+    assert landmark == timestamp(INICIO) and set(filas) == {"a", "b"}
+
+    escribir(db_path, [evento("a", "complete", INICIO + timedelta(hours=1))], pop)
+    assert pop.skipped == 2 and contadores(db_path)[1]["a"][2] == 2
+
+
+def test_hook_skips_events_without_date(db_path):
+    pop = Popularity(db_path)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        pop.on_flush(conn, [(1, "a", "view", None, None, None, None), (1, "b", "view", None, None, None, INICIO)])
+    conn.close()
+    assert set(contadores(db_path)[1]) == {"b"}
+
+
+def test_hook_tolerates_unmigrated_database(tmp_path):
+    db_path = str(tmp_path / "vella.sqlite")
+    migrate_path(db_path, target=6)
+    pop = Popularity(db_path)
+    escribir(db_path, [evento("a", "view", INICIO)], pop)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM interacciones").fetchone()[0] == 1
+    conn.close()
+    with pytest.raises(sqlite3.Error):
+        pop.top(POPULAR)
+
+
+def test_recommender_blends_and_falls_back_to_popularity(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=20, content=300, categories=8, locations=10, interactions=3_000))
+    try:
+        recommender = ContentRecommender(db_path=db_path)
+        personalizadas = recommender.generate(1)
+        assert personalizadas and all(0 < r["relevancia"] <= 1 for r in personalizadas)
+
+        # Sin perfil, el contenido más popular en lugar de las recomendaciones fijas
+        sin_perfil = recommender.generate(10_000)
+        assert sin_perfil[0]["id"] == "1001"
+        assert all(r["match_razones"] == ["Popular entre otros usuarios"] for r in sin_perfil)
+        relevancias = [r["relevancia"] for r in sin_perfil]
+        assert relevancias == sorted(relevancias, reverse=True) and relevancias[0] <= 1
+    finally:
+        popularity.invalidate(db_path)
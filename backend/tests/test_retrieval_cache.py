@@ -0,0 +1,99 @@
+import json
+import pickle
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app import chatbot, retrieval_cache, snapshot
+from app.retrieval_cache import FrozenRow, RetrievalCache, data_version
+from benchmarks.synthetic import Scale, category_names, generate
+
+
+@pytest.fixture
+def catalogo(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=5, content=300, categories=6, locations=20, interactions=0))
+    monkeypatch.setattr(chatbot, "DB_PATH", db_path)
+    monkeypatch.setattr(snapshot, "current", lambda: None)
+    yield db_path
+    retrieval_cache.invalidate(db_path)
+
+
+def test_frozen_row_is_read_only_but_serializable():
+    fila = FrozenRow(titulo="Curs", rating=4.5)
+    with pytest.raises(TypeError):
+        fila["titulo"] = "Altre"
+    with pytest.raises(TypeError):
+        fila.update(rating=1)
+    assert json.loads(json.dumps(fila)) == {"titulo": "Curs", "rating": 4.5}
+    copia = pickle.loads(pickle.dumps(fila))
+    assert copia == fila and isinstance(copia, FrozenRow)
+    assert dict(fila, rating=1)["rating"] == 1
+
+
+def test_sql_query_is_cached_by_category_set(catalogo):
+    cache = retrieval_cache.get_cache(catalogo)
+    a, b = category_names(6)[:2]
+    primera = chatbot.sql_query([a, b])
+    assert primera and cache.misses == 1
+
+    segunda = chatbot.sql_query([b, a, b])
+    assert cache.hits == 1 and segunda == primera
+    # Listas distintas con las mismas filas compartidas
+    assert segunda is not primera and all(x is y for x, y in zip(segunda, primera))
+    assert all(isinstance(fila, FrozenRow) for fila in segunda)
+
+    # Las filas de una consulta que se solapa son las mismas instancias
+    solo_a = chatbot.sql_query([a])
+    por_titulo = {fila["titulo"]: fila for fila in primera}
+    assert solo_a and all(por_titulo[fila["titulo"]] is fila for fila in solo_a)
+
+    chatbot.sql_query([a, b], lat=41.39, lon=2.17, radio_km=5)
+    assert cache.misses == 3
+
+
+def test_catalog_writes_invalidate(catalogo):
+    cache = retrieval_cache.get_cache(catalogo)
+    nombre = category_names(6)[0]
+    antes = chatbot.sql_query([nombre])
+    conn = sqlite3.connect(catalogo)
+    version = data_version(conn)
+
+    conn.execute("UPDATE contenido_formativo SET titulo = 'Títol nou' WHERE titulo = ?", (antes[0]["titulo"],))
+    conn.commit()
+    assert data_version(conn) == version + 1
+    despues = chatbot.sql_query([nombre])
+    assert cache.invalidations == 1 and cache.hits == 0
+    assert despues[0]["titulo"] == "Títol nou" and despues[1:] == antes[1:]
+
+    categoria_id = conn.execute("SELECT id FROM categorias WHERE nombre = ?", (nombre,)).fetchone()[0]
+    conn.execute("DELETE FROM contenido_categorias WHERE categoria_id = ?", (categoria_id,))
+    conn.commit()
+    conn.close()
+    assert chatbot.sql_query([nombre]) == []
+    assert cache.invalidations == 2
+
+
+def test_cache_is_bounded_in_bytes(tmp_path):
+    db_path = str(tmp_path / "jaa.sqlite")
+    generate(db_path, Scale(users=1, content=10, categories=3, locations=5, interactions=0))
+    conn = sqlite3.connect(db_path)
+    filas = lambda n: [((n, i), {"titulo": f"Curs {n}-{i}", "descripcion": "x" * 200}) for i in range(20)]
+    tamano = RetrievalCache(max_bytes=10**9)
+    tamano.get_or_load(conn, "una", lambda: filas(0))
+
+    cache = RetrievalCache(max_bytes=3 * tamano.bytes)
+    for n in range(10):
+        cache.get_or_load(conn, n, lambda: filas(n))
+    assert len(cache) == 3 and cache.evictions == 7 and cache.bytes <= cache.max_bytes
+    cache.get_or_load(conn, 9, lambda: pytest.fail("debería estar en caché"))
+
+    grande = RetrievalCache(max_bytes=100)
+    assert len(grande.get_or_load(conn, "x", lambda: filas(0))) == 20
+    assert len(grande) == 0 and grande.bytes == 0 and grande.stats()["uncacheable"] == 1
+    conn.close()
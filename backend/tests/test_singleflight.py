@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.singleflight import SingleFlight, normalize_question, question_key
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    ejecuciones = 0
+
+    async def trabajo():
+        nonlocal ejecuciones
+        ejecuciones += 1
+        await asyncio.sleep(0.05)
+        return {"valor": 42}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", trabajo) for _ in range(10)))
+
+    resultados = asyncio.run(main())
+    assert ejecuciones == 1
+    assert all(r is resultados[0] for r in resultados)
+    assert flight.stats() == {"calls": 10, "executions": 1, "collapsed": 9, "in_flight": 0}
+
+
+def test_different_keys_and_sequential_calls_are_not_collapsed():
+    flight = SingleFlight("test")
+
+    async def trabajo(v):
+        await asyncio.sleep(0.01)
+        return v
+
+    async def main():
+        a, b = await asyncio.gather(flight.do("a", lambda: trabajo(1)), flight.do("b", lambda: trabajo(2)))
+        c = await flight.do("a", lambda: trabajo(3))
+        return a, b, c
+
+    assert asyncio.run(main()) == (1, 2, 3)
+    assert flight.collapsed == 0
+    assert flight.executions == 3
+
+
+def test_exception_is_shared_and_not_cached():
+    flight = SingleFlight("test")
+    intentos = 0
+
+    async def falla():
+        nonlocal intentos
+        intentos += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        resultados = await asyncio.gather(*(flight.do("k", falla) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in resultados)
+        with pytest.raises(ValueError):
+            await flight.do("k", falla)
+
+    asyncio.run(main())
+    assert intentos == 2
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    flight = SingleFlight("test")
+
+    async def trabajo():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        lider = asyncio.ensure_future(flight.do("k", trabajo))
+        await asyncio.sleep(0)
+        seguidor = asyncio.ensure_future(flight.do("k", trabajo))
+        await asyncio.sleep(0.01)
+        lider.cancel()
+        return await seguidor
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_normalize_question():
+    assert normalize_question("  ¿Quins   CURSOS hi ha? ") == "quins cursos hi ha"
+    assert question_key("Hola!", 41.4, None) == ("hola", 41.4, None)
+
+
+def test_endpoint_collapses_concurrent_requests():
+    import api.endpoints.recommendations as recommendations
+
+    llamadas = []
+
+    class RecomendadorLento:
+        def __init__(self, db_path=None):
+            pass
+
+        def generate(self, usuario_id, **kwargs):
+            llamadas.append(usuario_id)
+            time.sleep(0.2)
+            return [{"id": "1", "titulo": "t", "descripcion": "d", "tipo": "curso", "modalidad": "online"}]
+
+    app = FastAPI()
+    app.include_router(recommendations.router, prefix="/api")
+    original = recommendations.ContentRecommender
+    recommendations.ContentRecommender = RecomendadorLento
+    recommendations.recommendation_flight = SingleFlight("recommendations")
+    codigos = []
+    try:
+        # Con el cliente como contexto todas las peticiones comparten bucle
+        with TestClient(app) as client:
+            def pedir():
+                codigos.append(client.get("/api/recommendations/7").status_code)
+
+            hilos = [threading.Thread(target=pedir) for _ in range(5)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+    finally:
+        recommendations.ContentRecommender = original
+
+    assert codigos == [200] * 5
+    assert llamadas == [7]
+    assert recommendations.recommendation_flight.collapsed == 4
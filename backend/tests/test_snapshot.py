@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.snapshot import CatalogSnapshot, SnapshotHolder, StringTable, build
+from benchmarks.synthetic import Scale, category_names, generate
+
+CONTENIDO_POR_CATEGORIAS = """
+SELECT cf.titulo, cf.descripcion, cf.tipo, cf.modalidad, cf.nivel, cf.rating, cf.precio, cf.estado
+FROM contenido_formativo AS cf
+JOIN contenido_categorias AS cc ON cf.id = cc.contenido_id
+JOIN categorias AS c ON cc.categoria_id = c.id
+WHERE c.nombre IN ({placeholders})
+GROUP BY cf.id
+"""
+CLAVES = ("titulo", "descripcion", "tipo", "modalidad", "nivel", "rating", "precio", "estado")
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "jaa.sqlite")
+    generate(path, Scale(users=5, content=400, categories=10, locations=20, interactions=10))
+    return path
+
+
+@pytest.fixture(scope="module")
+def snap(db_path, tmp_path_factory):
+    out = str(tmp_path_factory.mktemp("snap") / "catalogo.snap")
+    build(db_path, out)
+    return CatalogSnapshot(out)
+
+
+def test_active_categories_match_sql(db_path, snap):
+    with sqlite3.connect(db_path) as conn:
+        esperadas = [row[0] for row in conn.execute("SELECT nombre FROM categorias WHERE activa = 1 ORDER BY id")]
+    assert snap.categorias_activas() == esperadas
+
+
+@pytest.mark.parametrize("n", [1, 3])
+def test_content_by_categories_matches_sql(db_path, snap, n):
+    nombres = category_names(10)[:n]
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            CONTENIDO_POR_CATEGORIAS.format(placeholders=", ".join("?" for _ in nombres)), nombres
+        ).fetchall()
+    esperado = [dict(zip(CLAVES, row)) for row in rows]
+    assert esperado
+    assert snap.contenido_por_categorias(nombres) == esperado
+
+
+def test_unknown_category_is_empty(snap):
+    assert snap.contenido_por_categorias(["No existe"]) == []
+
+
+def test_arrays_are_read_only(snap):
+    with pytest.raises(ValueError):
+        snap.arrays["rating"][0] = 5.0
+
+
+def test_row_of(db_path, snap):
+    with sqlite3.connect(db_path) as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM contenido_formativo ORDER BY id")]
+    assert snap.row_of(ids[0]) == 0
+    assert snap.row_of(ids[-1]) == len(ids) - 1
+    assert snap.row_of("no-existe") == -1
+
+
+def test_nulls_survive(tmp_path):
+    path = str(tmp_path / "jaa.sqlite")
+    generate(path, Scale(users=1, content=5, categories=2, locations=2, interactions=0))
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE contenido_formativo SET descripcion = NULL, nivel = NULL, precio = NULL")
+    out = str(tmp_path / "catalogo.snap")
+    build(path, out)
+    actividad = CatalogSnapshot(out).activity(0)
+    assert actividad["descripcion"] is None
+    assert actividad["nivel"] is None
+    assert actividad["precio"] is None
+    assert actividad["titulo"]
+
+
+def test_string_table_roundtrip():
+    valores = ["", "Cuina", "Idiomes", "Informàtica", "Ñandú"]
+    tabla = StringTable(*StringTable.encode(valores))
+    assert [tabla[i] for i in range(len(tabla))] == valores
+    assert tabla.index("Informàtica") == 3
+    assert tabla.index("Esport") == -1
+
+
+def test_holder_picks_up_replaced_snapshot(db_path, tmp_path):
+    out = str(tmp_path / "catalogo.snap")
+    holder = SnapshotHolder(out, check_interval=0)
+    assert holder.get() is None
+
+    build(db_path, out)
+    primero = holder.get()
+    assert primero is not None and holder.reloads == 1
+    assert holder.get() is primero
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE categorias SET activa = 0 WHERE id = (SELECT MIN(id) FROM categorias)")
+    try:
+        build(db_path, out)
+        segundo = holder.get()
+        assert segundo is not primero and holder.reloads == 2
+        assert len(segundo.categorias_activas()) == len(primero.categorias_activas()) - 1
+        # El mapa anterior sigue siendo válido para quien lo tenga abierto
+        assert np.all(primero.arrays["categoria.activa"] == 1)
+    finally:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE categorias SET activa = 1")
+    assert not [f for f in os.listdir(tmp_path) if ".tmp-" in f]
+
+
+def test_stale_snapshot_falls_back_to_sqlite(tmp_path, monkeypatch):
+    from app import chatbot, retrieval_cache, snapshot
+
+    db = str(tmp_path / "jaa.sqlite")
+    generate(db, Scale(users=1, content=50, categories=4, locations=5, interactions=0))
+    out = str(tmp_path / "catalogo.snap")
+    meta = build(db, out)
+    with sqlite3.connect(db) as conn:
+        assert meta["catalog_version"] == retrieval_cache.data_version(conn)
+    holder = SnapshotHolder(out, check_interval=0)
+    monkeypatch.setattr(snapshot, "_holder", holder)
+    monkeypatch.setattr(chatbot, "DB_PATH", db)
+    nombre = category_names(4)[0]
+    # Con la misma versión se responde desde el snapshot, sin tocar la caché
+    assert chatbot.sql_query([nombre]) == holder.get().contenido_por_categorias([nombre])
+    assert retrieval_cache.get_cache(db).misses == 0
+
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "UPDATE contenido_formativo SET titulo = 'Títol nou' WHERE id IN "
+            "(SELECT contenido_id FROM contenido_categorias cc JOIN categorias c ON c.id = cc.categoria_id WHERE c.nombre = ?)",
+            (nombre,),
+        )
+    try:
+        assert {fila["titulo"] for fila in chatbot.sql_query([nombre])} == {"Títol nou"}
+        assert nombre in chatbot.get_categories()
+        assert holder.stale == 2 and retrieval_cache.get_cache(db).misses == 1
+
+        build(db, out)
+        assert chatbot.sql_query([nombre]) == holder.get().contenido_por_categorias([nombre])
+        assert holder.stale == 2
+    finally:
+        retrieval_cache.invalidate(db)
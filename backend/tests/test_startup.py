@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from benchmarks.import_profile import import_time, parse_importtime
+
+# Presupuesto de arranque en frío: lo que puede tardar `import app.main`
+IMPORT_BUDGET_S = float(os.getenv("STARTUP_IMPORT_BUDGET_S", "1.5"))
+# Solo se cargan cuando se usa el chatbot
+LAZY_MODULES = ("openai", "langsmith", "requests", "dotenv")
+
+
+def test_import_does_not_load_llm_clients():
+    resultado = import_time("app.main", watch=LAZY_MODULES)
+    assert resultado["loaded"] == []
+
+
+def test_import_within_budget():
+    # El mejor de varios intentos, para no fallar por ruido de la máquina
+    segundos = min(import_time("app.main")["seconds"] for _ in range(3))
+    assert segundos <= IMPORT_BUDGET_S, (
+        f"import app.main tardó {segundos:.2f}s (presupuesto {IMPORT_BUDGET_S}s); "
+        "ver python -m benchmarks.import_profile"
+    )
+
+
+def test_parse_importtime():
+    texto = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     json.decoder",
+        "import time:       300 |        420 |   json",
+    ])
+    assert parse_importtime(texto) == [
+        {"module": "json.decoder", "self_us": 120, "cumulative_us": 120, "depth": 2},
+        {"module": "json", "self_us": 300, "cumulative_us": 420, "depth": 1},
+    ]
+
+
+def test_recommendations_work_without_llm_config(tmp_path, monkeypatch):
+    for variable in ("HF_TOKEN", "BASE_URL", "WHISPER_API_URL"):
+        monkeypatch.delenv(variable, raising=False)
+    from app import chatbot, main
+
+    monkeypatch.setattr(main, "DB_PATH", str(tmp_path / "jaa.sqlite"))
+    monkeypatch.setattr(chatbot, "DB_PATH", str(tmp_path / "jaa.sqlite"))
+    monkeypatch.setattr(main, "CHATBOT_WARMUP", False)
+    chatbot.get_router.cache_clear()
+    monkeypatch.setattr(chatbot, "get_settings", lambda: {"HF_TOKEN": None, "BASE_URL": None, "BASE_URLS": None, "WHISPER_API_URL": None})
+
+    with TestClient(main.app) as client:
+        assert client.get("/api/recommendations/1").status_code == 200
+        respuesta = client.post("/cb/query", json={"request": "Cursos d'informàtica"})
+    assert respuesta.status_code == 500
+    assert "HF_TOKEN" in respuesta.json()["detail"]
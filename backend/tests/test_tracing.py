@@ -0,0 +1,177 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app import tracing
+from app.tracing import BatchExporter, FileSink, InMemorySink, Tracer
+
+
+@pytest.fixture
+def memoria():
+    sink = InMemorySink()
+    exporter = BatchExporter(sink, max_queue=100, batch_size=10, flush_interval=0.05).start()
+    anterior = tracing.set_tracer(Tracer(exporter, sample_rate=1.0))
+    yield sink, exporter
+    exporter.close(timeout=5)
+    tracing.set_tracer(anterior)
+
+
+def test_nested_spans_share_trace(memoria):
+    sink, exporter = memoria
+
+    @tracing.traceable
+    def hijo(x):
+        return x * 2
+
+    @tracing.traceable(name="raiz")
+    def raiz(x):
+        return hijo(x) + 1
+
+    assert raiz(3) == 7
+    exporter.flush(timeout=5)
+    por_nombre = {s["name"]: s for s in sink.spans}
+    assert set(por_nombre) == {"raiz", "hijo"}
+    assert por_nombre["hijo"]["parent_id"] == por_nombre["raiz"]["id"]
+    assert por_nombre["hijo"]["trace_id"] == por_nombre["raiz"]["id"]
+    assert por_nombre["hijo"]["dotted_order"].startswith(por_nombre["raiz"]["dotted_order"] + ".")
+    assert por_nombre["raiz"]["outputs"] == {"output": 7}
+    assert por_nombre["hijo"]["inputs"]["args"] == [3]
+
+
+def test_coroutine_functions_are_traced(memoria):
+    sink, exporter = memoria
+
+    @tracing.traceable
+    def hijo(x):
+        return x * 2
+
+    @tracing.traceable(name="raiz")
+    async def raiz(x):
+        await asyncio.sleep(0)
+        return hijo(x) + 1
+
+    assert asyncio.run(raiz(3)) == 7
+    exporter.flush(timeout=5)
+    por_nombre = {s["name"]: s for s in sink.spans}
+    assert por_nombre["raiz"]["outputs"] == {"output": 7}
+    assert por_nombre["hijo"]["parent_id"] == por_nombre["raiz"]["id"]
+
+
+def test_errors_are_recorded_and_reraised(memoria):
+    sink, exporter = memoria
+
+    @tracing.traceable
+    def falla():
+        raise ValueError("sin respuesta")
+
+    with pytest.raises(ValueError):
+        falla()
+    exporter.flush(timeout=5)
+    assert sink.spans[0]["error"] == "ValueError: sin respuesta"
+
+
+def test_head_sampling_applies_to_whole_trace():
+    sink = InMemorySink()
+    exporter = BatchExporter(sink, flush_interval=0.05).start()
+    tracer = Tracer(exporter, sample_rate=0.3)
+    try:
+        for _ in range(500):
+            with tracer.span("raiz"):
+                with tracer.span("hijo"):
+                    pass
+        exporter.flush(timeout=5)
+    finally:
+        exporter.close(timeout=5)
+    raices = [s for s in sink.spans if s["parent_id"] is None]
+    hijos = [s for s in sink.spans if s["parent_id"] is not None]
+    assert len(raices) == len(hijos) == tracer.sampled
+    assert 80 < tracer.sampled < 220
+    assert tracer.sampled + tracer.unsampled == 500
+
+
+def test_zero_sample_rate_exports_nothing():
+    sink = InMemorySink()
+    exporter = BatchExporter(sink)
+    tracer = Tracer(exporter, sample_rate=0.0)
+    with tracer.span("raiz") as span:
+        span.set_outputs(valor=1)
+    assert exporter.enqueued == 0
+    assert not tracer.enabled
+
+
+def test_full_buffer_drops_without_blocking():
+    bloqueo = threading.Event()
+
+    def sink_lento(lote):
+        bloqueo.wait(5)
+
+    exporter = BatchExporter(sink_lento, max_queue=5, batch_size=1, flush_interval=0.01).start()
+    tracer = Tracer(exporter, sample_rate=1.0)
+    try:
+        t0 = time.perf_counter()
+        for _ in range(50):
+            with tracer.span("raiz"):
+                pass
+        assert time.perf_counter() - t0 < 1.0
+        assert exporter.dropped > 0
+        assert exporter.enqueued + exporter.dropped == 50
+        assert len(exporter._pending) <= 5
+    finally:
+        bloqueo.set()
+        exporter.close(timeout=5)
+    assert exporter.exported == exporter.enqueued
+
+
+def test_sink_errors_are_counted():
+    def sink_roto(lote):
+        raise ConnectionError("sin red")
+
+    exporter = BatchExporter(sink_roto, flush_interval=0.01).start()
+    tracer = Tracer(exporter)
+    with tracer.span("raiz"):
+        pass
+    exporter.flush(timeout=5)
+    exporter.close(timeout=5)
+    assert exporter.failed == 1 and exporter.exported == 0
+
+
+def test_file_sink_writes_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = BatchExporter(FileSink(str(path)), flush_interval=0.01).start()
+    tracer = Tracer(exporter)
+    with tracer.span("chat.completions", run_type="llm", messages=[{"role": "user", "content": "hola"}]) as span:
+        span.set_metadata(usage={"total_tokens": 3})
+    exporter.close(timeout=5)
+    registros = [json.loads(linea) for linea in path.read_text().splitlines()]
+    assert len(registros) == 1
+    assert registros[0]["run_type"] == "llm"
+    assert registros[0]["metadata"] == {"usage": {"total_tokens": 3}}
+
+
+def test_long_values_are_truncated(memoria):
+    sink, exporter = memoria
+    with tracing.span("raiz", texto="x" * 10_000):
+        pass
+    exporter.flush(timeout=5)
+    assert len(sink.spans[0]["inputs"]["texto"]) == tracing.MAX_VALUE_CHARS + 1
+
+
+def test_disabled_tracer_calls_function_directly():
+    anterior = tracing.set_tracer(Tracer(None))
+    try:
+        @tracing.traceable
+        def suma(a, b):
+            return a + b
+
+        assert suma(1, 2) == 3
+        assert tracing.stats()["enabled"] is False
+    finally:
+        tracing.set_tracer(anterior)